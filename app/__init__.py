@@ -8,12 +8,29 @@ from flask_mail import Mail
 from config.config import Config
 from config.logging import configure_logging
 from app.utils.file_storage import FileStorage
+from app.utils.events import EventBus
+from app.utils.cache import ResponseCache
+from app.utils.submission_queue import SubmissionQueue
+from app.utils.auth import UserLookup
+from app.utils.images import ImagePipeline
+from app.utils.audit import AuditLog
+from app.utils.profiling import RequestProfiler
+from app.utils.metrics import metrics
+from app.utils.transaction import register_transaction_hooks
 
 db = SQLAlchemy()
 migrate = Migrate()
 jwt = JWTManager()
 mail = Mail()
 file_storage = FileStorage()
+events = EventBus()
+response_cache = ResponseCache()
+submission_queue = SubmissionQueue()
+user_lookup = UserLookup()
+image_pipeline = ImagePipeline()
+audit_log = AuditLog()
+request_profiler = RequestProfiler()
+register_transaction_hooks(db)
 
 def create_app(config_class=Config):
     app = Flask(__name__)
@@ -26,15 +43,24 @@ def create_app(config_class=Config):
     db.init_app(app)
     migrate.init_app(app, db)
     jwt.init_app(app)
+    user_lookup.init_app(app)
     mail.init_app(app)
     file_storage.init_app(app)
+    image_pipeline.init_app(app)
+    events.init_app(app)
+    response_cache.init_app(app)
+    submission_queue.init_app(app)
+    audit_log.init_app(app)
+    request_profiler.init_app(app)
+    metrics.init_app(app)
     
     # Configure CORS
     CORS(app, resources={
         r"/api/*": {
             "origins": app.config['CORS_ORIGINS'],
             "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-            "allow_headers": ["Content-Type", "Authorization"]
+            "allow_headers": ["Content-Type", "Authorization"],
+            "expose_headers": ["Link", "X-Next-Cursor", "Server-Timing", "X-Request-ID"]
         }
     })
 
@@ -43,11 +69,34 @@ def create_app(config_class=Config):
     from app.routes.election import election_bp
     from app.routes.candidate import candidate_bp
     from app.routes.voting import voting_bp
+    from app.routes.media import media_bp, upload_bp
+    from app.routes.geography import geography_bp
 
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(election_bp, url_prefix='/api/elections')
     app.register_blueprint(candidate_bp, url_prefix='/api/candidates')
     app.register_blueprint(voting_bp, url_prefix='/api/voting')
+    app.register_blueprint(geography_bp, url_prefix='/api/geography')
+    # Stored paths ('uploads/logos/...') double as URLs
+    app.register_blueprint(media_bp, url_prefix='/uploads')
+    app.register_blueprint(upload_bp, url_prefix='/api/uploads')
+    if metrics.enabled:
+        from app.routes.metrics import metrics_bp
+        app.register_blueprint(metrics_bp)
+
+    # Register CLI commands
+    from app.utils.tally import tally_cli
+    from app.utils.submission_queue import results_cli
+    from app.utils.images import images_cli
+    from app.utils.file_storage import files_cli
+    from app.utils.geography import geography_cli
+    from app.utils.importer import elections_cli
+    app.cli.add_command(tally_cli)
+    app.cli.add_command(results_cli)
+    app.cli.add_command(images_cli)
+    app.cli.add_command(files_cli)
+    app.cli.add_command(geography_cli)
+    app.cli.add_command(elections_cli)
 
     # Log startup
     app.logger.info('Application démarrée en mode %s', os.getenv('APP_ENV', 'development'))
@@ -0,0 +1,36 @@
+from datetime import datetime
+from app import db
+
+class ResultAudit(db.Model):
+    """Trace en ajout seul d'une modification des résultats d'un bureau"""
+    __tablename__ = 'result_audit'
+    __table_args__ = (
+        # Keyset pagination (id) within an office, a user or an election
+        db.Index('ix_result_audit_office', 'office_id', 'id'),
+        db.Index('ix_result_audit_user', 'user_id', 'id'),
+        db.Index('ix_result_audit_election', 'election_id', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    office_id = db.Column(db.Integer, nullable=False)
+    election_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer)  # None for writes without an authenticated user
+    action = db.Column(db.String(20), nullable=False)  # submit (replace), update
+    before = db.Column(db.JSON, nullable=False)
+    after = db.Column(db.JSON, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f"<ResultAudit office={self.office_id} user={self.user_id} {self.action}>"
+
+
+class ResultAuditOutbox(db.Model):
+    """Traces d'audit d'une transaction de résultats, en attente de copie dans result_audit"""
+    __tablename__ = 'result_audit_outbox'
+
+    id = db.Column(db.Integer, primary_key=True)
+    records = db.Column(db.JSON, nullable=False)  # list of result_audit rows, created_at in ISO format
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<ResultAuditOutbox {self.id} ({len(self.records)} traces)>"
@@ -2,10 +2,14 @@ from datetime import datetime
 from app import db
 
 class Election(db.Model):
+    __table_args__ = (
+        db.Index('ix_election_status_year', 'status', 'year'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     type = db.Column(db.String(50), nullable=False)  # legislative, municipal, local, presidential
-    year = db.Column(db.Integer, nullable=False)
+    year = db.Column(db.Integer, nullable=False, index=True)
     status = db.Column(db.String(20), default='pending')  # pending, active, completed
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -13,6 +17,11 @@ class Election(db.Model):
     # Relationships
     candidates = db.relationship('Candidate', backref='election', lazy=True)
     voting_centers = db.relationship('VotingCenter', backref='election', lazy=True)
+    tally = db.relationship('ElectionTally', uselist=False, cascade='all, delete-orphan', lazy=True)
+    candidate_tallies = db.relationship('CandidateTally', cascade='all, delete-orphan', lazy=True)
+    area_tallies = db.relationship('AreaTally', cascade='all, delete-orphan', lazy=True)
+    area_candidate_tallies = db.relationship('AreaCandidateTally', cascade='all, delete-orphan', lazy=True)
+    tally_snapshots = db.relationship('TallySnapshot', cascade='all, delete-orphan', lazy=True)
 
 class Candidate(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -20,14 +29,40 @@ class Candidate(db.Model):
     last_name = db.Column(db.String(100), nullable=False)
     code_name = db.Column(db.String(50), unique=True, nullable=False)
     profile_photo = db.Column(db.String(255))
-    election_id = db.Column(db.Integer, db.ForeignKey('election.id'), nullable=False)
+    election_id = db.Column(db.Integer, db.ForeignKey('election.id'), nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Relationships
+    tallies = db.relationship('CandidateTally', backref='candidate', cascade='all, delete-orphan', lazy=True)
+    area_tallies = db.relationship('AreaCandidateTally', cascade='all, delete-orphan', lazy=True)
+
+# Electoral geography above the voting centers: province -> commune
+class Area(db.Model):
+    __table_args__ = (
+        db.UniqueConstraint('parent_id', 'name', name='uq_area_parent_name'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    level = db.Column(db.String(20), nullable=False)  # province, commune
+    parent_id = db.Column(db.Integer, db.ForeignKey('area.id'), index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # Relationships
+    children = db.relationship('Area', backref=db.backref('parent', remote_side=[id]), lazy=True)
+
 class VotingCenter(db.Model):
+    __table_args__ = (
+        # Children of a commune for a given election
+        db.Index('ix_voting_center_commune_election', 'commune_id', 'election_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False)
-    election_id = db.Column(db.Integer, db.ForeignKey('election.id'), nullable=False)
+    election_id = db.Column(db.Integer, db.ForeignKey('election.id'), nullable=False, index=True)
+    commune_id = db.Column(db.Integer, db.ForeignKey('area.id'))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -35,12 +70,19 @@ class VotingCenter(db.Model):
     voting_offices = db.relationship('VotingOffice', backref='center', lazy=True)
 
 class VotingOffice(db.Model):
+    __table_args__ = (
+        # Serves center_id lookups and covers the per-center SUM() aggregations
+        db.Index('ix_voting_office_center_totals', 'center_id', 'total_voters', 'blank_votes', 'null_votes'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False)
     center_id = db.Column(db.Integer, db.ForeignKey('voting_center.id'), nullable=False)
     total_voters = db.Column(db.Integer, default=0)
     blank_votes = db.Column(db.Integer, default=0)
     null_votes = db.Column(db.Integer, default=0)
+    # Submission time of the last results written: an older submission applied later is superseded
+    submitted_at = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -48,9 +90,65 @@ class VotingOffice(db.Model):
     results = db.relationship('VotingResult', backref='office', lazy=True)
 
 class VotingResult(db.Model):
+    # The unique constraint also serves as the index on office_id
+    __table_args__ = (
+        db.UniqueConstraint('office_id', 'candidate_id', name='uq_voting_result_office_candidate'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     office_id = db.Column(db.Integer, db.ForeignKey('voting_office.id'), nullable=False)
-    candidate_id = db.Column(db.Integer, db.ForeignKey('candidate.id'), nullable=False)
+    candidate_id = db.Column(db.Integer, db.ForeignKey('candidate.id'), nullable=False, index=True)
     votes = db.Column(db.Integer, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+# Materialized counters, kept up to date by app.utils.tally on every result write
+class ElectionTally(db.Model):
+    election_id = db.Column(db.Integer, db.ForeignKey('election.id'), primary_key=True)
+    total_voters = db.Column(db.Integer, nullable=False, default=0)
+    blank_votes = db.Column(db.Integer, nullable=False, default=0)
+    null_votes = db.Column(db.Integer, nullable=False, default=0)
+    version = db.Column(db.Integer, nullable=False, default=0)  # incremented on every change
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class CandidateTally(db.Model):
+    election_id = db.Column(db.Integer, db.ForeignKey('election.id'), primary_key=True)
+    candidate_id = db.Column(db.Integer, db.ForeignKey('candidate.id'), primary_key=True, index=True)
+    votes = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+# Append-only history of the election counters, one row per snapshot
+class TallySnapshot(db.Model):
+    __table_args__ = (
+        # History of an election is read as a single range scan
+        db.Index('ix_tally_snapshot_election_taken', 'election_id', 'taken_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    election_id = db.Column(db.Integer, db.ForeignKey('election.id'), nullable=False)
+    version = db.Column(db.Integer, nullable=False)
+    taken_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    total_voters = db.Column(db.Integer, nullable=False, default=0)
+    blank_votes = db.Column(db.Integer, nullable=False, default=0)
+    null_votes = db.Column(db.Integer, nullable=False, default=0)
+    candidate_results = db.Column(db.JSON, nullable=False)  # {candidate_id: votes}
+
+# Roll-up of the same counters per province, commune and center (area_id is an
+# area or a voting center id depending on the level)
+class AreaTally(db.Model):
+    election_id = db.Column(db.Integer, db.ForeignKey('election.id'), primary_key=True)
+    level = db.Column(db.String(20), primary_key=True)  # province, commune, center
+    area_id = db.Column(db.Integer, primary_key=True)
+    total_voters = db.Column(db.Integer, nullable=False, default=0)
+    blank_votes = db.Column(db.Integer, nullable=False, default=0)
+    null_votes = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class AreaCandidateTally(db.Model):
+    election_id = db.Column(db.Integer, db.ForeignKey('election.id'), primary_key=True)
+    level = db.Column(db.String(20), primary_key=True)
+    area_id = db.Column(db.Integer, primary_key=True)
+    candidate_id = db.Column(db.Integer, db.ForeignKey('candidate.id'), primary_key=True, index=True)
+    votes = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
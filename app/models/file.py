@@ -0,0 +1,14 @@
+from datetime import datetime
+from app import db
+
+class StoredFile(db.Model):
+    """Fichier téléversé adressé par son contenu, partagé par toutes ses références"""
+    __tablename__ = 'stored_file'
+
+    path = db.Column(db.String(255), primary_key=True)  # uploads/<folder>/<sha256>.<ext>
+    size = db.Column(db.BigInteger, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=1)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<StoredFile {self.path} x{self.ref_count}>"
@@ -1,17 +1,19 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from app.models.user import User
 from app.schemas import UserSchema
-from app import db
+from app import db, file_storage, user_lookup
 from datetime import datetime
-from app.utils.file_upload import save_file
-import os
+from app.utils.pagination import PaginationError, paginate, next_page_headers
+from app.utils.auth import identity_claims, role_required
+from app.utils.file_storage import UploadError
 
 auth_bp = Blueprint('auth', __name__)
 user_schema = UserSchema()
 
 @auth_bp.route('/register', methods=['POST'])
+@file_storage.accepts(campaign_logo='logos', profile_photo='profiles')
 def register():
     try:
         data = request.form.to_dict()
@@ -22,16 +24,13 @@ def register():
         if User.query.filter_by(phone_number=data.get('phone_number')).first():
             return jsonify({'message': 'Phone number already registered'}), 400
 
-        # Handle file uploads
-        campaign_logo = request.files.get('campaign_logo')
-        profile_photo = request.files.get('profile_photo')
-
-        if campaign_logo:
-            logo_path = save_file(campaign_logo, 'logos')
+        # Handle file uploads (sent file, or reference to a direct upload)
+        logo_path = file_storage.save_upload('campaign_logo', 'logos')
+        if logo_path:
             data['campaign_logo'] = logo_path
 
-        if profile_photo:
-            photo_path = save_file(profile_photo, 'profiles')
+        photo_path = file_storage.save_upload('profile_photo', 'profiles')
+        if photo_path:
             data['profile_photo'] = photo_path
 
         # Convert date strings to datetime objects only if they exist
@@ -66,6 +65,9 @@ def register():
             'user': user_schema.dump(user)
         }), 201
 
+    except UploadError as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': str(e)}), 500
@@ -84,8 +86,9 @@ def login():
         if not user or not check_password_hash(user.password_hash, password):
             return jsonify({'message': 'Invalid credentials'}), 401
 
-        access_token = create_access_token(identity=str(user.id))
-        refresh_token = create_refresh_token(identity=str(user.id))
+        claims = identity_claims(user)
+        access_token = create_access_token(identity=str(user.id), additional_claims=claims)
+        refresh_token = create_refresh_token(identity=str(user.id), additional_claims=claims)
 
         return jsonify({
             'message': 'Login successful',
@@ -101,8 +104,8 @@ def login():
 @jwt_required(refresh=True)
 def refresh():
     try:
-        current_user_id = get_jwt_identity()
-        access_token = create_access_token(identity=current_user_id)
+        # Claims come from the user lookup, so a changed role is picked up on refresh
+        access_token = create_access_token(identity=str(current_user.id), additional_claims=identity_claims(current_user))
         return jsonify({'access_token': access_token}), 200
     except Exception as e:
         return jsonify({'message': str(e)}), 500
@@ -131,37 +134,30 @@ def forgot_password():
 @jwt_required()
 def get_profile():
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        user = db.session.get(User, current_user.id)
         return jsonify(user_schema.dump(user)), 200
     except Exception as e:
         return jsonify({'message': str(e)}), 500
 
 @auth_bp.route('/profile', methods=['PUT'])
 @jwt_required()
+@file_storage.accepts(campaign_logo='logos', profile_photo='profiles')
 def update_profile():
     try:
-        current_user_id = get_jwt_identity()
-        # user = User.query.get(current_user_id)
-        user = User.query.get(int(current_user_id))
+        user = db.session.get(User, current_user.id)
         data = request.form.to_dict()
 
-        # Handle file uploads
-        campaign_logo = request.files.get('campaign_logo')
-        profile_photo = request.files.get('profile_photo')
-
-        if campaign_logo:
-            # Delete old logo if exists
-            if user.campaign_logo and os.path.exists(user.campaign_logo):
-                os.remove(user.campaign_logo)
-            logo_path = save_file(campaign_logo, 'logos')
+        # Handle file uploads (sent file, or reference to a direct upload)
+        logo_path = file_storage.save_upload('campaign_logo', 'logos')
+        if logo_path:
+            # Drop the reference to the old logo (removed once unused)
+            file_storage.release(user.campaign_logo)
             data['campaign_logo'] = logo_path
 
-        if profile_photo:
-            # Delete old photo if exists
-            if user.profile_photo and os.path.exists(user.profile_photo):
-                os.remove(user.profile_photo)
-            photo_path = save_file(profile_photo, 'profiles')
+        photo_path = file_storage.save_upload('profile_photo', 'profiles')
+        if photo_path:
+            # Drop the reference to the old photo (removed once unused)
+            file_storage.release(user.profile_photo)
             data['profile_photo'] = photo_path
 
         # Update user fields
@@ -174,31 +170,32 @@ def update_profile():
                 if str(current_value) != str(value):
                     setattr(user, key, value)
 
+        user_lookup.invalidate_on_commit(db.session, user.id)
         db.session.commit()
         return jsonify({
             'message': 'Profile updated successfully',
             'user': user_schema.dump(user)
         }), 200
 
+    except UploadError as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': str(e)}), 500
 
 # Get all users (admin only)
 @auth_bp.route('/users', methods=['GET'])
-@jwt_required()
+@role_required('director')
 def get_all_users():
     try:
-        current_user_id = get_jwt_identity()
-        current_user = User.query.get(current_user_id)
-        
-        if not current_user or current_user.role != 'director':
-            return jsonify({'message': 'Unauthorized access'}), 403
-            
-        users = User.query.all()
+        users, next_cursor = paginate(User.query, User, request)
         return jsonify({
-            'users': user_schema.dump(users, many=True)
-        }), 200
+            'users': user_schema.dump(users, many=True),
+            'next_cursor': next_cursor
+        }), 200, next_page_headers(request, next_cursor)
+    except PaginationError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': str(e)}), 500
 
@@ -207,13 +204,10 @@ def get_all_users():
 @jwt_required()
 def get_user(user_id):
     try:
-        current_user_id = get_jwt_identity()
-        current_user = User.query.get(current_user_id)
-        
-        if not current_user or (current_user.role != 'director' and current_user_id != user_id):
+        if current_user.role != 'director' and current_user.id != user_id:
             return jsonify({'message': 'Unauthorized access'}), 403
             
-        user = User.query.get(user_id)
+        user = db.session.get(User, user_id)
         if not user:
             return jsonify({'message': 'User not found'}), 404
             
@@ -223,26 +217,19 @@ def get_user(user_id):
 
 # Delete user (admin only)
 @auth_bp.route('/users/<int:user_id>', methods=['DELETE'])
-@jwt_required()
+@role_required('director')
 def delete_user(user_id):
     try:
-        current_user_id = get_jwt_identity()
-        current_user = User.query.get(current_user_id)
-        
-        if not current_user or current_user.role != 'director':
-            return jsonify({'message': 'Unauthorized access'}), 403
-            
-        user = User.query.get(user_id)
+        user = db.session.get(User, user_id)
         if not user:
             return jsonify({'message': 'User not found'}), 404
             
-        # Delete user's files if they exist
-        if user.campaign_logo and os.path.exists(user.campaign_logo):
-            os.remove(user.campaign_logo)
-        if user.profile_photo and os.path.exists(user.profile_photo):
-            os.remove(user.profile_photo)
+        # Release user's files (removed once no longer referenced)
+        file_storage.release(user.campaign_logo)
+        file_storage.release(user.profile_photo)
             
         db.session.delete(user)
+        user_lookup.invalidate_on_commit(db.session, user_id)
         db.session.commit()
         
         return jsonify({
@@ -255,34 +242,27 @@ def delete_user(user_id):
 # Update user (admin or self)
 @auth_bp.route('/users/<int:user_id>', methods=['PUT'])
 @jwt_required()
+@file_storage.accepts(campaign_logo='logos', profile_photo='profiles')
 def update_user(user_id):
     try:
-        current_user_id = get_jwt_identity()
-        current_user = User.query.get(current_user_id)
-        
-        if not current_user or (current_user.role != 'director' and current_user_id != user_id):
+        if current_user.role != 'director' and current_user.id != user_id:
             return jsonify({'message': 'Unauthorized access'}), 403
             
-        user = User.query.get(user_id)
+        user = db.session.get(User, user_id)
         if not user:
             return jsonify({'message': 'User not found'}), 404
             
         data = request.form.to_dict()
 
-        # Handle file uploads
-        campaign_logo = request.files.get('campaign_logo')
-        profile_photo = request.files.get('profile_photo')
-
-        if campaign_logo:
-            if user.campaign_logo and os.path.exists(user.campaign_logo):
-                os.remove(user.campaign_logo)
-            logo_path = save_file(campaign_logo, 'logos')
+        # Handle file uploads (sent file, or reference to a direct upload)
+        logo_path = file_storage.save_upload('campaign_logo', 'logos')
+        if logo_path:
+            file_storage.release(user.campaign_logo)
             data['campaign_logo'] = logo_path
 
-        if profile_photo:
-            if user.profile_photo and os.path.exists(user.profile_photo):
-                os.remove(user.profile_photo)
-            photo_path = save_file(profile_photo, 'profiles')
+        photo_path = file_storage.save_upload('profile_photo', 'profiles')
+        if photo_path:
+            file_storage.release(user.profile_photo)
             data['profile_photo'] = photo_path
 
         # Convert date strings to datetime objects if present
@@ -310,6 +290,7 @@ def update_user(user_id):
                 setattr(user, key, value)
 
         user.updated_at = datetime.now()
+        user_lookup.invalidate_on_commit(db.session, user_id)
         db.session.commit()
         
         return jsonify({
@@ -317,6 +298,9 @@ def update_user(user_id):
             'user': user_schema.dump(user)
         }), 200
 
+    except UploadError as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': str(e)}), 500
\ No newline at end of file
@@ -1,24 +1,25 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.models.election import Candidate
-from app.schemas import CandidateSchema
-from app import db
-from app.utils.file_upload import save_file
-import os
+from flask_jwt_extended import jwt_required
+from app.models.election import Candidate, VotingResult
+from app.schemas import CandidateSchema, CANDIDATE_DETAIL_EXPAND
+from app import db, file_storage, response_cache
+from app.utils.expansion import ExpansionError, build_schema, eager_options, expansion_args
+from app.utils.pagination import PaginationError, paginate, next_page_headers
+from app.utils.file_storage import UploadError
 
 candidate_bp = Blueprint('candidate', __name__)
 candidate_schema = CandidateSchema()
-candidates_schema = CandidateSchema(many=True)
 
 @candidate_bp.route('/', methods=['POST'])
 @jwt_required()
+@file_storage.accepts(profile_photo='candidates')
 def create_candidate():
     try:
         data = request.form.to_dict()
-        profile_photo = request.files.get('profile_photo')
 
-        if profile_photo:
-            photo_path = save_file(profile_photo, 'candidates')
+        # Sent file, or reference to a direct upload
+        photo_path = file_storage.save_upload('profile_photo', 'candidates')
+        if photo_path:
             data['profile_photo'] = photo_path
 
         errors = candidate_schema.validate(data)
@@ -27,6 +28,7 @@ def create_candidate():
 
         candidate = Candidate(**data)
         db.session.add(candidate)
+        response_cache.invalidate_on_commit(db.session, candidate.election_id)
         db.session.commit()
 
         return jsonify({
@@ -34,20 +36,29 @@ def create_candidate():
             'candidate': candidate_schema.dump(candidate)
         }), 201
 
+    except UploadError as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': str(e)}), 500
 
 @candidate_bp.route('/', methods=['GET'])
 @jwt_required()
+@response_cache.cached(lambda: request.args.get('election_id', type=int))
 def get_candidates():
     try:
+        fields, expand = expansion_args(request, CANDIDATE_DETAIL_EXPAND)
+        schema = build_schema(CandidateSchema, fields, expand, many=True)
+        query = Candidate.query.options(*eager_options(Candidate, expand))
+
         election_id = request.args.get('election_id')
         if election_id:
-            candidates = Candidate.query.filter_by(election_id=election_id).all()
-        else:
-            candidates = Candidate.query.all()
-        return jsonify(candidates_schema.dump(candidates)), 200
+            query = query.filter_by(election_id=election_id)
+        candidates, next_cursor = paginate(query, Candidate, request)
+        return jsonify(schema.dump(candidates)), 200, next_page_headers(request, next_cursor)
+    except (ExpansionError, PaginationError) as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': str(e)}), 500
 
@@ -55,32 +66,38 @@ def get_candidates():
 @jwt_required()
 def get_candidate(candidate_id):
     try:
-        candidate = Candidate.query.get_or_404(candidate_id)
-        return jsonify(candidate_schema.dump(candidate)), 200
+        fields, expand = expansion_args(request, CANDIDATE_DETAIL_EXPAND)
+        schema = build_schema(CandidateSchema, fields, expand)
+        candidate = Candidate.query.options(*eager_options(Candidate, expand)).get_or_404(candidate_id)
+        return jsonify(schema.dump(candidate)), 200
+    except ExpansionError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': str(e)}), 500
 
 @candidate_bp.route('/<int:candidate_id>', methods=['PUT'])
 @jwt_required()
+@file_storage.accepts(profile_photo='candidates')
 def update_candidate(candidate_id):
     try:
         candidate = Candidate.query.get_or_404(candidate_id)
         data = request.form.to_dict()
-        profile_photo = request.files.get('profile_photo')
 
-        if profile_photo:
-            # Delete old photo if exists
-            if candidate.profile_photo and os.path.exists(candidate.profile_photo):
-                os.remove(candidate.profile_photo)
-            photo_path = save_file(profile_photo, 'candidates')
+        photo_path = file_storage.save_upload('profile_photo', 'candidates')
+        if photo_path:
+            # Drop the reference to the old photo (removed once unused)
+            file_storage.release(candidate.profile_photo)
             data['profile_photo'] = photo_path
 
         errors = candidate_schema.validate(data, partial=True)
         if errors:
             return jsonify({'message': 'Validation error', 'errors': errors}), 400
 
+        # Both the previous and the new election (if moved) are affected
+        response_cache.invalidate_on_commit(db.session, candidate.election_id)
         for key, value in data.items():
             setattr(candidate, key, value)
+        response_cache.invalidate_on_commit(db.session, candidate.election_id)
 
         db.session.commit()
         return jsonify({
@@ -88,6 +105,9 @@ def update_candidate(candidate_id):
             'candidate': candidate_schema.dump(candidate)
         }), 200
 
+    except UploadError as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': str(e)}), 500
@@ -97,12 +117,16 @@ def update_candidate(candidate_id):
 def delete_candidate(candidate_id):
     try:
         candidate = Candidate.query.get_or_404(candidate_id)
+
+        # Its votes are part of the results and tallies: they must be removed first
+        if db.session.query(VotingResult.query.filter_by(candidate_id=candidate_id).exists()).scalar():
+            return jsonify({'message': 'Cannot delete a candidate with voting results'}), 400
         
-        # Delete profile photo if exists
-        if candidate.profile_photo and os.path.exists(candidate.profile_photo):
-            os.remove(candidate.profile_photo)
+        # Release profile photo (removed once no longer referenced)
+        file_storage.release(candidate.profile_photo)
         
         db.session.delete(candidate)
+        response_cache.invalidate_on_commit(db.session, candidate.election_id)
         db.session.commit()
         return jsonify({'message': 'Candidate deleted successfully'}), 200
     except Exception as e:
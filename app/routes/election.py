@@ -1,14 +1,28 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.models.election import Election, Candidate, VotingCenter, VotingOffice, VotingResult
-from app.schemas import ElectionSchema, CandidateSchema, VotingCenterSchema, VotingOfficeSchema, VotingResultSchema
-from app import db
-from app.utils.file_upload import save_file
-import os
+from werkzeug.exceptions import RequestEntityTooLarge
+from app.models.election import Election, VotingCenter, VotingOffice
+from app.schemas import (
+    ElectionSchema, VotingCenterSchema, VotingOfficeSchema,
+    ELECTION_DETAIL_EXPAND, VOTING_CENTER_DETAIL_EXPAND
+)
+from app import db, response_cache
+from app.utils.results import load_office, validate_office_results, write_office_results
+from app.utils.tally import STAT_FIELDS
+from app.utils.aggregation import election_results
+from app.utils.auth import role_required
+from app.utils.geography import AreaError, check_commune
+from app.utils.importer import FORMATS, ImportFormatError, run_import
+from app.utils.exporter import EXPORT_FORMATS, export_results, missing_package
+from app.utils.expansion import ExpansionError, build_schema, eager_options, expansion_args
+from app.utils.pagination import PaginationError, paginate, next_page_headers
+from app.utils.profiling import query_budget
 
 election_bp = Blueprint('election', __name__)
 election_schema = ElectionSchema()
-elections_schema = ElectionSchema(many=True)
+election_summary_schema = build_schema(ElectionSchema)
+election_detail_schema = build_schema(ElectionSchema, expand=ELECTION_DETAIL_EXPAND)
+center_summary_schema = build_schema(VotingCenterSchema)
 
 @election_bp.route('/', methods=['POST'])
 @jwt_required()
@@ -25,7 +39,7 @@ def create_election():
 
         return jsonify({
             'message': 'Election created successfully',
-            'election': election_schema.dump(election)
+            'election': election_summary_schema.dump(election)
         }), 201
 
     except Exception as e:
@@ -36,17 +50,28 @@ def create_election():
 @jwt_required()
 def get_elections():
     try:
-        elections = Election.query.all()
-        return jsonify(elections_schema.dump(elections)), 200
+        fields, expand = expansion_args(request)
+        schema = build_schema(ElectionSchema, fields, expand, many=True)
+        query = Election.query.options(*eager_options(Election, expand))
+        elections, next_cursor = paginate(query, Election, request)
+        return jsonify(schema.dump(elections)), 200, next_page_headers(request, next_cursor)
+    except (ExpansionError, PaginationError) as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': str(e)}), 500
 
 @election_bp.route('/<int:election_id>', methods=['GET'])
+@query_budget(5)
 @jwt_required()
+@response_cache.cached(lambda: request.view_args['election_id'])
 def get_election(election_id):
     try:
-        election = Election.query.get_or_404(election_id)
-        return jsonify(election_schema.dump(election)), 200
+        fields, expand = expansion_args(request, ELECTION_DETAIL_EXPAND)
+        schema = build_schema(ElectionSchema, fields, expand)
+        election = Election.query.options(*eager_options(Election, expand)).get_or_404(election_id)
+        return jsonify(schema.dump(election)), 200
+    except ExpansionError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': str(e)}), 500
 
@@ -64,10 +89,11 @@ def update_election(election_id):
         for key, value in data.items():
             setattr(election, key, value)
 
+        response_cache.invalidate_on_commit(db.session, election_id)
         db.session.commit()
         return jsonify({
             'message': 'Election updated successfully',
-            'election': election_schema.dump(election)
+            'election': election_detail_schema.dump(election)
         }), 200
 
     except Exception as e:
@@ -80,12 +106,56 @@ def delete_election(election_id):
     try:
         election = Election.query.get_or_404(election_id)
         db.session.delete(election)
+        response_cache.invalidate_on_commit(db.session, election_id)
         db.session.commit()
         return jsonify({'message': 'Election deleted successfully'}), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': str(e)}), 500
 
+# Streaming export of the per-office results (CSV, NDJSON or XLSX)
+@election_bp.route('/<int:election_id>/export.<file_format>', methods=['GET'])
+@jwt_required()
+def export_election_results(election_id, file_format):
+    try:
+        if file_format not in EXPORT_FORMATS:
+            return jsonify({'message': f'Unsupported format (expected one of {", ".join(EXPORT_FORMATS)})'}), 400
+        package = missing_package(file_format)
+        if package:
+            return jsonify({'message': f'{file_format.upper()} export requires the {package} package'}), 501
+        Election.query.get_or_404(election_id)
+
+        # Rows are read from a server-side cursor and sent as they are produced
+        return Response(stream_with_context(export_results(election_id, file_format)), mimetype=EXPORT_FORMATS[file_format], headers={
+            'Content-Disposition': f'attachment; filename=election-{election_id}-results.{file_format}',
+            'X-Accel-Buffering': 'no'
+        })
+
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
+
+# Bulk import of the election structure (CSV or XLSX request body)
+@election_bp.route('/<int:election_id>/import/<kind>', methods=['POST'])
+@role_required('director')
+def import_election_data(election_id, kind):
+    try:
+        Election.query.get_or_404(election_id)
+        file_format = request.args.get('format') or FORMATS.get(request.mimetype)
+        dry_run = request.args.get('dry_run', '').lower() in ('1', 'true', 'yes')
+
+        # The body is read and inserted chunk by chunk, in a single transaction
+        report = run_import(election_id, kind, request.stream, file_format, dry_run)
+        return jsonify(report.to_dict()), 400 if report.error_count else 200
+
+    except ImportFormatError as e:
+        return jsonify({'message': str(e)}), 400
+    except RequestEntityTooLarge:
+        db.session.rollback()
+        return jsonify({'message': 'File too large'}), 413
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 500
+
 # Voting center routes
 @election_bp.route('/<int:election_id>/centers', methods=['POST'])
 @jwt_required()
@@ -93,20 +163,51 @@ def add_voting_center(election_id):
     try:
         data = request.get_json()
         data['election_id'] = election_id
+        check_commune(data.get('commune_id'))
         
         center = VotingCenter(**data)
         db.session.add(center)
+        response_cache.invalidate_on_commit(db.session, election_id)
         db.session.commit()
 
         return jsonify({
             'message': 'Voting center added successfully',
-            'center': VotingCenterSchema().dump(center)
+            'center': center_summary_schema.dump(center)
         }), 201
 
+    except AreaError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': str(e)}), 500
 
+@election_bp.route('/<int:election_id>/centers', methods=['GET'])
+@jwt_required()
+def get_voting_centers(election_id):
+    try:
+        fields, expand = expansion_args(request)
+        schema = build_schema(VotingCenterSchema, fields, expand, many=True)
+        query = VotingCenter.query.options(*eager_options(VotingCenter, expand)).filter_by(election_id=election_id)
+        centers, next_cursor = paginate(query, VotingCenter, request)
+        return jsonify(schema.dump(centers)), 200, next_page_headers(request, next_cursor)
+    except (ExpansionError, PaginationError) as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
+
+@election_bp.route('/centers/<int:center_id>', methods=['GET'])
+@jwt_required()
+def get_voting_center(center_id):
+    try:
+        fields, expand = expansion_args(request, VOTING_CENTER_DETAIL_EXPAND)
+        schema = build_schema(VotingCenterSchema, fields, expand)
+        center = VotingCenter.query.options(*eager_options(VotingCenter, expand)).get_or_404(center_id)
+        return jsonify(schema.dump(center)), 200
+    except ExpansionError as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
+
 # Voting office routes
 @election_bp.route('/centers/<int:center_id>/offices', methods=['POST'])
 @jwt_required()
@@ -117,6 +218,8 @@ def add_voting_office(center_id):
         
         office = VotingOffice(**data)
         db.session.add(office)
+        center = VotingCenter.query.get(center_id)
+        response_cache.invalidate_on_commit(db.session, center.election_id if center else None)
         db.session.commit()
 
         return jsonify({
@@ -128,30 +231,38 @@ def add_voting_office(center_id):
         db.session.rollback()
         return jsonify({'message': str(e)}), 500
 
+@election_bp.route('/centers/<int:center_id>/offices', methods=['GET'])
+@jwt_required()
+def get_voting_offices(center_id):
+    try:
+        fields, expand = expansion_args(request)
+        schema = build_schema(VotingOfficeSchema, fields, expand, many=True)
+        query = VotingOffice.query.options(*eager_options(VotingOffice, expand)).filter_by(center_id=center_id)
+        offices, next_cursor = paginate(query, VotingOffice, request)
+        return jsonify(schema.dump(offices)), 200, next_page_headers(request, next_cursor)
+    except (ExpansionError, PaginationError) as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
+
 # Voting results routes
 @election_bp.route('/offices/<int:office_id>/results', methods=['POST'])
 @jwt_required()
 def add_voting_results(office_id):
     try:
-        data = request.get_json()
-        office = VotingOffice.query.get_or_404(office_id)
-        
-        # Update office statistics
-        office.total_voters = data.get('total_voters', 0)
-        office.blank_votes = data.get('blank_votes', 0)
-        office.null_votes = data.get('null_votes', 0)
+        data, errors = validate_office_results(office_id, request.get_json())
+        if errors:
+            return jsonify({'message': 'Validation error', 'errors': errors}), 400
         
-        # Add candidate results
-        results = data.get('results', [])
-        for result in results:
-            result['office_id'] = office_id
-            voting_result = VotingResult(**result)
-            db.session.add(voting_result)
+        # Missing statistics are reset to 0; results of candidates not submitted are kept
+        data = dict(data, **{field: data.get(field, 0) for field in STAT_FIELDS})
+        if write_office_results(office_id, data, replace=False, user_id=get_jwt_identity()) == 'not_found':
+            return jsonify({'message': 'Voting office not found'}), 404
         
         db.session.commit()
         return jsonify({
             'message': 'Voting results added successfully',
-            'office': VotingOfficeSchema().dump(office)
+            'office': VotingOfficeSchema().dump(load_office(office_id))
         }), 201
 
     except Exception as e:
@@ -160,47 +271,18 @@ def add_voting_results(office_id):
 
 # Get election results
 @election_bp.route('/<int:election_id>/results', methods=['GET'])
+@query_budget(8)
 @jwt_required()
+@response_cache.cached(lambda: request.view_args['election_id'])
 def get_election_results(election_id):
     try:
         election = Election.query.get_or_404(election_id)
-        centers = VotingCenter.query.filter_by(election_id=election_id).all()
-        
-        results = {
-            'election': election_schema.dump(election),
-            'total_voters': 0,
-            'blank_votes': 0,
-            'null_votes': 0,
-            'candidate_results': {},
-            'centers': []
-        }
-        
-        for center in centers:
-            center_data = VotingCenterSchema().dump(center)
-            center_total_voters = 0
-            center_blank_votes = 0
-            center_null_votes = 0
-            
-            for office in center.voting_offices:
-                center_total_voters += office.total_voters
-                center_blank_votes += office.blank_votes
-                center_null_votes += office.null_votes
-                
-                for result in office.results:
-                    candidate_id = result.candidate_id
-                    if candidate_id not in results['candidate_results']:
-                        results['candidate_results'][candidate_id] = 0
-                    results['candidate_results'][candidate_id] += result.votes
-            
-            center_data['total_voters'] = center_total_voters
-            center_data['blank_votes'] = center_blank_votes
-            center_data['null_votes'] = center_null_votes
-            results['centers'].append(center_data)
-            
-            results['total_voters'] += center_total_voters
-            results['blank_votes'] += center_blank_votes
-            results['null_votes'] += center_null_votes
-        
+        include = request.args.get('include', '').split(',')
+
+        # Aggregated in SQL: a constant number of grouped queries whatever the number of offices
+        results = {'election': election_summary_schema.dump(election)}
+        results.update(election_results(election_id, include_offices='offices' in include))
+
         return jsonify(results), 200
 
     except Exception as e:
@@ -0,0 +1,99 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required
+from app.models.election import Area, VotingCenter
+from app.schemas import AreaSchema, VotingCenterSchema
+from app import db, response_cache
+from app.utils.auth import role_required
+from app.utils.geography import AreaError, area_results, check_commune, check_parent
+from app.utils.pagination import PaginationError, paginate, next_page_headers
+from app.utils.profiling import query_budget
+from app.utils.tally import move_center_tally
+
+geography_bp = Blueprint('geography', __name__)
+area_schema = AreaSchema()
+areas_schema = AreaSchema(many=True)
+center_schema = VotingCenterSchema(exclude=('voting_offices', 'election'))
+
+@geography_bp.route('/areas', methods=['POST'])
+@role_required('director')
+def create_area():
+    try:
+        data = request.get_json()
+        errors = area_schema.validate(data)
+        if errors:
+            return jsonify({'message': 'Validation error', 'errors': errors}), 400
+        check_parent(data['level'], data.get('parent_id'))
+        if Area.query.filter_by(parent_id=data.get('parent_id'), name=data['name']).first():
+            return jsonify({'message': 'Area already exists'}), 400
+
+        area = Area(**data)
+        db.session.add(area)
+        db.session.commit()
+
+        return jsonify({
+            'message': 'Area created successfully',
+            'area': area_schema.dump(area)
+        }), 201
+
+    except AreaError as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 500
+
+@geography_bp.route('/areas', methods=['GET'])
+@jwt_required()
+def get_areas():
+    try:
+        query = Area.query
+        if request.args.get('level'):
+            query = query.filter_by(level=request.args['level'])
+        if request.args.get('parent_id'):
+            query = query.filter_by(parent_id=request.args.get('parent_id', type=int))
+        areas, next_cursor = paginate(query, Area, request)
+        return jsonify(areas_schema.dump(areas)), 200, next_page_headers(request, next_cursor)
+    except PaginationError as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
+
+@geography_bp.route('/centers/<int:center_id>/commune', methods=['PUT'])
+@role_required('director')
+def set_center_commune(center_id):
+    try:
+        center = VotingCenter.query.get_or_404(center_id)
+        commune_id = (request.get_json() or {}).get('commune_id')
+        check_commune(commune_id)
+
+        # The center's totals move from its previous commune and province to the new ones
+        move_center_tally(center, commune_id)
+        db.session.commit()
+
+        return jsonify({
+            'message': 'Voting center updated successfully',
+            'center': center_schema.dump(center)
+        }), 200
+
+    except AreaError as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 500
+
+@geography_bp.route('/results/<int:election_id>', methods=['GET'])
+@geography_bp.route('/results/<int:election_id>/<level>/<int:area_id>', methods=['GET'])
+@query_budget(8)
+@jwt_required()
+@response_cache.cached(lambda: request.view_args['election_id'])
+def get_area_results(election_id, level=None, area_id=None):
+    try:
+        # Totals of the area and of its children, read from the roll-up counters
+        results = area_results(election_id, level, area_id)
+        if results is None:
+            return jsonify({'message': 'Area not found'}), 404
+        return jsonify(results), 200
+
+    except AreaError as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
@@ -0,0 +1,80 @@
+import mimetypes
+import os
+import re
+from flask import Blueprint, request, jsonify, current_app, make_response, redirect
+from flask_jwt_extended import jwt_required
+from werkzeug.security import safe_join
+from werkzeug.utils import send_file
+from app import file_storage
+from app.utils.file_storage import UploadError
+from app.utils.images import UPLOAD_FOLDERS
+
+media_bp = Blueprint('media', __name__)
+upload_bp = Blueprint('upload', __name__)
+
+# Content-addressed originals: the name is the SHA-256 of the bytes, they never change
+HASHED_NAME = re.compile(r'^(?P<digest>[0-9a-f]{64})\.[a-z]+$')
+
+@media_bp.route('/<folder>/<filename>', methods=['GET'])
+def get_media(folder, filename):
+    if folder not in UPLOAD_FOLDERS or safe_join(folder, filename) is None:
+        return jsonify({'message': 'File not found'}), 404
+    path = file_storage.local_path(f'uploads/{folder}/{filename}')
+    if path is None:
+        # Object storage: the client downloads straight from the bucket (or its CDN)
+        response = redirect(file_storage.url(f'uploads/{folder}/{filename}'))
+        response.cache_control.private = True
+        response.cache_control.max_age = current_app.config['S3_URL_EXPIRES'] // 2
+        return response
+    if not os.path.isfile(path):
+        return jsonify({'message': 'File not found'}), 404
+
+    hashed = HASHED_NAME.match(filename)
+    if hashed:
+        etag = hashed.group('digest')
+        max_age = current_app.config['MEDIA_IMMUTABLE_MAX_AGE']
+    else:
+        # Variants and legacy uploads can be rewritten in place: revalidate after max_age
+        stat = os.stat(path)
+        etag = f'{int(stat.st_mtime_ns)}-{stat.st_size}'
+        max_age = current_app.config['MEDIA_MAX_AGE']
+
+    offload = current_app.config['MEDIA_OFFLOAD']
+    if offload == 'x-accel':
+        # nginx serves the bytes (and ranges) from an internal location mapped to UPLOAD_FOLDER
+        response = make_response('')
+        if etag in request.if_none_match:
+            response.status_code = 304
+        else:
+            response.headers['X-Accel-Redirect'] = f"{current_app.config['MEDIA_ACCEL_PREFIX']}/{folder}/{filename}"
+            response.mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        response.set_etag(etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+    else:
+        response = send_file(
+            path, request.environ, etag=etag, max_age=max_age, conditional=True,
+            use_x_sendfile=offload == 'x-sendfile', response_class=current_app.response_class
+        )
+        response.accept_ranges = 'bytes'
+
+    if hashed:
+        response.cache_control.immutable = True
+    return response
+
+
+@upload_bp.route('/presign', methods=['POST'])
+@jwt_required()
+def presign_upload():
+    try:
+        data = request.get_json() or {}
+        upload = file_storage.presign(
+            data.get('folder'), data.get('sha256'), int(data.get('size') or 0), data.get('content_type')
+        )
+        if upload is None:
+            return jsonify({'message': 'Direct uploads require an object storage backend'}), 501
+        return jsonify(upload), 200
+    except (UploadError, ValueError) as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
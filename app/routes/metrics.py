@@ -0,0 +1,18 @@
+import hmac
+from flask import Blueprint, Response, current_app, request, jsonify
+from app import metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    # Scraped by Prometheus: optional static bearer token instead of a user JWT
+    if metrics.token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {metrics.token}'):
+        return jsonify({'message': 'Unauthorized access'}), 403
+    try:
+        body, content_type = metrics.render()
+        return Response(body, content_type=content_type)
+    except Exception:
+        # Details go to the log only: the endpoint may be reachable without a user JWT
+        current_app.logger.exception('Metrics rendering failed')
+        return jsonify({'message': 'Metrics unavailable'}), 500
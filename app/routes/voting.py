@@ -1,47 +1,137 @@
-from flask import Blueprint, request, jsonify
+import json
+from datetime import datetime
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context, url_for
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.models.election import VotingOffice, VotingResult
-from app.schemas import VotingOfficeSchema, VotingResultSchema
-from app import db
-from sqlalchemy import func
+from app.models.election import VotingOffice
+from app.models.audit import ResultAudit
+from app.schemas import ResultAuditSchema, VotingOfficeSchema, VotingResultSchema
+from app import db, events, response_cache, submission_queue
+from app.utils.auth import role_required
+from app.utils.events import election_channel
+from app.utils.pagination import PaginationError, paginate, next_page_headers
+from app.utils.profiling import query_budget
+from app.utils.tally import get_tally_history, get_tally_snapshot
+from app.utils.results import (
+    BatchFormatError, load_office, parse_batch_payload, validate_batch, validate_office_results, write_office_batch,
+    write_office_results
+)
 
 voting_bp = Blueprint('voting', __name__)
 office_schema = VotingOfficeSchema()
 result_schema = VotingResultSchema()
+audits_schema = ResultAuditSchema(many=True)
 
 @voting_bp.route('/office/<int:office_id>/results', methods=['POST'])
+# 11 in general; the worst case also deletes removed candidates and records a snapshot
+@query_budget(15)
 @jwt_required()
 def submit_results(office_id):
     try:
-        office = VotingOffice.query.get_or_404(office_id)
-        data = request.get_json()
-
-        # Update office statistics
-        office.total_voters = data.get('total_voters', 0)
-        office.blank_votes = data.get('blank_votes', 0)
-        office.null_votes = data.get('null_votes', 0)
-
-        # Delete existing results if any
-        VotingResult.query.filter_by(office_id=office_id).delete()
+        data, errors = validate_office_results(office_id, request.get_json())
+        if errors:
+            return jsonify({'message': 'Validation error', 'errors': errors}), 400
+        if submission_queue.enabled:
+            return _enqueue_results(office_id, data)
 
-        # Add new results
-        results = data.get('results', [])
-        for result_data in results:
-            result_data['office_id'] = office_id
-            result = VotingResult(**result_data)
-            db.session.add(result)
+        # Upsert the submitted results; candidates missing from the payload are removed
+        if write_office_results(office_id, data, replace=True, user_id=get_jwt_identity()) == 'not_found':
+            return jsonify({'message': 'Voting office not found'}), 404
 
         db.session.commit()
         return jsonify({
             'message': 'Voting results submitted successfully',
-            'office': office_schema.dump(office)
+            'office': office_schema.dump(load_office(office_id))
         }), 200
 
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': str(e)}), 500
 
+def _enqueue_results(office_id, data):
+    # Validated by the caller, written later by the queue's background writer
+    submission_id = submission_queue.enqueue(office_id, data, get_jwt_identity())
+    return jsonify({
+        'message': 'Voting results accepted for processing',
+        'submission_id': submission_id,
+        'status_url': url_for('voting.get_submission', submission_id=submission_id)
+    }), 202
+
+@voting_bp.route('/submissions/<submission_id>', methods=['GET'])
+@jwt_required()
+def get_submission(submission_id):
+    try:
+        submission = submission_queue.get(submission_id) if submission_queue.enabled else None
+        if not submission:
+            return jsonify({'message': 'Submission not found'}), 404
+        return jsonify(submission), 200
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
+
+@voting_bp.route('/results/batch', methods=['POST'])
+@query_budget(20)
+@jwt_required()
+def submit_results_batch():
+    try:
+        try:
+            entries = parse_batch_payload(request)
+        except BatchFormatError as e:
+            return jsonify({'message': str(e)}), 400
+
+        max_offices = current_app.config['RESULTS_BATCH_MAX_OFFICES']
+        if len(entries) > max_offices:
+            return jsonify({'message': f'Batch too large (max {max_offices} offices)'}), 413
+
+        valid, statuses = validate_batch(entries)
+        written = write_office_batch(valid, user_ids=dict.fromkeys(valid, get_jwt_identity()))
+        db.session.commit()
+
+        for status in statuses:
+            if 'status' not in status:
+                office_status = written[status['office_id']]
+                superseded = valid[status['office_id']][0] != status['index']
+                status['status'] = 'superseded' if superseded else office_status
+
+        accepted = sum(1 for status in statuses if status['status'] in ('ok', 'superseded'))
+        if accepted == len(statuses):
+            code = 200
+        elif accepted:
+            code = 207
+        else:
+            code = 400
+        return jsonify({
+            'message': f'{accepted}/{len(statuses)} offices accepted',
+            'offices': statuses
+        }), code
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 500
+
+@voting_bp.route('/audit', methods=['GET'])
+@role_required('director')
+def get_audit_log():
+    try:
+        try:
+            filters = {name: request.args.get(name, type=int) for name in ('office_id', 'user_id', 'election_id')}
+            start = datetime.fromisoformat(request.args['from']) if request.args.get('from') else None
+            end = datetime.fromisoformat(request.args['to']) if request.args.get('to') else None
+        except ValueError:
+            return jsonify({'message': 'Invalid from or to'}), 400
+
+        query = ResultAudit.query.filter_by(**{name: value for name, value in filters.items() if value is not None})
+        if start is not None:
+            query = query.filter(ResultAudit.created_at >= start)
+        if end is not None:
+            query = query.filter(ResultAudit.created_at <= end)
+        audits, next_cursor = paginate(query, ResultAudit, request)
+        return jsonify(audits_schema.dump(audits)), 200, next_page_headers(request, next_cursor)
+    except PaginationError as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
+
 @voting_bp.route('/office/<int:office_id>/results', methods=['GET'])
+@query_budget(6)
 @jwt_required()
 def get_office_results(office_id):
     try:
@@ -53,68 +143,101 @@ def get_office_results(office_id):
         return jsonify({'message': str(e)}), 500
 
 @voting_bp.route('/realtime/<int:election_id>', methods=['GET'])
+@query_budget(4)
 @jwt_required()
+@response_cache.cached(lambda: request.view_args['election_id'])
 def get_realtime_results(election_id):
     try:
-        # Get total statistics
-        total_stats = db.session.query(
-            func.sum(VotingOffice.total_voters).label('total_voters'),
-            func.sum(VotingOffice.blank_votes).label('blank_votes'),
-            func.sum(VotingOffice.null_votes).label('null_votes')
-        ).join(VotingOffice.center).filter_by(election_id=election_id).first()
-
-        # Get results by candidate
-        candidate_results = db.session.query(
-            VotingResult.candidate_id,
-            func.sum(VotingResult.votes).label('total_votes')
-        ).join(VotingOffice).join(VotingOffice.center).filter_by(election_id=election_id).group_by(VotingResult.candidate_id).all()
-
-        results = {
-            'total_voters': total_stats.total_voters or 0,
-            'blank_votes': total_stats.blank_votes or 0,
-            'null_votes': total_stats.null_votes or 0,
-            'candidate_results': {str(cr.candidate_id): cr.total_votes for cr in candidate_results}
-        }
-
+        # Read the materialized tally maintained on every result write
+        results = get_tally_snapshot(election_id)
         return jsonify(results), 200
 
     except Exception as e:
         return jsonify({'message': str(e)}), 500
 
+@voting_bp.route('/realtime/<int:election_id>/history', methods=['GET'])
+@query_budget(5)
+@jwt_required()
+@response_cache.cached(lambda: request.view_args['election_id'])
+def get_results_history(election_id):
+    try:
+        try:
+            start = datetime.fromisoformat(request.args['from']) if request.args.get('from') else None
+            end = datetime.fromisoformat(request.args['to']) if request.args.get('to') else None
+            resolution = int(request.args['resolution']) if request.args.get('resolution') else None
+        except ValueError:
+            return jsonify({'message': 'Invalid from, to or resolution'}), 400
+        if resolution is not None and resolution < 1:
+            return jsonify({'message': 'Invalid from, to or resolution'}), 400
+
+        # Downsampled from the snapshot history: one range scan on (election_id, taken_at)
+        history = get_tally_history(
+            election_id, start, end, resolution, current_app.config['TALLY_HISTORY_MAX_POINTS']
+        )
+        return jsonify(history), 200
+
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
+
+def _sse(event, data):
+    return f'event: {event}\nid: {data.get("version", 0)}\ndata: {json.dumps(data)}\n\n'
+
+@voting_bp.route('/stream/<int:election_id>', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])
+def stream_results(election_id):
+    # Subscribe before reading the snapshot so that no change is missed;
+    # clients ignore deltas whose version is not above the snapshot's
+    subscription = events.open_stream(election_channel(election_id))
+    if subscription is None:
+        # Every stream holds a worker thread: beyond the cap, API requests would starve
+        return jsonify({'message': 'Too many open streams, retry later'}), 503, {'Retry-After': '5'}
+    try:
+        snapshot = get_tally_snapshot(election_id)
+        # Release the database connection for the lifetime of the stream
+        db.session.remove()
+    except Exception as e:
+        subscription.close()
+        return jsonify({'message': str(e)}), 500
+
+    heartbeat = current_app.config['EVENTS_HEARTBEAT_SECONDS']
+
+    def generate():
+        try:
+            yield _sse('snapshot', snapshot)
+            while True:
+                message = subscription.get(timeout=heartbeat)
+                if message is None:
+                    yield ': keep-alive\n\n'
+                else:
+                    yield _sse('delta', message)
+        finally:
+            subscription.close()
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    # Also frees the slot when the client leaves before the first event
+    response.call_on_close(subscription.close)
+    return response
+
 @voting_bp.route('/office/<int:office_id>/results', methods=['PUT'])
+@query_budget(15)
 @jwt_required()
 def update_results(office_id):
     try:
-        office = VotingOffice.query.get_or_404(office_id)
-        data = request.get_json()
-
-        # Update office statistics
-        if 'total_voters' in data:
-            office.total_voters = data['total_voters']
-        if 'blank_votes' in data:
-            office.blank_votes = data['blank_votes']
-        if 'null_votes' in data:
-            office.null_votes = data['null_votes']
-
-        # Update results
-        if 'results' in data:
-            for result_data in data['results']:
-                result = VotingResult.query.filter_by(
-                    office_id=office_id,
-                    candidate_id=result_data['candidate_id']
-                ).first()
-                
-                if result:
-                    result.votes = result_data['votes']
-                else:
-                    result_data['office_id'] = office_id
-                    new_result = VotingResult(**result_data)
-                    db.session.add(new_result)
+        data, errors = validate_office_results(office_id, request.get_json())
+        if errors:
+            return jsonify({'message': 'Validation error', 'errors': errors}), 400
+
+        # Only the statistics and candidates present in the payload are updated
+        if write_office_results(office_id, data, replace=False, user_id=get_jwt_identity()) == 'not_found':
+            return jsonify({'message': 'Voting office not found'}), 404
 
         db.session.commit()
         return jsonify({
             'message': 'Results updated successfully',
-            'office': office_schema.dump(office)
+            'office': office_schema.dump(load_office(office_id))
         }), 200
 
     except Exception as e:
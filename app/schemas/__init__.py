@@ -1,7 +1,20 @@
 from marshmallow import Schema, fields, validate, EXCLUDE
 from datetime import datetime
+from app import image_pipeline
+from app.utils.profiling import serializing
 
-class UserSchema(Schema):
+# Relations serialized by default on detail views; list views include none (see ?expand=)
+ELECTION_DETAIL_EXPAND = ('candidates', 'voting_centers')
+CANDIDATE_DETAIL_EXPAND = ('election',)
+VOTING_CENTER_DETAIL_EXPAND = ('voting_offices',)
+
+class BaseSchema(Schema):
+    # Dump time is reported as the request's serialization time (Server-Timing)
+    def dump(self, obj, *, many=None):
+        with serializing():
+            return super().dump(obj, many=many)
+
+class UserSchema(BaseSchema):
     class Meta:
         unknown = EXCLUDE
 
@@ -14,6 +27,8 @@ class UserSchema(Schema):
     password_hash = fields.Str(dump_only=True)
     campaign_logo = fields.Str(allow_none=True)
     profile_photo = fields.Str(allow_none=True)
+    campaign_logo_variants = fields.Function(lambda user: image_pipeline.variant_paths(user.campaign_logo), dump_only=True)
+    profile_photo_variants = fields.Function(lambda user: image_pipeline.variant_paths(user.profile_photo), dump_only=True)
     province = fields.Str(required=True)
     commune = fields.Str(required=True)
     # campaign_start_date = fields.String(allow_none=True)
@@ -22,7 +37,7 @@ class UserSchema(Schema):
     created_at = fields.DateTime(dump_only=True)
     updated_at = fields.DateTime(dump_only=True)
 
-class ElectionSchema(Schema):
+class ElectionSchema(BaseSchema):
     id = fields.Int(dump_only=True)
     title = fields.Str(required=True)
     type = fields.Str(required=True, validate=validate.OneOf(['legislative', 'municipal', 'local', 'presidential']))
@@ -42,12 +57,13 @@ class ElectionSchema(Schema):
 #     election_id = fields.Int(required=True)
 #     created_at = fields.DateTime(dump_only=True)
 #     updated_at = fields.DateTime(dump_only=True)
-class CandidateSchema(Schema):
+class CandidateSchema(BaseSchema):
     id = fields.Int(dump_only=True)
     first_name = fields.Str(required=True)
     last_name = fields.Str(required=True)
     code_name = fields.Str(required=True)
     profile_photo = fields.Str()
+    profile_photo_variants = fields.Function(lambda candidate: image_pipeline.variant_paths(candidate.profile_photo), dump_only=True)
     election_id = fields.Int(required=True)
     created_at = fields.DateTime(dump_only=True)
     updated_at = fields.DateTime(dump_only=True)
@@ -63,10 +79,19 @@ class CandidateSchema(Schema):
 #     created_at = fields.DateTime(dump_only=True)
 #     updated_at = fields.DateTime(dump_only=True)
 #     voting_offices = fields.Nested('VotingOfficeSchema', many=True, exclude=('center',))
-class VotingCenterSchema(Schema):
+class AreaSchema(BaseSchema):
+    id = fields.Int(dump_only=True)
+    name = fields.Str(required=True, validate=validate.Length(min=1, max=100))
+    level = fields.Str(required=True, validate=validate.OneOf(['province', 'commune']))
+    parent_id = fields.Int(allow_none=True)
+    created_at = fields.DateTime(dump_only=True)
+    updated_at = fields.DateTime(dump_only=True)
+
+class VotingCenterSchema(BaseSchema):
     id = fields.Int(dump_only=True)
     name = fields.Str(required=True)
     election_id = fields.Int(required=True)
+    commune_id = fields.Int(allow_none=True)
     created_at = fields.DateTime(dump_only=True)
     updated_at = fields.DateTime(dump_only=True)
     voting_offices = fields.Nested('VotingOfficeSchema', many=True, exclude=('center',))
@@ -75,7 +100,7 @@ class VotingCenterSchema(Schema):
     election = fields.Nested('ElectionSchema', only=("id", "title"), dump_only=True)
 
 
-class VotingOfficeSchema(Schema):
+class VotingOfficeSchema(BaseSchema):
     id = fields.Int(dump_only=True)
     name = fields.Str(required=True)
     center_id = fields.Int(required=True)
@@ -85,12 +110,23 @@ class VotingOfficeSchema(Schema):
     created_at = fields.DateTime(dump_only=True)
     updated_at = fields.DateTime(dump_only=True)
     center = fields.Nested('VotingCenterSchema', exclude=('voting_offices',), dump_only=True)
-    results = fields.Nested('VotingResultSchema', many=True, exclude=('office',))
+    results = fields.Nested('VotingResultSchema', many=True)
 
-class VotingResultSchema(Schema):
+class VotingResultSchema(BaseSchema):
     id = fields.Int(dump_only=True)
     office_id = fields.Int(required=True)
-    candidate_id = fields.Int(required=True)
-    votes = fields.Int(required=True)
+    # Strict: the validated payload is written as is, "12" must not pass for 12
+    candidate_id = fields.Int(required=True, strict=True)
+    votes = fields.Int(required=True, strict=True, validate=validate.Range(min=0))
     created_at = fields.DateTime(dump_only=True)
     updated_at = fields.DateTime(dump_only=True)
+
+class ResultAuditSchema(BaseSchema):
+    id = fields.Int(dump_only=True)
+    office_id = fields.Int()
+    election_id = fields.Int()
+    user_id = fields.Int(allow_none=True)
+    action = fields.Str()
+    before = fields.Dict()
+    after = fields.Dict()
+    created_at = fields.DateTime(dump_only=True)
@@ -0,0 +1,91 @@
+from sqlalchemy import func
+from app import db
+from app.models.election import VotingCenter, VotingOffice, VotingResult
+from app.schemas import VotingCenterSchema, VotingOfficeSchema
+from app.utils.tally import STAT_FIELDS
+
+center_schema = VotingCenterSchema(exclude=('voting_offices', 'election'))
+office_schema = VotingOfficeSchema(only=('id', 'name', 'center_id', 'created_at', 'updated_at') + STAT_FIELDS)
+
+
+def center_totals(election_id):
+    """Totaux par centre en une seule requête groupée"""
+    return db.session.query(
+        VotingCenter.id,
+        VotingCenter.name,
+        VotingCenter.election_id,
+        VotingCenter.created_at,
+        VotingCenter.updated_at,
+        func.coalesce(func.sum(VotingOffice.total_voters), 0).label('total_voters'),
+        func.coalesce(func.sum(VotingOffice.blank_votes), 0).label('blank_votes'),
+        func.coalesce(func.sum(VotingOffice.null_votes), 0).label('null_votes')
+    ).outerjoin(VotingOffice, VotingOffice.center_id == VotingCenter.id) \
+        .filter(VotingCenter.election_id == election_id) \
+        .group_by(VotingCenter.id) \
+        .order_by(VotingCenter.id).all()
+
+
+def center_candidate_totals(election_id):
+    """Voix par (centre, candidat) en une seule requête groupée"""
+    rows = db.session.query(
+        VotingOffice.center_id,
+        VotingResult.candidate_id,
+        func.sum(VotingResult.votes).label('votes')
+    ).join(VotingOffice, VotingOffice.id == VotingResult.office_id) \
+        .join(VotingCenter, VotingCenter.id == VotingOffice.center_id) \
+        .filter(VotingCenter.election_id == election_id) \
+        .group_by(VotingOffice.center_id, VotingResult.candidate_id).all()
+
+    totals = {}
+    for row in rows:
+        totals.setdefault(row.center_id, {})[row.candidate_id] = row.votes or 0
+    return totals
+
+
+def office_breakdown(election_id):
+    """Bureaux d'une élection avec leurs voix par candidat, regroupés par centre (deux requêtes)"""
+    offices = VotingOffice.query.join(VotingCenter, VotingCenter.id == VotingOffice.center_id) \
+        .filter(VotingCenter.election_id == election_id) \
+        .order_by(VotingOffice.id).all()
+
+    votes = {}
+    rows = db.session.query(VotingResult.office_id, VotingResult.candidate_id, VotingResult.votes) \
+        .join(VotingOffice, VotingOffice.id == VotingResult.office_id) \
+        .join(VotingCenter, VotingCenter.id == VotingOffice.center_id) \
+        .filter(VotingCenter.election_id == election_id)
+    for office_id, candidate_id, count in rows:
+        office_votes = votes.setdefault(office_id, {})
+        office_votes[candidate_id] = office_votes.get(candidate_id, 0) + (count or 0)
+
+    by_center = {}
+    for office in offices:
+        office_data = office_schema.dump(office)
+        office_data['candidate_results'] = votes.get(office.id, {})
+        by_center.setdefault(office.center_id, []).append(office_data)
+    return by_center
+
+
+def election_results(election_id, include_offices=False):
+    """Résultats nationaux et par centre calculés en un nombre constant de requêtes"""
+    results = dict.fromkeys(STAT_FIELDS, 0)
+    results['candidate_results'] = {}
+    results['centers'] = []
+
+    candidate_totals = center_candidate_totals(election_id)
+    offices = office_breakdown(election_id) if include_offices else None
+
+    for center in center_totals(election_id):
+        center_data = center_schema.dump(center)
+        for field in STAT_FIELDS:
+            center_data[field] = getattr(center, field)
+            results[field] += center_data[field]
+
+        center_data['candidate_results'] = candidate_totals.get(center.id, {})
+        for candidate_id, votes in center_data['candidate_results'].items():
+            results['candidate_results'][candidate_id] = results['candidate_results'].get(candidate_id, 0) + votes
+
+        if offices is not None:
+            center_data['voting_offices'] = offices.get(center.id, [])
+        results['centers'].append(center_data)
+
+    return results
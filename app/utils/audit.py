@@ -0,0 +1,114 @@
+import atexit
+import logging
+from datetime import datetime
+from sqlalchemy import delete, insert
+from app.utils.background import BackgroundWorker
+from app.utils.transaction import after_commit
+
+logger = logging.getLogger(__name__)
+
+
+def audit_state(state):
+    """État d'un bureau sous forme sérialisable (clés JSON en chaînes)"""
+    audited = {field: value for field, value in state.items() if field != 'votes'}
+    audited['votes'] = {str(candidate_id): votes for candidate_id, votes in sorted(state['votes'].items())}
+    return audited
+
+
+class AuditLog:
+    """Journal en ajout seul des modifications de résultats.
+
+    Les traces d'une transaction de résultats sont écrites dans la même
+    transaction, en une seule ligne de la table d'attente result_audit_outbox ;
+    un thread de fond par processus les copie ensuite par lots
+    (AUDIT_BATCH_SIZE) dans result_audit et supprime la ligne d'attente, dans
+    une même transaction. Une trace validée n'est donc jamais perdue : un lot
+    en échec, ou laissé par un processus arrêté, est repris au passage suivant.
+    Avec AUDIT_ASYNC=False, les traces sont écrites directement dans result_audit.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.worker = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.run_async = app.config.get('AUDIT_ASYNC', True)
+        self.batch_size = app.config.get('AUDIT_BATCH_SIZE', 500)
+        self.worker = BackgroundWorker('result-audit', self.flush, app.config.get('AUDIT_INTERVAL', 0.5))
+        # Pending records are moved on exit, those of a killed process on the next startup
+        atexit.register(self.drain)
+        if self.run_async and self.pending_count():
+            self._wake()
+
+    def record(self, session, records):
+        """Enregistre des traces (dictionnaires de colonnes) avec la transaction courante"""
+        if not records:
+            return
+        from app.models.audit import ResultAudit, ResultAuditOutbox
+        if not self.run_async:
+            session.execute(insert(ResultAudit), records)
+            return
+        session.execute(insert(ResultAuditOutbox), [{
+            'records': [dict(record, created_at=record['created_at'].isoformat()) for record in records],
+            'created_at': records[0]['created_at']
+        }])
+        after_commit(session, self._wake)
+
+    def _wake(self):
+        self.worker.ensure_started()
+        self.worker.wake()
+
+    def pending_count(self):
+        """Lignes en attente de copie (0 si la table n'existe pas encore, avant les migrations)"""
+        from app import db
+        from app.models.audit import ResultAuditOutbox
+        with self.app.app_context():
+            try:
+                return db.session.query(ResultAuditOutbox.id).count()
+            except Exception:
+                db.session.rollback()
+                return 0
+
+    def flush(self):
+        """Copie un lot de traces en attente dans result_audit et retourne le nombre de lignes traitées"""
+        from app import db
+        from app.models.audit import ResultAudit, ResultAuditOutbox
+        with self.app.app_context():
+            try:
+                # SKIP LOCKED: the workers of other processes move other rows meanwhile
+                pending = db.session.query(ResultAuditOutbox).order_by(ResultAuditOutbox.id) \
+                    .limit(self.batch_size).with_for_update(skip_locked=True).all()
+                ids = []
+                records = []
+                for row in pending:
+                    if records and len(records) + len(row.records) > self.batch_size:
+                        break
+                    ids.append(row.id)
+                    records.extend(dict(record, created_at=datetime.fromisoformat(record['created_at']))
+                                   for record in row.records)
+                if not ids:
+                    db.session.rollback()
+                    return 0
+                db.session.execute(insert(ResultAudit), records)
+                db.session.execute(delete(ResultAuditOutbox).where(ResultAuditOutbox.id.in_(ids)))
+                db.session.commit()
+                return len(ids)
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Échec de copie des traces d'audit en attente, nouvel essai au prochain passage: {str(e)}")
+                raise
+
+    def drain(self):
+        """Copie immédiatement toutes les traces en attente"""
+        # Also called at exit by CLI commands run before the migrations (no outbox table yet)
+        if not self.pending_count():
+            return
+        try:
+            while self.flush():
+                pass
+        except Exception:
+            # Left in result_audit_outbox, moved on the next startup
+            pass
@@ -0,0 +1,76 @@
+from collections import namedtuple
+from functools import partial, wraps
+from flask import jsonify
+from flask_jwt_extended import current_user, verify_jwt_in_request
+from app.utils.cache import MemoryCacheBackend
+from app.utils.metrics import metrics
+from app.utils.transaction import after_commit
+
+CurrentUser = namedtuple('CurrentUser', 'id role first_name last_name')
+
+# Cached marker for users that no longer exist (avoids a query per request with a stale token)
+DELETED = False
+
+
+def identity_claims(user):
+    """Claims ajoutés aux jetons : rôle et identité de base, lisibles sans accès à la base"""
+    return {'role': user.role, 'name': f'{user.first_name} {user.last_name}'}
+
+
+class UserLookup:
+    """Chargement de l'utilisateur authentifié pour flask_jwt_extended, avec cache TTL borné.
+
+    `current_user` est un CurrentUser léger et non une instance ORM. Un
+    changement de rôle ou une suppression est pris en compte immédiatement
+    dans le processus qui l'effectue (invalidation après commit) et au plus
+    après `AUTH_USER_CACHE_TTL` secondes dans les autres workers.
+    """
+
+    def __init__(self, app=None):
+        self.cache = None
+        self.ttl = 60
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.ttl = app.config.get('AUTH_USER_CACHE_TTL', 60)
+        self.cache = MemoryCacheBackend(app.config.get('AUTH_USER_CACHE_MAX_ENTRIES', 4096))
+        jwt = app.extensions['flask-jwt-extended']
+        jwt.user_lookup_loader(self.load)
+        jwt.user_lookup_error_loader(self.lookup_error)
+
+    def load(self, jwt_header, jwt_data):
+        user_id = int(jwt_data['sub'])
+        cached = self.cache.get(user_id)
+        metrics.count_cache('user', cached is not None)
+        if cached is None:
+            from app import db
+            from app.models.user import User
+            user = db.session.get(User, user_id)
+            cached = CurrentUser(user.id, user.role, user.first_name, user.last_name) if user else DELETED
+            self.cache.set(user_id, cached, self.ttl)
+        return cached or None
+
+    def lookup_error(self, jwt_header, jwt_data):
+        return jsonify({'message': 'User not found'}), 401
+
+    def invalidate(self, user_id):
+        if self.cache is not None:
+            self.cache.delete(int(user_id))
+
+    def invalidate_on_commit(self, session, user_id):
+        """Oublie l'utilisateur en cache une fois la transaction validée"""
+        after_commit(session, partial(self.invalidate, user_id))
+
+
+def role_required(*roles):
+    """Exige un jeton valide dont l'utilisateur a l'un des rôles donnés"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            verify_jwt_in_request()
+            if current_user.role not in roles:
+                return jsonify({'message': 'Unauthorized access'}), 403
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,46 @@
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundWorker:
+    """Thread de fond appelant `step()` en boucle.
+
+    `step` retourne le nombre d'éléments traités ; le thread attend `interval`
+    secondes lorsqu'il n'y a rien à faire. Le thread est (re)démarré à la
+    demande dans chaque processus, ce qui le rend compatible avec le fork des
+    workers gunicorn.
+    """
+
+    def __init__(self, name, step, interval=0.2):
+        self.name = name
+        self.step = step
+        self.interval = interval
+        self._pid = None
+        self._thread = None
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        with self._lock:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def wake(self):
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            try:
+                processed = self.step()
+            except Exception as e:
+                logger.error(f"Erreur dans le thread {self.name}: {str(e)}")
+                processed = 0
+            if not processed:
+                self._wake.wait(self.interval)
+                self._wake.clear()
@@ -0,0 +1,182 @@
+import hashlib
+import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import partial, wraps
+from flask import request, make_response
+from app.utils.metrics import metrics
+from app.utils.transaction import after_commit
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryCacheBackend:
+    """Cache LRU en mémoire avec expiration (TTL), propre à chaque processus.
+
+    Les générations sont tirées d'un compteur unique et seules les
+    `max_entries` dernières portées incrémentées sont conservées ; une portée
+    oubliée prend la génération plancher, supérieure à toutes celles déjà
+    attribuées : ses anciennes entrées ne peuvent plus être servies.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._generations = OrderedDict()
+        self._counter = 0
+        self._floor = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def generation(self, scope):
+        with self._lock:
+            return self._generations.get(scope, self._floor)
+
+    def bump(self, scope):
+        with self._lock:
+            self._counter += 1
+            self._generations[scope] = self._counter
+            self._generations.move_to_end(scope)
+            while len(self._generations) > self.max_entries:
+                self._generations.popitem(last=False)
+                # Every scope no longer tracked moves past the generations handed out so far
+                self._floor = self._counter
+
+
+class RedisCacheBackend:
+    """Cache partagé entre workers et instances ; `client` permet d'injecter fakeredis"""
+
+    def __init__(self, url=None, client=None, prefix='res_elec:cache:'):
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise RuntimeError("Le cache 'redis' nécessite le paquet redis")
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return pickle.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=max(1, int(ttl)))
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def generation(self, scope):
+        return int(self.client.get(f'{self.prefix}gen:{scope}') or 0)
+
+    def bump(self, scope):
+        self.client.incr(f'{self.prefix}gen:{scope}')
+
+
+class ResponseCache:
+    """Cache des réponses GET, invalidé par élection.
+
+    Chaque élection a un numéro de génération inclus dans les clés : toute
+    écriture la concernant l'incrémente, ce qui rend caduques toutes ses
+    entrées d'un coup. Les réponses portent un ETag ; une requête dont
+    l'en-tête If-None-Match correspond reçoit un 304 sans sérialisation.
+    """
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.ttl = 30
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config.get('RESPONSE_CACHE_BACKEND', 'memory')
+        self.ttl = app.config.get('RESPONSE_CACHE_TTL', 30)
+        if backend == 'memory':
+            self.backend = MemoryCacheBackend(app.config.get('RESPONSE_CACHE_MAX_ENTRIES', 1024))
+        elif backend == 'redis':
+            self.backend = RedisCacheBackend(app.config.get('RESPONSE_CACHE_REDIS_URL'))
+        elif backend == 'none':
+            self.backend = None
+        else:
+            raise ValueError(f'Backend de cache inconnu: {backend}')
+
+    def _key(self, election_id):
+        generation = self.backend.generation(f'election:{election_id}')
+        query = '&'.join(sorted(f'{k}={v}' for k, v in request.args.items(multi=True)))
+        return f'{election_id}:{generation}:{request.path}?{query}'
+
+    def cached(self, scope):
+        """Met en cache la vue pour l'élection retournée par `scope()` (pas de cache si None)"""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                election_id = scope() if self.backend is not None else None
+                if election_id is None:
+                    return view(*args, **kwargs)
+
+                try:
+                    key = self._key(election_id)
+                    entry = self.backend.get(key)
+                except Exception as e:
+                    logger.error(f"Cache indisponible: {str(e)}")
+                    return view(*args, **kwargs)
+
+                metrics.count_cache('response', entry is not None)
+                if entry is not None:
+                    status, body, headers, etag = entry
+                    if etag in request.if_none_match:
+                        response = make_response('', 304)
+                    else:
+                        response = make_response(body, status, headers)
+                    response.set_etag(etag)
+                    response.headers['Cache-Control'] = 'no-cache'
+                    response.headers['X-Cache'] = 'HIT'
+                    return response
+
+                response = make_response(view(*args, **kwargs))
+                if response.status_code == 200 and not response.is_streamed:
+                    etag = hashlib.sha1(response.get_data()).hexdigest()
+                    headers = [(k, v) for k, v in response.headers.items() if k not in ('Content-Length', 'Set-Cookie')]
+                    try:
+                        self.backend.set(key, (response.status_code, response.get_data(), headers, etag), self.ttl)
+                    except Exception as e:
+                        logger.error(f"Cache indisponible: {str(e)}")
+                    response.set_etag(etag)
+                    response.headers['Cache-Control'] = 'no-cache'
+                    response.headers['X-Cache'] = 'MISS'
+                    response.make_conditional(request)
+                return response
+            return wrapper
+        return decorator
+
+    def invalidate(self, election_id):
+        if self.backend is not None and election_id is not None:
+            self.backend.bump(f'election:{election_id}')
+
+    def invalidate_on_commit(self, session, election_id):
+        """Invalide les réponses d'une élection une fois la transaction validée"""
+        after_commit(session, partial(self.invalidate, election_id))
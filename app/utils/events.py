@@ -0,0 +1,147 @@
+import json
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """Abonnement à un canal ; `get` retourne le prochain message ou None après `timeout`"""
+
+    def __init__(self, broker, channel):
+        self.broker = broker
+        self.channel = channel
+        self.messages = queue.Queue(maxsize=1000)
+        self.on_close = None
+        self.closed = False
+
+    def deliver(self, message):
+        try:
+            self.messages.put_nowait(message)
+        except queue.Full:
+            # Slow consumer: drop the message rather than block the publisher
+            logger.warning(f"Abonné trop lent sur {self.channel}, message ignoré")
+
+    def get(self, timeout=None):
+        try:
+            return self.messages.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.broker.unsubscribe(self)
+        if self.on_close is not None:
+            self.on_close()
+
+
+class InProcessBroker:
+    """Diffusion en mémoire, limitée aux abonnés du même processus"""
+
+    def __init__(self):
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            subscription.deliver(message)
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel)
+        with self._lock:
+            self._subscriptions.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.channel, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self._subscriptions.pop(subscription.channel, None)
+
+
+class RedisBroker(InProcessBroker):
+    """Diffusion entre processus (workers gunicorn, instances) via le pub/sub Redis.
+
+    Un seul thread par processus écoute Redis et redistribue les messages aux
+    abonnés locaux. `client` permet d'injecter un client compatible (fakeredis).
+    """
+
+    def __init__(self, url=None, client=None):
+        super().__init__()
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise RuntimeError("Le backend d'événements 'redis' nécessite le paquet redis")
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.pubsub = client.pubsub(ignore_subscribe_messages=True)
+        self.pubsub.psubscribe('res_elec:*')
+        self._listener = threading.Thread(target=self._listen, name='redis-events', daemon=True)
+        self._listener.start()
+
+    def publish(self, channel, message):
+        self.client.publish(f'res_elec:{channel}', json.dumps(message))
+
+    def _listen(self):
+        while True:
+            try:
+                item = self.pubsub.get_message(timeout=1.0)
+                if item and item['type'] == 'pmessage':
+                    channel = item['channel']
+                    if isinstance(channel, bytes):
+                        channel = channel.decode()
+                    super().publish(channel.split(':', 1)[1], json.loads(item['data']))
+            except Exception as e:
+                logger.error(f"Erreur d'écoute Redis: {str(e)}")
+                threading.Event().wait(1.0)
+
+
+class EventBus:
+    """Extension Flask donnant accès au backend de diffusion configuré (EVENTS_BACKEND).
+
+    Chaque flux SSE occupe un thread du worker pendant toute la connexion :
+    `open_stream` en limite le nombre par processus (EVENTS_MAX_STREAMS).
+    """
+
+    def __init__(self, app=None):
+        self.broker = InProcessBroker()
+        self._streams = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config.get('EVENTS_BACKEND', 'memory')
+        if backend == 'redis':
+            self.broker = RedisBroker(app.config.get('EVENTS_REDIS_URL'))
+        elif backend == 'memory':
+            self.broker = InProcessBroker()
+        else:
+            raise ValueError(f"Backend d'événements inconnu: {backend}")
+        max_streams = app.config.get('EVENTS_MAX_STREAMS', 4)
+        self._streams = threading.BoundedSemaphore(max_streams) if max_streams else None
+
+    def publish(self, channel, message):
+        self.broker.publish(channel, message)
+
+    def subscribe(self, channel):
+        return self.broker.subscribe(channel)
+
+    def open_stream(self, channel):
+        """Abonnement d'un flux longue durée, None si le processus en sert déjà le maximum"""
+        if self._streams is not None and not self._streams.acquire(blocking=False):
+            return None
+        subscription = self.subscribe(channel)
+        if self._streams is not None:
+            subscription.on_close = self._streams.release
+        return subscription
+
+
+def election_channel(election_id):
+    return f'election:{election_id}'
@@ -0,0 +1,94 @@
+from marshmallow import class_registry, fields as ma_fields
+from sqlalchemy import inspect
+from sqlalchemy.orm import selectinload
+
+
+class ExpansionError(ValueError):
+    pass
+
+
+def parse_list(value):
+    """Découpe un paramètre de requête du type "a,b,c" """
+    if not value:
+        return []
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def _nested_schemas(schema_cls):
+    """Champs imbriqués d'un schéma : {nom: (classe du schéma imbriqué, champ)}"""
+    nested = {}
+    for name, field in schema_cls._declared_fields.items():
+        if isinstance(field, ma_fields.Nested):
+            target = field.nested
+            if isinstance(target, str):
+                target = class_registry.get_class(target)
+            nested[name] = (target, field)
+    return nested
+
+
+def _exclusions(schema_cls, expand, prefix=''):
+    """Chemins des relations à exclure : toutes celles qui ne sont pas demandées"""
+    excluded = []
+    for name, (target, field) in _nested_schemas(schema_cls).items():
+        if name not in expand:
+            excluded.append(prefix + name)
+        elif field.only is None:
+            children = {path.split('.', 1)[1] for path in expand if path.startswith(name + '.')}
+            children |= {path.split('.', 1)[0] for path in children}
+            excluded.extend(_exclusions(target, children, prefix + name + '.'))
+    return excluded
+
+
+def _validate_expand(schema_cls, expand):
+    for path in expand:
+        current = schema_cls
+        for part in path.split('.'):
+            nested = _nested_schemas(current)
+            if part not in nested:
+                raise ExpansionError(f"Unknown expansion '{path}'")
+            current = nested[part][0]
+
+
+def build_schema(schema_cls, fields=None, expand=(), many=False):
+    """Instancie un schéma limité aux champs et relations demandés.
+
+    `expand` liste des chemins pointés ("voting_centers.voting_offices") ;
+    les relations non demandées ne sont ni sérialisées ni chargées.
+    """
+    expand = set(expand)
+    _validate_expand(schema_cls, expand)
+    expand |= {path.split('.', 1)[0] for path in expand}
+
+    only = None
+    if fields:
+        unknown = set(fields) - set(schema_cls._declared_fields)
+        if unknown:
+            raise ExpansionError(f"Unknown fields: {', '.join(sorted(unknown))}")
+        only = set(fields) | {path for path in expand if '.' not in path}
+
+    exclude = [path for path in _exclusions(schema_cls, expand) if only is None or path.split('.', 1)[0] in only]
+    return schema_cls(only=only, exclude=exclude, many=many)
+
+
+def eager_options(model, expand):
+    """Options selectinload correspondant aux relations demandées"""
+    options = []
+    for path in sorted(set(expand)):
+        current_model = model
+        loader = None
+        for part in path.split('.'):
+            attribute = getattr(current_model, part)
+            loader = selectinload(attribute) if loader is None else loader.selectinload(attribute)
+            current_model = inspect(current_model).relationships[part].mapper.class_
+        options.append(loader)
+    return options
+
+
+def expansion_args(request, default_expand=()):
+    """Lit `fields` et `expand` dans la requête ; `expand` remplace les relations par défaut"""
+    fields = parse_list(request.args.get('fields'))
+    if 'expand' in request.args:
+        expand = parse_list(request.args.get('expand'))
+    else:
+        expand = list(default_expand)
+    return fields, expand
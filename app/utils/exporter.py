@@ -0,0 +1,142 @@
+import csv
+import importlib.util
+import io
+import json
+import tempfile
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+from app import db
+from app.models.election import Area, Candidate, VotingCenter, VotingOffice, VotingResult
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+# Optional package needed by a format
+FORMAT_PACKAGES = {'xlsx': 'openpyxl'}
+OFFICE_COLUMNS = (
+    'office_id', 'office', 'center_id', 'center', 'commune', 'province',
+    'total_voters', 'blank_votes', 'null_votes'
+)
+# Rows written to the response at once, and read from the cursor at once
+FLUSH_ROWS = 500
+
+
+def missing_package(file_format):
+    """Paquet nécessaire au format et non installé, None si le format est disponible.
+
+    À vérifier avant de commencer la réponse : une fois le flux commencé, le
+    statut 200 est déjà envoyé.
+    """
+    package = FORMAT_PACKAGES.get(file_format)
+    if package and importlib.util.find_spec(package) is None:
+        return package
+    return None
+
+
+def export_candidates(election_id):
+    """Candidats de l'élection, dans l'ordre des colonnes de l'export"""
+    return db.session.query(Candidate.id, Candidate.code_name) \
+        .filter_by(election_id=election_id).order_by(Candidate.id).all()
+
+
+def iter_office_results(election_id, batch_size=1000):
+    """Bureaux d'une élection avec leurs voix, un par un : ({colonne: valeur}, {candidate_id: voix}).
+
+    Une seule requête (bureaux joints à leurs résultats, triés par bureau)
+    lue par paquets de `batch_size` lignes via un curseur côté serveur : la
+    mémoire utilisée ne dépend pas du nombre de bureaux.
+    """
+    commune = aliased(Area)
+    province = aliased(Area)
+    stmt = select(
+        VotingOffice.id.label('office_id'),
+        VotingOffice.name.label('office'),
+        VotingCenter.id.label('center_id'),
+        VotingCenter.name.label('center'),
+        commune.name.label('commune'),
+        province.name.label('province'),
+        VotingOffice.total_voters,
+        VotingOffice.blank_votes,
+        VotingOffice.null_votes,
+        VotingResult.candidate_id,
+        VotingResult.votes
+    ).join(VotingCenter, VotingCenter.id == VotingOffice.center_id) \
+        .outerjoin(commune, commune.id == VotingCenter.commune_id) \
+        .outerjoin(province, province.id == commune.parent_id) \
+        .outerjoin(VotingResult, VotingResult.office_id == VotingOffice.id) \
+        .where(VotingCenter.election_id == election_id) \
+        .order_by(VotingOffice.id) \
+        .execution_options(yield_per=batch_size)
+
+    office = None
+    votes = {}
+    for row in db.session.execute(stmt):
+        if office is None or row.office_id != office['office_id']:
+            if office is not None:
+                yield office, votes
+            office = {column: getattr(row, column) for column in OFFICE_COLUMNS}
+            for field in ('total_voters', 'blank_votes', 'null_votes'):
+                office[field] = office[field] or 0
+            votes = {}
+        if row.candidate_id is not None:
+            votes[row.candidate_id] = votes.get(row.candidate_id, 0) + (row.votes or 0)
+    if office is not None:
+        yield office, votes
+
+
+def _csv(election_id, candidates):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(OFFICE_COLUMNS + tuple(code_name for _, code_name in candidates))
+    for count, (office, votes) in enumerate(iter_office_results(election_id, FLUSH_ROWS), start=1):
+        writer.writerow([office[column] for column in OFFICE_COLUMNS] + [votes.get(candidate_id, 0) for candidate_id, _ in candidates])
+        if count % FLUSH_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _ndjson(election_id, candidates):
+    codes = dict(candidates)
+    lines = []
+    for office, votes in iter_office_results(election_id, FLUSH_ROWS):
+        office['candidate_results'] = {codes.get(candidate_id, str(candidate_id)): count for candidate_id, count in votes.items()}
+        lines.append(json.dumps(office) + '\n')
+        if len(lines) >= FLUSH_ROWS:
+            yield ''.join(lines)
+            lines = []
+    yield ''.join(lines)
+
+
+def _xlsx(election_id, candidates):
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise RuntimeError("L'export XLSX nécessite le paquet openpyxl")
+
+    # Write-only mode spills rows to disk; the archive can only be sent once complete
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('results')
+    sheet.append(OFFICE_COLUMNS + tuple(code_name for _, code_name in candidates))
+    for office, votes in iter_office_results(election_id, FLUSH_ROWS):
+        sheet.append([office[column] for column in OFFICE_COLUMNS] + [votes.get(candidate_id, 0) for candidate_id, _ in candidates])
+
+    with tempfile.TemporaryFile() as output:
+        workbook.save(output)
+        output.seek(0)
+        while True:
+            chunk = output.read(64 * 1024)
+            if not chunk:
+                break
+            yield chunk
+
+
+EXPORTERS = {'csv': _csv, 'ndjson': _ndjson, 'xlsx': _xlsx}
+
+
+def export_results(election_id, file_format):
+    """Générateur du contenu de l'export d'une élection au format demandé"""
+    return EXPORTERS[file_format](election_id, export_candidates(election_id))
@@ -1,55 +1,430 @@
+import base64
+import hashlib
+import mimetypes
 import os
-from werkzeug.utils import secure_filename
-from datetime import datetime
+import re
+import shutil
+import tempfile
 import uuid
 import logging
+from datetime import datetime
+from functools import partial, wraps
+import click
+from flask import Request, jsonify, request
+from flask.cli import AppGroup
+from sqlalchemy import delete, update
+from werkzeug.exceptions import RequestEntityTooLarge
+from app.utils.images import strip_metadata
+from app.utils.storage_backends import LocalBackend, S3Backend
+from app.utils.metrics import metrics
+from app.utils.transaction import after_commit
 
 logger = logging.getLogger(__name__)
 
+files_cli = AppGroup('files', help='Fichiers téléversés.')
+
+CHUNK_SIZE = 64 * 1024
+# Room for the non-file form fields when deriving a request size limit from the file limits
+FORM_OVERHEAD = 64 * 1024
+MAGIC_NUMBERS = (
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+)
+HEAD_SIZE = max(len(magic) for magic, _ in MAGIC_NUMBERS)
+CONTENT_TYPES = {'png': 'image/png', 'jpg': 'image/jpeg', 'gif': 'image/gif'}
+# A stored file ('uploads/<folder>/...') or a direct upload awaiting its claim ('incoming/<token>/...')
+STORED_REFERENCE = re.compile(
+    r'(?:uploads/(?P<folder>[a-z]+)|incoming/[0-9a-f]{32})/(?P<digest>[0-9a-f]{64})\.(?P<kind>png|jpg|gif)'
+)
+
+
+class UploadError(Exception):
+    """Fichier refusé (ne dérive pas de ValueError, que Werkzeug ignore pendant l'analyse du formulaire)"""
+
+
+def sniff_type(head):
+    """Type d'image d'après les premiers octets, None si non reconnu"""
+    for magic, kind in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return kind
+    return None
+
+
+class UploadBuffer:
+    """Fichier temporaire recevant un envoi morceau par morceau.
+
+    L'empreinte, la taille et le type (octets magiques) sont calculés au fil
+    de l'écriture : un fichier trop gros ou d'un type inconnu est refusé dès
+    les premiers morceaux fautifs, sans être lu en entier ni relu ensuite.
+    Le fichier est créé dans le dossier des envois pour être renommé en place.
+    """
+
+    def __init__(self, directory, limit=None):
+        fd, self.name = tempfile.mkstemp(dir=directory, prefix='upload-')
+        self.file = os.fdopen(fd, 'w+b')
+        self.limit = limit
+        self.size = 0
+        self._head = b''
+        self._digest = hashlib.sha256()
+
+    @property
+    def kind(self):
+        return sniff_type(self._head)
+
+    @property
+    def digest(self):
+        return self._digest.hexdigest()
+
+    def write(self, data):
+        self.size += len(data)
+        if self.limit is not None and self.size > self.limit:
+            # Not yet attached to the request: nothing else will clean it up
+            self.close()
+            raise RequestEntityTooLarge()
+        if len(self._head) < HEAD_SIZE:
+            self._head += data[:HEAD_SIZE - len(self._head)]
+            if len(self._head) == HEAD_SIZE and self.kind is None:
+                self.close()
+                raise UploadError('Invalid file type')
+        self._digest.update(data)
+        return self.file.write(data)
+
+    def replace(self, data):
+        """Remplace le contenu reçu (empreinte, taille et type recalculés)"""
+        self.file.seek(0)
+        self.file.truncate()
+        self.size = 0
+        self._head = b''
+        self._digest = hashlib.sha256()
+        limit, self.limit = self.limit, None
+        self.write(data)
+        self.limit = limit
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+    def close(self):
+        self.file.close()
+        if os.path.exists(self.name):
+            os.remove(self.name)
+
+
+class UploadRequest(Request):
+    """Requête dont les fichiers sont écrits directement dans des UploadBuffer.
+
+    Seulement pour les vues déclarées avec FileStorage.accepts, qui traduisent
+    les refus en 400/413 ; ailleurs le formulaire est analysé par Werkzeug.
+    """
+
+    # Set per view by FileStorage.accepts: whole body, and each file
+    upload_limit = None
+    upload_file_limit = None
+
+    @property
+    def max_content_length(self):
+        limit = super().max_content_length
+        if self.upload_limit is None:
+            return limit
+        body_limit = self.upload_limit + FORM_OVERHEAD
+        return min(limit, body_limit) if limit else body_limit
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.upload_file_limit is None:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        from app import file_storage
+        return file_storage.open_buffer(self.upload_file_limit)
+
+
 class FileStorage:
+    """Stockage des fichiers téléversés, adressé par leur contenu.
+
+    Un fichier est enregistré sous `uploads/<dossier>/<sha256>.<ext>` (empreinte
+    des octets reçus, type déterminé par les octets magiques), sans ses
+    métadonnées : un contenu déjà connu n'est ni traité ni réécrit. La table `stored_file` compte les références ; le fichier et ses
+    variantes ne sont supprimés qu'avec la dernière, une fois la transaction
+    validée. Les octets sont confiés au backend configuré (STORAGE_BACKEND) :
+    disque local ou stockage objet S3.
+    """
+
     def __init__(self, app=None):
         self.app = app
+        self.backend = None
         if app is not None:
             self.init_app(app)
 
     def init_app(self, app):
+        from app.models.file import StoredFile  # noqa: F401  (enregistre la table)
+
         self.upload_folder = app.config['UPLOAD_FOLDER']
         self.max_content_length = app.config['MAX_CONTENT_LENGTH']
-        
-        # Créer les dossiers nécessaires
-        for folder in ['logos', 'profiles', 'candidates']:
-            os.makedirs(os.path.join(self.upload_folder, folder), exist_ok=True)
+        self.size_limits = {
+            folder: int(float(size) * 1024 * 1024)
+            for folder, size in (item.split(':') for item in app.config.get('UPLOAD_SIZE_LIMITS', 'logos:5,profiles:10,candidates:10').split(','))
+        }
+        # Uploads are staged on local disk whatever the backend
+        self.incoming_folder = os.path.join(self.upload_folder, '.incoming')
+        os.makedirs(self.incoming_folder, exist_ok=True)
+        app.request_class = UploadRequest
+
+        backend = app.config.get('STORAGE_BACKEND', 'local')
+        if backend == 'local':
+            self.backend = LocalBackend(self.upload_folder)
+            # Créer les dossiers nécessaires
+            for folder in self.size_limits:
+                os.makedirs(os.path.join(self.upload_folder, folder), exist_ok=True)
+        elif backend == 's3':
+            self.backend = S3Backend(
+                app.config['S3_BUCKET'],
+                endpoint_url=app.config.get('S3_ENDPOINT_URL'),
+                region=app.config.get('S3_REGION'),
+                prefix=app.config.get('S3_PREFIX', ''),
+                public_url=app.config.get('S3_PUBLIC_URL'),
+                url_expires=app.config.get('S3_URL_EXPIRES', 3600),
+                multipart_threshold=app.config.get('S3_MULTIPART_THRESHOLD', 8 * 1024 * 1024),
+                multipart_chunksize=app.config.get('S3_MULTIPART_CHUNKSIZE', 8 * 1024 * 1024)
+            )
+        else:
+            raise ValueError(f'Backend de stockage inconnu: {backend}')
+
+    def _key(self, path):
+        """'uploads/logos/x.jpg' -> 'logos/x.jpg'"""
+        return path.split('/', 1)[1]
+
+    def exists(self, path):
+        return self.backend.size(self._key(path)) is not None
+
+    def open(self, path):
+        return self.backend.open(self._key(path))
+
+    def write(self, path, data):
+        self.backend.write(self._key(path), data, mimetypes.guess_type(path)[0])
+
+    def list(self, folder):
+        """Chemins des fichiers d'un dossier"""
+        return (f'uploads/{key}' for key in self.backend.list(folder))
+
+    def local_path(self, path):
+        """Chemin sur disque, None si le backend n'est pas local"""
+        return self.backend.local_path(self._key(path))
+
+    def url(self, path):
+        """URL de téléchargement direct (backend objet), None si le backend est local"""
+        return self.backend.url(self._key(path))
+
+    def open_buffer(self, limit=None):
+        return UploadBuffer(self.incoming_folder, limit)
+
+    def accepts(self, **fields):
+        """Déclare les champs fichier d'une vue et leur dossier, pour en appliquer les limites de taille.
+
+        Le formulaire est analysé avant la vue : un corps trop gros est refusé
+        (413) avant d'être lu quand sa taille est annoncée, sinon dès que la
+        limite est dépassée ; un type non reconnu est refusé (400).
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                limits = {name: self.size_limits[folder] for name, folder in fields.items()}
+                request.upload_limit = sum(limits.values())
+                request.upload_file_limit = max(limits.values())
+                try:
+                    files = request.files
+                except RequestEntityTooLarge:
+                    return jsonify({'message': f'File too large (maximum {request.upload_file_limit} bytes)'}), 413
+                except UploadError as e:
+                    return jsonify({'message': str(e)}), 400
+
+                for name, limit in limits.items():
+                    file = files.get(name)
+                    if not file:
+                        continue
+                    if file.stream.size > limit:
+                        return jsonify({'message': f'{name}: file too large (maximum {limit} bytes)'}), 413
+                    if file.stream.kind is None:
+                        return jsonify({'message': f'{name}: invalid file type'}), 400
+                return view(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def save_upload(self, field, folder):
+        """Chemin du fichier reçu dans le champ `field` : fichier envoyé, ou référence
+        d'un envoi direct (voir `presign`) ou d'un fichier déjà stocké. None si absent.
+        """
+        file = request.files.get(field)
+        if file:
+            return self.save_file(file, folder)
+        reference = request.form.get(field)
+        if reference:
+            return self.claim(reference, folder)
+        return None
 
     def save_file(self, file, folder):
-        """Sauvegarde un fichier dans le dossier spécifié"""
+        """Sauvegarde un fichier dans le dossier spécifié et retourne son chemin relatif"""
         try:
             if not file or not self._allowed_file(file.filename):
-                raise ValueError('Type de fichier non autorisé')
-
-            # Générer un nom de fichier unique
-            filename = secure_filename(file.filename)
-            unique_filename = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{str(uuid.uuid4())[:8]}_{filename}"
-            
-            # Chemin complet du fichier
-            file_path = os.path.join(self.upload_folder, folder, unique_filename)
-            
-            # Sauvegarder le fichier
-            file.save(file_path)
-            
-            # Retourner le chemin relatif
-            return os.path.join('uploads', folder, unique_filename)
+                raise UploadError('Invalid file type')
+            return self.store(file.stream, folder)
 
         except Exception as e:
             logger.error(f"Erreur lors de la sauvegarde du fichier: {str(e)}")
             raise
 
+    def store(self, stream, folder):
+        """Enregistre le contenu de `stream` et ajoute une référence dans la session courante"""
+        if not isinstance(stream, UploadBuffer):
+            buffer = self.open_buffer(self.size_limits.get(folder))
+            try:
+                stream.seek(0)
+                shutil.copyfileobj(stream, buffer, CHUNK_SIZE)
+            except Exception:
+                buffer.close()
+                raise
+            stream = buffer
+        if stream.kind is None:
+            stream.close()
+            raise UploadError('Invalid file type')
+
+        # Named after the bytes received: an upload already stored is neither stripped nor written again
+        path = f'uploads/{folder}/{stream.digest}.{stream.kind}'
+        key = self._key(path)
+        stored = self.backend.size(key) is not None
+        if not stored:
+            self._strip_metadata(stream)
+        # Reference first: its row lock holds off the collection of this file until commit,
+        # so the file found below cannot be deleted by a concurrent release()
+        self._acquire(path, stream.size)
+        created = self.backend.size(key) is None
+        if created:
+            if stored:
+                # Collected since the check above
+                self._strip_metadata(stream)
+            stream.file.close()
+            self.backend.save(stream.name, key, CONTENT_TYPES[stream.kind])
+        stream.close()
+        metrics.count_upload(folder, stream.size)
+        if created:
+            from app import image_pipeline
+            image_pipeline.submit(path)
+        return path
+
+    def _strip_metadata(self, stream):
+        """Retire EXIF (GPS), XMP et commentaires du fichier reçu, servi tel quel une fois stocké"""
+        try:
+            stream.file.seek(0)
+            stripped = strip_metadata(stream.file.read())
+        except ValueError:
+            stream.close()
+            raise UploadError('Invalid image file')
+        if stripped is not None:
+            stream.replace(stripped)
+
+    def presign(self, folder, digest, size, content_type):
+        """Prépare l'envoi direct d'un fichier au stockage objet, sans passer par l'API.
+
+        Retourne `{'path': ...}` si ce contenu est déjà stocké (rien à envoyer),
+        sinon les paramètres de la requête PUT et la référence `upload` à
+        transmettre ensuite dans le champ fichier ; None si le backend ne le
+        permet pas.
+        """
+        kind = next((kind for kind, mimetype in CONTENT_TYPES.items() if mimetype == content_type), None)
+        if folder not in self.size_limits or kind is None or not re.fullmatch(r'[0-9a-f]{64}', digest or ''):
+            raise UploadError('Invalid upload parameters')
+        if not 0 < size <= self.size_limits[folder]:
+            raise UploadError(f'File too large (maximum {self.size_limits[folder]} bytes)')
+
+        path = f'uploads/{folder}/{digest}.{kind}'
+        if self.exists(path):
+            return {'path': path}
+        reference = f'incoming/{uuid.uuid4().hex}/{digest}.{kind}'
+        upload = self.backend.presigned_upload(reference, content_type, size, _checksum(digest))
+        if upload is None:
+            return None
+        return {'upload': reference, **upload}
+
+    def claim(self, reference, folder):
+        """Ajoute une référence à un fichier envoyé directement ou déjà stocké dans `folder`"""
+        match = STORED_REFERENCE.fullmatch(reference)
+        if not match or match.group('folder') not in (None, folder):
+            raise UploadError('Invalid file reference')
+        path = f"uploads/{folder}/{match.group('digest')}.{match.group('kind')}"
+        key = self._key(path)
+
+        if match.group('folder'):
+            size = self.backend.size(key)
+            if size is None:
+                raise UploadError('File not found')
+            self._acquire(path, size)
+            # Collected between the check and the reference: the transaction must not keep it
+            if self.backend.size(key) is None:
+                raise UploadError('File not found')
+            return path
+
+        # Direct upload: the bytes must match the digest in the name before they are kept
+        size = self.backend.verify_upload(reference, _checksum(match.group('digest')))
+        if size is None:
+            self.backend.delete(reference)
+            raise UploadError('Direct upload not found or invalid')
+        if size > self.size_limits[folder] or sniff_type(self.backend.read_head(reference, HEAD_SIZE)) != match.group('kind'):
+            self.backend.delete(reference)
+            raise UploadError('Invalid file type or file too large')
+        # Stored like any other upload, under the same path (metadata stripped before it is written)
+        try:
+            with self.backend.open(reference) as source:
+                return self.store(source, folder)
+        finally:
+            self.backend.delete(reference)
+
+    def _acquire(self, path, size):
+        from app.models.file import StoredFile
+        from app.utils.upsert import upsert
+        upsert(
+            StoredFile,
+            [{'path': path, 'size': size, 'ref_count': 1, 'created_at': datetime.utcnow()}],
+            ['path'],
+            lambda excluded: {'ref_count': StoredFile.ref_count + 1}
+        )
+
+    def release(self, path):
+        """Retire une référence ; le fichier est supprimé après validation si c'était la dernière"""
+        from app import db
+        from app.models.file import StoredFile
+
+        if not path:
+            return
+        table = StoredFile.__table__
+        result = db.session.execute(
+            update(table).where(table.c.path == path).values(ref_count=table.c.ref_count - 1)
+        )
+        if result.rowcount:
+            # The row stays at 0 until collected: a concurrent store() may take a new reference meanwhile
+            after_commit(db.session, partial(self._collect, path))
+        else:
+            # Uploaded before content addressing: the file has a single owner
+            after_commit(db.session, partial(self.delete_file, path))
+
+    def _collect(self, path):
+        """Supprime le fichier et sa ligne s'il n'est plus référencé, sous le verrou de la ligne"""
+        from app import db
+        from app.models.file import StoredFile
+
+        table = StoredFile.__table__
+        with db.engine.begin() as connection:
+            # Waits for a concurrent store() holding the row; a reference taken meanwhile keeps the file
+            result = connection.execute(delete(table).where(table.c.path == path, table.c.ref_count <= 0))
+            if result.rowcount:
+                self.delete_file(path)
+
     def delete_file(self, file_path):
-        """Supprime un fichier"""
+        """Supprime un fichier et ses variantes"""
+        from app import image_pipeline
         try:
-            if file_path and os.path.exists(file_path):
-                os.remove(file_path)
-                return True
-            return False
+            if not file_path:
+                return False
+            for path in [file_path, *(image_pipeline.variant_paths(file_path) or {}).values()]:
+                self.backend.delete(self._key(path))
+            return True
         except Exception as e:
             logger.error(f"Erreur lors de la suppression du fichier: {str(e)}")
             return False
@@ -57,4 +432,40 @@ class FileStorage:
     def _allowed_file(self, filename):
         """Vérifie si le type de fichier est autorisé"""
         ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
-        return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS 
\ No newline at end of file
+        return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+
+def _checksum(digest):
+    """Empreinte SHA-256 hexadécimale -> base64, format attendu par S3"""
+    return base64.b64encode(bytes.fromhex(digest)).decode()
+
+
+@files_cli.command('dedupe')
+def dedupe_command():
+    """Convertit les fichiers enregistrés avant l'adressage par contenu et supprime les doublons."""
+    from app import db, file_storage
+    from app.models.file import StoredFile
+    from app.models.user import User
+    from app.models.election import Candidate
+
+    converted = missing = 0
+    for model, column in ((User, 'campaign_logo'), (User, 'profile_photo'), (Candidate, 'profile_photo')):
+        for record in model.query.filter(getattr(model, column).isnot(None)):
+            path = getattr(record, column)
+            if db.session.get(StoredFile, path) is not None:
+                continue
+            if not file_storage.exists(path):
+                missing += 1
+                continue
+            try:
+                with file_storage.open(path) as f:
+                    setattr(record, column, file_storage.store(f, path.split('/')[1]))
+            except (UploadError, RequestEntityTooLarge) as e:
+                click.echo(f'{path}: {e}', err=True)
+                continue
+            after_commit(db.session, partial(file_storage.delete_file, path))
+            converted += 1
+    db.session.commit()
+
+    click.echo(f'{converted} référence(s) convertie(s) en {StoredFile.query.count()} fichier(s) distinct(s), '
+               f'{missing} fichier(s) introuvable(s)')
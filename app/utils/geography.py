@@ -0,0 +1,119 @@
+import click
+from flask.cli import AppGroup
+from app import db
+from app.models.election import Area, VotingCenter, VotingOffice, VotingResult
+from app.utils.tally import STAT_FIELDS, get_area_tallies, get_tally_snapshot
+
+geography_cli = AppGroup('geography', help='Découpage électoral (provinces, communes).')
+
+# Level of the children of each level; None is the national level
+CHILD_LEVELS = {None: 'province', 'province': 'commune', 'commune': 'center', 'center': 'office'}
+
+
+class AreaError(ValueError):
+    pass
+
+
+def check_parent(level, parent_id):
+    """Une province n'a pas de parent, une commune appartient à une province"""
+    if level == 'province':
+        if parent_id is not None:
+            raise AreaError('A province has no parent')
+        return
+    parent = db.session.get(Area, parent_id) if parent_id is not None else None
+    if parent is None or parent.level != 'province':
+        raise AreaError('A commune must belong to a province')
+
+
+def check_commune(commune_id):
+    if commune_id is not None and db.session.query(Area.id).filter_by(id=commune_id, level='commune').scalar() is None:
+        raise AreaError('Unknown commune')
+
+
+def _office_totals(center_id):
+    """Bureaux d'un centre avec leurs voix par candidat (deux requêtes)"""
+    offices = db.session.query(VotingOffice.id, VotingOffice.name, *[getattr(VotingOffice, field) for field in STAT_FIELDS]) \
+        .filter(VotingOffice.center_id == center_id).order_by(VotingOffice.id).all()
+    totals = {
+        office.id: dict({field: getattr(office, field) or 0 for field in STAT_FIELDS}, candidate_results={})
+        for office in offices
+    }
+    votes = db.session.query(VotingResult.office_id, VotingResult.candidate_id, VotingResult.votes) \
+        .join(VotingOffice, VotingOffice.id == VotingResult.office_id) \
+        .filter(VotingOffice.center_id == center_id)
+    for office_id, candidate_id, count in votes:
+        totals[office_id]['candidate_results'][str(candidate_id)] = count or 0
+    return [(office.id, office.name) for office in offices], totals
+
+
+def area_results(election_id, level=None, area_id=None):
+    """Totaux d'une zone (nationale si `level` est None) et de chacune de ses zones filles.
+
+    Lus dans les compteurs matérialisés : le coût dépend du nombre de zones
+    filles, pas du nombre de bureaux en dessous. Retourne None si la zone
+    n'existe pas.
+    """
+    if level is None:
+        name = None
+        totals = get_tally_snapshot(election_id)
+        children = db.session.query(Area.id, Area.name).filter(Area.level == 'province').order_by(Area.name).all()
+    elif level in ('province', 'commune'):
+        name = db.session.query(Area.name).filter_by(id=area_id, level=level).scalar()
+        if name is None:
+            return None
+        totals = get_area_tallies(election_id, level, [area_id])[area_id]
+        if level == 'province':
+            children = db.session.query(Area.id, Area.name).filter(Area.parent_id == area_id).order_by(Area.name).all()
+        else:
+            children = db.session.query(VotingCenter.id, VotingCenter.name) \
+                .filter(VotingCenter.commune_id == area_id, VotingCenter.election_id == election_id) \
+                .order_by(VotingCenter.name).all()
+    elif level == 'center':
+        name = db.session.query(VotingCenter.name).filter_by(id=area_id, election_id=election_id).scalar()
+        if name is None:
+            return None
+        totals = get_area_tallies(election_id, level, [area_id])[area_id]
+    else:
+        raise AreaError(f'Unknown level: {level}')
+
+    child_level = CHILD_LEVELS[level]
+    if child_level == 'office':
+        children, child_totals = _office_totals(area_id)
+    else:
+        child_totals = get_area_tallies(election_id, child_level, [child_id for child_id, _ in children])
+
+    results = {'election_id': election_id, 'level': level or 'national', 'id': area_id, 'name': name}
+    results.update(totals)
+    results['children_level'] = child_level
+    results['children'] = [
+        dict({'id': child_id, 'name': child_name}, **child_totals[child_id])
+        for child_id, child_name in children
+    ]
+    return results
+
+
+@geography_cli.command('import-users')
+def import_users_command():
+    """Crée les provinces et communes renseignées sur les comptes utilisateurs."""
+    from app.models.user import User
+
+    provinces = {area.name: area for area in Area.query.filter_by(level='province')}
+    communes = {(area.parent_id, area.name) for area in Area.query.filter_by(level='commune')}
+    created = 0
+    pairs = db.session.query(User.province, User.commune).distinct().order_by(User.province, User.commune)
+    for province_name, commune_name in pairs:
+        province_name, commune_name = province_name.strip(), commune_name.strip()
+        if not province_name or not commune_name:
+            continue
+        province = provinces.get(province_name)
+        if province is None:
+            province = provinces[province_name] = Area(name=province_name, level='province')
+            db.session.add(province)
+            db.session.flush()
+            created += 1
+        if (province.id, commune_name) not in communes:
+            communes.add((province.id, commune_name))
+            db.session.add(Area(name=commune_name, level='commune', parent_id=province.id))
+            created += 1
+    db.session.commit()
+    click.echo(f'{created} zone(s) créée(s)')
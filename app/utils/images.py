@@ -0,0 +1,252 @@
+import io
+import logging
+import queue
+import zlib
+import click
+from flask.cli import AppGroup
+from PIL import Image, ImageOps
+from app.utils.background import BackgroundWorker
+
+logger = logging.getLogger(__name__)
+
+images_cli = AppGroup('images', help='Variantes des images téléversées.')
+
+UPLOAD_FOLDERS = ('logos', 'profiles', 'candidates')
+ORIENTATION = 0x0112
+JPEG_SOI, JPEG_EOI, JPEG_SOS = 0xD8, 0xD9, 0xDA
+# JPEG segments carrying EXIF (GPS included) and XMP (APP1), IPTC (APP13) metadata, and comments
+JPEG_METADATA_MARKERS = {0xE1, 0xED, 0xFE}
+# Markers without a length field: restart markers and TEM
+JPEG_STANDALONE_MARKERS = {0x01, *range(0xD0, 0xD8)}
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+PNG_METADATA_CHUNKS = {b'tEXt', b'zTXt', b'iTXt', b'eXIf', b'tIME'}
+
+
+def strip_metadata(data):
+    """Contenu de l'image `data` sans métadonnées (EXIF et GPS, XMP, IPTC, textes), None si elle n'en a pas.
+
+    Seuls les segments (JPEG) ou blocs (PNG) de métadonnées sont retirés,
+    les pixels ne sont ni décodés ni réencodés. L'orientation EXIF est
+    conservée, ainsi que le profil de couleurs ; les données après la fin
+    de l'image (images secondaires d'un MPO) sont retirées. Un GIF ne porte
+    pas d'EXIF et n'est pas modifié. ValueError si le fichier est tronqué.
+    """
+    if data.startswith(b'\xff\xd8'):
+        return _strip_jpeg(data)
+    if data.startswith(PNG_SIGNATURE):
+        return _strip_png(data)
+    return None
+
+
+def _orientation_exif(payload):
+    """Bloc EXIF ('Exif\\0\\0' compris) réduit à l'orientation lue dans `payload`, None si aucune"""
+    exif = Image.Exif()
+    try:
+        exif.load(payload)
+    except Exception:
+        return None
+    orientation = exif.get(ORIENTATION)
+    if not orientation or orientation == 1:
+        return None
+    kept = Image.Exif()
+    kept[ORIENTATION] = orientation
+    return kept.tobytes()
+
+
+def _jpeg_scan_end(data, pos):
+    """Position du marqueur qui suit les données compressées commençant à `pos`"""
+    while True:
+        pos = data.find(b'\xff', pos)
+        if pos < 0 or pos + 1 >= len(data):
+            raise ValueError('Truncated JPEG')
+        following = data[pos + 1]
+        # Stuffed byte, restart marker or fill byte: still inside the scan
+        if following == 0 or following == 0xFF or 0xD0 <= following <= 0xD7:
+            pos += 1
+            continue
+        return pos
+
+
+def _strip_jpeg(data):
+    parts = [data[:2]]
+    changed = False
+    pos = 2
+    while True:
+        if pos + 2 > len(data) or data[pos] != 0xFF:
+            raise ValueError('Truncated JPEG')
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            pos += 1
+            continue
+        if marker == JPEG_EOI:
+            parts.append(data[pos:pos + 2])
+            pos += 2
+            break
+        if marker in JPEG_STANDALONE_MARKERS:
+            parts.append(data[pos:pos + 2])
+            pos += 2
+            continue
+        end = pos + 2 + int.from_bytes(data[pos + 2:pos + 4], 'big')
+        if end > len(data):
+            raise ValueError('Truncated JPEG')
+        if marker == JPEG_SOS:
+            end = _jpeg_scan_end(data, end)
+            parts.append(data[pos:end])
+        elif marker in JPEG_METADATA_MARKERS or (marker == 0xE2 and data[pos + 4:pos + 8] == b'MPF\x00'):
+            # The MPF index points at the secondary images, dropped below
+            changed = True
+            exif = _orientation_exif(data[pos + 4:end]) if data[pos + 4:pos + 10] == b'Exif\x00\x00' else None
+            if exif is not None:
+                # Variants are rotated from it
+                parts.append(b'\xff\xe1' + (len(exif) + 2).to_bytes(2, 'big') + exif)
+        else:
+            parts.append(data[pos:end])
+        pos = end
+    if pos < len(data):
+        changed = True
+    return b''.join(parts) if changed else None
+
+
+def _strip_png(data):
+    parts = [PNG_SIGNATURE]
+    changed = False
+    pos = len(PNG_SIGNATURE)
+    while True:
+        if pos + 12 > len(data):
+            raise ValueError('Truncated PNG')
+        length = int.from_bytes(data[pos:pos + 4], 'big')
+        chunk_type = data[pos + 4:pos + 8]
+        end = pos + 12 + length
+        if end > len(data):
+            raise ValueError('Truncated PNG')
+        if chunk_type in PNG_METADATA_CHUNKS:
+            changed = True
+            exif = _orientation_exif(data[pos + 8:end - 4]) if chunk_type == b'eXIf' else None
+            if exif is not None:
+                exif = exif[6:]  # eXIf holds the TIFF structure without the 'Exif\0\0' header
+                chunk = b'eXIf' + exif
+                parts.append(len(exif).to_bytes(4, 'big') + chunk + zlib.crc32(chunk).to_bytes(4, 'big'))
+        else:
+            parts.append(data[pos:end])
+        pos = end
+        if chunk_type == b'IEND':
+            break
+    if pos < len(data):
+        changed = True
+    return b''.join(parts) if changed else None
+
+
+def parse_variants(value):
+    """'thumb:160,medium:640' -> {'thumb': 160, 'medium': 640}"""
+    variants = {}
+    for item in value.split(','):
+        name, size = item.split(':')
+        variants[name.strip()] = int(size)
+    return variants
+
+
+class ImagePipeline:
+    """Génère les variantes redimensionnées (sans métadonnées) des images téléversées.
+
+    Le fichier envoyé est conservé comme source, débarrassé de ses métadonnées
+    (voir strip_metadata) ; chaque variante est
+    écrite à côté (`<nom>_<variante>.<format>`) et son chemin se déduit de
+    celui de la source, sans accès disque ni base. Le traitement a lieu dans
+    un thread de fond (IMAGE_PROCESSING_ASYNC) : la variante apparaît quelques
+    instants après la réponse.
+    """
+
+    def __init__(self, app=None):
+        self.variants = {}
+        self.worker = None
+        self._queue = queue.Queue()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.variants = parse_variants(app.config.get('IMAGE_VARIANTS', 'thumb:160,medium:640,original:2048'))
+        self.format = app.config.get('IMAGE_VARIANT_FORMAT', 'WEBP').upper()
+        self.quality = app.config.get('IMAGE_VARIANT_QUALITY', 80)
+        self.run_async = app.config.get('IMAGE_PROCESSING_ASYNC', True)
+        self.worker = BackgroundWorker('image-variants', self._process_next)
+
+    @property
+    def extension(self):
+        return 'jpg' if self.format == 'JPEG' else self.format.lower()
+
+    def variant_path(self, path, variant):
+        stem = path.rsplit('.', 1)[0]
+        return f'{stem}_{variant}.{self.extension}'
+
+    def variant_paths(self, path):
+        """Chemins des variantes d'une image (None si pas d'image)"""
+        if not path:
+            return None
+        return {variant: self.variant_path(path, variant) for variant in self.variants}
+
+    def is_variant(self, path):
+        return any(path.endswith(f'_{variant}.{self.extension}') for variant in self.variants)
+
+    def submit(self, path):
+        """Programme la génération des variantes de `path` (chemin relatif 'uploads/...')"""
+        if not self.run_async:
+            self.process(path)
+            return
+        self._queue.put(path)
+        self.worker.ensure_started()
+        self.worker.wake()
+
+    def _process_next(self):
+        try:
+            path = self._queue.get_nowait()
+        except queue.Empty:
+            return 0
+        try:
+            self.process(path)
+        except Exception as e:
+            logger.error(f"Échec de génération des variantes de {path}: {str(e)}")
+        return 1
+
+    def process(self, path):
+        from app import file_storage
+        largest = max(self.variants.values())
+        with file_storage.open(path) as source, Image.open(source) as image:
+            # JPEG: decode directly at a reduced scale when the source is much larger
+            image.draft('RGB', (largest, largest))
+            image = ImageOps.exif_transpose(image)
+            has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+            image = image.convert('RGBA' if has_alpha and self.format != 'JPEG' else 'RGB')
+
+            # Largest first: each variant is resized from the previous one
+            for variant, size in sorted(self.variants.items(), key=lambda item: -item[1]):
+                image.thumbnail((size, size), Image.LANCZOS)
+                buffer = io.BytesIO()
+                # No exif/icc arguments: metadata is dropped from the variants
+                image.save(buffer, self.format, quality=self.quality, optimize=True)
+                file_storage.write(self.variant_path(path, variant), buffer.getvalue())
+
+    def drain(self):
+        """Traite immédiatement les images en attente"""
+        while self._process_next():
+            pass
+
+
+@images_cli.command('rebuild')
+@click.option('--missing-only', is_flag=True, help='Ignorer les images dont toutes les variantes existent.')
+def rebuild_command(missing_only):
+    """Génère les variantes de toutes les images téléversées."""
+    from app import file_storage, image_pipeline
+    processed = failed = 0
+    for folder in UPLOAD_FOLDERS:
+        for path in list(file_storage.list(folder)):
+            if image_pipeline.is_variant(path):
+                continue
+            if missing_only and all(file_storage.exists(p) for p in image_pipeline.variant_paths(path).values()):
+                continue
+            try:
+                image_pipeline.process(path)
+                processed += 1
+            except Exception as e:
+                failed += 1
+                click.echo(f'{path}: {str(e)}', err=True)
+    click.echo(f'{processed} image(s) traitée(s), {failed} échec(s)')
@@ -0,0 +1,306 @@
+import csv
+import io
+import shutil
+import tempfile
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import insert
+from app import db, response_cache
+from app.models.election import Area, Candidate, Election, VotingCenter, VotingOffice
+from app.schemas import CandidateSchema, VotingCenterSchema, VotingOfficeSchema
+
+elections_cli = AppGroup('elections', help='Élections.')
+
+IMPORT_KINDS = ('structure', 'candidates')
+FORMATS = {
+    'text/csv': 'csv',
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': 'xlsx',
+}
+
+center_schema = VotingCenterSchema(many=True)
+office_schema = VotingOfficeSchema(many=True, partial=('center_id',))
+candidate_schema = CandidateSchema(many=True)
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+def _clean(value):
+    if isinstance(value, str):
+        value = value.strip()
+    return None if value == '' else value
+
+
+def read_rows(stream, file_format):
+    """Lit un fichier CSV ou XLSX ligne par ligne : (numéro de ligne, {colonne: valeur})"""
+    if file_format == 'csv':
+        if isinstance(stream, io.RawIOBase):
+            stream = io.BufferedReader(stream)
+        reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+        if reader.fieldnames is None:
+            return
+        reader.fieldnames = [(name or '').strip().lower() for name in reader.fieldnames]
+        for row in reader:
+            values = {name: _clean(value) for name, value in row.items() if name}
+            if any(value is not None for value in values.values()):
+                yield reader.line_num, values
+    elif file_format == 'xlsx':
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise RuntimeError("L'import XLSX nécessite le paquet openpyxl")
+        # A workbook is a zip archive: it has to be seekable
+        if not stream.seekable():
+            spooled = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+            shutil.copyfileobj(stream, spooled)
+            spooled.seek(0)
+            stream = spooled
+        try:
+            workbook = load_workbook(stream, read_only=True, data_only=True)
+        except Exception:
+            raise ImportFormatError('Invalid XLSX file')
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(name or '').strip().lower() for name in next(rows, ())]
+            for line, cells in enumerate(rows, start=2):
+                values = {name: _clean(value) for name, value in zip(header, cells) if name}
+                if any(value is not None for value in values.values()):
+                    yield line, values
+        finally:
+            workbook.close()
+    else:
+        raise ImportFormatError('Unsupported format (expected csv or xlsx)')
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class ImportReport:
+    """Compteurs par type d'élément et erreurs par ligne (limitées à `max_errors`)"""
+
+    def __init__(self, kind, dry_run, max_errors):
+        self.kind = kind
+        self.dry_run = dry_run
+        self.max_errors = max_errors
+        self.rows = 0
+        self.counts = {}
+        self.errors = []
+        self.error_count = 0
+
+    def count(self, item, outcome, number=1):
+        self.counts.setdefault(item, {'created': 0, 'existing': 0})[outcome] += number
+
+    def error(self, line, errors):
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'row': line, 'errors': errors})
+
+    def to_dict(self):
+        return {
+            'kind': self.kind,
+            'dry_run': self.dry_run,
+            'committed': not self.dry_run and not self.error_count,
+            'rows': self.rows,
+            'counts': self.counts,
+            'error_count': self.error_count,
+            'errors': self.errors
+        }
+
+
+class StructureImporter:
+    """Centres et bureaux d'une élection, une ligne par bureau (center, office, province, commune).
+
+    Les centres existants, leurs bureaux et les communes sont chargés une fois ;
+    les centres sont ensuite résolus par leur nom en mémoire. Un centre ou un
+    bureau déjà présent est compté comme existant, ce qui rend l'import rejouable.
+    """
+
+    def __init__(self, election_id, report):
+        self.election_id = election_id
+        self.report = report
+        self.centers = {}
+        self.center_communes = {}
+        self.seen_centers = set()
+        for center in db.session.query(VotingCenter.id, VotingCenter.name, VotingCenter.commune_id).filter_by(election_id=election_id):
+            self.centers[center.name] = center.id
+            self.center_communes[center.name] = center.commune_id
+        self.offices = set(
+            db.session.query(VotingOffice.center_id, VotingOffice.name)
+            .join(VotingCenter, VotingCenter.id == VotingOffice.center_id)
+            .filter(VotingCenter.election_id == election_id)
+        )
+        provinces = {area.id: area.name for area in Area.query.filter_by(level='province')}
+        self.communes = {
+            (provinces.get(area.parent_id), area.name): area.id
+            for area in Area.query.filter_by(level='commune')
+        }
+
+    def _commune_id(self, row):
+        if row.get('commune') is None:
+            return None
+        return self.communes.get((row.get('province'), row['commune']), False)
+
+    def process(self, chunk):
+        centers = [
+            {'name': row.get('center'), 'election_id': self.election_id, 'commune_id': self._commune_id(row) or None}
+            for _, row in chunk
+        ]
+        offices = [{'name': row.get('office')} for _, row in chunk]
+        center_errors = center_schema.validate(centers)
+        office_errors = office_schema.validate(offices)
+
+        new_centers = {}
+        accepted = []
+        for index, (line, row) in enumerate(chunk):
+            errors = {}
+            errors.update({f'center.{field}': messages for field, messages in center_errors.get(index, {}).items()})
+            errors.update({f'office.{field}': messages for field, messages in office_errors.get(index, {}).items()})
+            commune_id = self._commune_id(row)
+            if commune_id is False:
+                errors['commune'] = ['Unknown commune for this province.']
+            if errors:
+                self.report.error(line, errors)
+                continue
+
+            name = centers[index]['name']
+            known = self.center_communes.get(name, new_centers.get(name, {}).get('commune_id', commune_id))
+            if commune_id is not None and known != commune_id:
+                self.report.error(line, {'commune': [f'Center {name!r} belongs to a different commune.']})
+                continue
+            if name not in self.seen_centers:
+                self.seen_centers.add(name)
+                if name in self.centers:
+                    self.report.count('centers', 'existing')
+                else:
+                    new_centers[name] = centers[index]
+            accepted.append((line, name, offices[index]['name']))
+
+        if new_centers:
+            created = db.session.execute(
+                insert(VotingCenter).returning(VotingCenter.id, VotingCenter.name), list(new_centers.values())
+            )
+            for center_id, name in created:
+                self.centers[name] = center_id
+                self.center_communes[name] = new_centers[name]['commune_id']
+            self.report.count('centers', 'created', len(new_centers))
+
+        rows = []
+        for line, center_name, office_name in accepted:
+            key = (self.centers[center_name], office_name)
+            if key in self.offices:
+                self.report.count('offices', 'existing')
+                continue
+            self.offices.add(key)
+            rows.append({'center_id': key[0], 'name': office_name})
+        if rows:
+            db.session.execute(insert(VotingOffice), rows)
+            self.report.count('offices', 'created', len(rows))
+
+
+class CandidateImporter:
+    """Candidats d'une élection (first_name, last_name, code_name) ; `code_name` est unique"""
+
+    def __init__(self, election_id, report):
+        self.election_id = election_id
+        self.report = report
+        self.seen = set()
+
+    def process(self, chunk):
+        candidates = [
+            {field: row.get(field) for field in ('first_name', 'last_name', 'code_name')}
+            for _, row in chunk
+        ]
+        for candidate in candidates:
+            candidate['election_id'] = self.election_id
+        schema_errors = candidate_schema.validate(candidates)
+
+        codes = [candidate['code_name'] for candidate in candidates if candidate['code_name']]
+        existing = dict(
+            db.session.query(Candidate.code_name, Candidate.election_id).filter(Candidate.code_name.in_(codes))
+        ) if codes else {}
+
+        rows = []
+        for index, (line, _) in enumerate(chunk):
+            candidate = candidates[index]
+            if index in schema_errors:
+                self.report.error(line, schema_errors[index])
+                continue
+            code = candidate['code_name']
+            if code in self.seen:
+                self.report.error(line, {'code_name': ['Duplicate code_name in the file.']})
+                continue
+            self.seen.add(code)
+            if code in existing:
+                if existing[code] != self.election_id:
+                    self.report.error(line, {'code_name': ['Already used by another election.']})
+                else:
+                    self.report.count('candidates', 'existing')
+                continue
+            rows.append(candidate)
+        if rows:
+            db.session.execute(insert(Candidate), rows)
+            self.report.count('candidates', 'created', len(rows))
+
+
+IMPORTERS = {'structure': StructureImporter, 'candidates': CandidateImporter}
+
+
+def run_import(election_id, kind, stream, file_format, dry_run=False):
+    """Importe un fichier en une seule transaction, par morceaux de IMPORT_CHUNK_SIZE lignes.
+
+    Rien n'est enregistré si une ligne est en erreur ou en mode `dry_run` :
+    les insertions sont tout de même exécutées (puis annulées) pour que le
+    rapport reflète aussi les contraintes de la base. Retourne le rapport.
+    """
+    if kind not in IMPORTERS:
+        raise ImportFormatError(f'Unknown import kind (expected one of {", ".join(IMPORT_KINDS)})')
+    report = ImportReport(kind, dry_run, current_app.config['IMPORT_MAX_ERRORS'])
+    importer = IMPORTERS[kind](election_id, report)
+
+    try:
+        for chunk in _chunks(read_rows(stream, file_format), current_app.config['IMPORT_CHUNK_SIZE']):
+            report.rows += len(chunk)
+            importer.process(chunk)
+
+        if dry_run or report.error_count:
+            db.session.rollback()
+        else:
+            response_cache.invalidate_on_commit(db.session, election_id)
+            db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return report
+
+
+@elections_cli.command('import')
+@click.argument('election_id', type=int)
+@click.argument('kind', type=click.Choice(IMPORT_KINDS))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--dry-run', is_flag=True, help='Valider le fichier sans rien enregistrer.')
+def import_command(election_id, kind, path, dry_run):
+    """Importe les centres et bureaux (structure) ou les candidats d'une élection depuis un fichier CSV ou XLSX."""
+    if db.session.get(Election, election_id) is None:
+        raise click.ClickException(f'Élection {election_id} introuvable')
+
+    file_format = path.rsplit('.', 1)[-1].lower()
+    with open(path, 'rb') as stream:
+        report = run_import(election_id, kind, stream, file_format, dry_run)
+
+    for error in report.errors:
+        click.echo(f"ligne {error['row']}: {error['errors']}", err=True)
+    for item, counts in report.counts.items():
+        click.echo(f"{item}: {counts['created']} créé(s), {counts['existing']} existant(s)")
+    if report.error_count:
+        raise click.ClickException(f'{report.error_count} ligne(s) en erreur, rien n\'a été enregistré')
+    click.echo(f'{report.rows} ligne(s) ' + ('validée(s) (dry-run)' if dry_run else 'importée(s)'))
@@ -0,0 +1,146 @@
+import os
+import time
+from flask import g, request
+from sqlalchemy import event
+
+PREFIX = 'res_elec_'
+
+
+class Metrics:
+    """Métriques Prometheus de l'application (nécessite prometheus_client).
+
+    Requêtes HTTP par blueprint et route, pool de connexions SQLAlchemy,
+    résultats écrits par élection, octets téléversés et succès des caches.
+    Sous gunicorn, PROMETHEUS_MULTIPROC_DIR doit être défini avant le
+    démarrage des workers (voir gunicorn.conf.py) : chaque worker écrit ses
+    compteurs dans ce dossier et /metrics agrège ceux de tous les workers.
+    Sans METRICS_ENABLED, toutes les méthodes sont sans effet.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.requests = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('METRICS_ENABLED', False)
+        self.token = app.config.get('METRICS_TOKEN')
+        if not self.enabled:
+            return
+        try:
+            import prometheus_client
+        except ImportError:
+            raise RuntimeError('Les métriques nécessitent le paquet prometheus_client')
+        self.multiprocess = bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+        if self.requests is None:
+            self._create(prometheus_client)
+
+        app.before_request(self._start_request)
+        app.after_request(self._end_request)
+        from app import db
+        with app.app_context():
+            for engine in db.engines.values():
+                self._watch_pool(engine)
+
+    def _create(self, prometheus_client):
+        Counter, Gauge, Histogram = prometheus_client.Counter, prometheus_client.Gauge, prometheus_client.Histogram
+        self.requests = Counter(
+            PREFIX + 'http_requests_total', 'Requêtes HTTP', ('blueprint', 'route', 'method', 'status')
+        )
+        self.latency = Histogram(
+            PREFIX + 'http_request_duration_seconds', 'Durée des requêtes HTTP', ('blueprint', 'route', 'method')
+        )
+        # Gauges are summed over the live workers in multiprocess mode
+        self.pool_size = Gauge(PREFIX + 'db_pool_size', 'Taille du pool de connexions', multiprocess_mode='livesum')
+        self.pool_checked_out = Gauge(
+            PREFIX + 'db_pool_checked_out', 'Connexions empruntées au pool', multiprocess_mode='livesum'
+        )
+        self.pool_overflow = Gauge(
+            PREFIX + 'db_pool_overflow', 'Connexions ouvertes au-delà de la taille du pool', multiprocess_mode='livesum'
+        )
+        self.pool_checkouts = Counter(PREFIX + 'db_pool_checkouts_total', 'Emprunts de connexion au pool')
+        self.pool_connects = Counter(PREFIX + 'db_pool_connects_total', 'Connexions ouvertes vers la base')
+        self.pool_wait = Histogram(
+            PREFIX + 'db_pool_checkout_seconds', "Attente d'une connexion du pool (ouverture comprise)",
+            buckets=(.0005, .001, .005, .01, .05, .1, .5, 1, 5, 30)
+        )
+        self.results = Counter(
+            PREFIX + 'results_submitted_total', 'Bureaux dont les résultats ont été écrits', ('election_id',)
+        )
+        self.upload_bytes = Counter(PREFIX + 'upload_bytes_total', 'Octets téléversés', ('folder',))
+        self.cache_requests = Counter(
+            PREFIX + 'cache_requests_total', 'Consultations des caches', ('cache', 'result')
+        )
+
+    def _watch_pool(self, engine):
+        pool = engine.pool
+        if hasattr(pool, 'size'):
+            self.pool_size.inc(pool.size())
+
+        def on_checkout(dbapi_connection, connection_record, connection_proxy):
+            self.pool_checkouts.inc()
+            self.pool_checked_out.inc()
+            self._set_overflow(engine.pool)
+
+        def on_checkin(dbapi_connection, connection_record):
+            self.pool_checked_out.dec()
+            self._set_overflow(engine.pool)
+
+        event.listen(engine, 'checkout', on_checkout)
+        event.listen(engine, 'checkin', on_checkin)
+        event.listen(engine, 'connect', lambda dbapi_connection, connection_record: self.pool_connects.inc())
+
+        # No pool event precedes a checkout: the wait is timed around the engine's own call
+        raw_connection = engine.raw_connection
+
+        def timed_raw_connection():
+            start = time.perf_counter()
+            try:
+                return raw_connection()
+            finally:
+                self.pool_wait.observe(time.perf_counter() - start)
+        engine.raw_connection = timed_raw_connection
+
+    def _set_overflow(self, pool):
+        if hasattr(pool, 'overflow'):
+            self.pool_overflow.set(max(pool.overflow(), 0))
+
+    def _start_request(self):
+        g.metrics_start = time.perf_counter()
+
+    def _end_request(self, response):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return response
+        blueprint = request.blueprint or 'app'
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        self.requests.labels(blueprint, route, request.method, response.status_code).inc()
+        self.latency.labels(blueprint, route, request.method).observe(time.perf_counter() - start)
+        return response
+
+    def count_results(self, counts):
+        """Bureaux écrits par élection ({election_id: nombre}), à appeler une fois la transaction validée"""
+        if self.enabled:
+            for election_id, count in counts.items():
+                self.results.labels(election_id).inc(count)
+
+    def count_upload(self, folder, size):
+        if self.enabled:
+            self.upload_bytes.labels(folder).inc(size)
+
+    def count_cache(self, cache, hit):
+        if self.enabled:
+            self.cache_requests.labels(cache, 'hit' if hit else 'miss').inc()
+
+    def render(self):
+        """Exposition au format texte de Prometheus : (corps, type de contenu)"""
+        from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest, multiprocess
+        registry = REGISTRY
+        if self.multiprocess:
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+metrics = Metrics()
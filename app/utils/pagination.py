@@ -0,0 +1,68 @@
+import base64
+import json
+from urllib.parse import urlencode
+from flask import current_app
+
+
+class PaginationError(ValueError):
+    pass
+
+
+def encode_cursor(last_id):
+    payload = json.dumps({'id': last_id}).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        last_id = json.loads(base64.urlsafe_b64decode(padded.encode()))['id']
+    except (ValueError, KeyError, TypeError):
+        raise PaginationError('Invalid cursor')
+    if not isinstance(last_id, int):
+        raise PaginationError('Invalid cursor')
+    return last_id
+
+
+def pagination_args(request):
+    """Lit `limit` et `cursor` dans la requête"""
+    default_limit = current_app.config['PAGINATION_DEFAULT_LIMIT']
+    max_limit = current_app.config['PAGINATION_MAX_LIMIT']
+    try:
+        limit = int(request.args.get('limit', default_limit))
+    except ValueError:
+        raise PaginationError('Invalid limit')
+    if limit < 1:
+        raise PaginationError('Invalid limit')
+
+    cursor = request.args.get('cursor')
+    return min(limit, max_limit), decode_cursor(cursor) if cursor else None
+
+
+def paginate(query, model, request):
+    """Pagination par clé (keyset) sur l'identifiant : WHERE id > :dernier ORDER BY id LIMIT n.
+
+    Le coût d'une page ne dépend pas de sa position, contrairement à OFFSET.
+    Retourne (éléments, curseur suivant ou None).
+    """
+    limit, last_id = pagination_args(request)
+    if last_id is not None:
+        query = query.filter(model.id > last_id)
+    items = query.order_by(model.id).limit(limit + 1).all()
+
+    if len(items) > limit:
+        items = items[:limit]
+        return items, encode_cursor(items[-1].id)
+    return items, None
+
+
+def next_page_headers(request, next_cursor):
+    """En-têtes Link (RFC 8288) et X-Next-Cursor pour la page suivante"""
+    if not next_cursor:
+        return {}
+    args = request.args.to_dict()
+    args['cursor'] = next_cursor
+    return {
+        'Link': f'<{request.base_url}?{urlencode(args)}>; rel="next"',
+        'X-Next-Cursor': next_cursor
+    }
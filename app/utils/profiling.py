@@ -0,0 +1,178 @@
+import heapq
+import json
+import logging
+import time
+from contextlib import contextmanager
+from flask import current_app, g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+PROFILE_KEY = 'request_profile'
+QUERY_START_KEY = 'request_profile_query_start'
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_budget(limit):
+    """Nombre maximal de requêtes SQL d'une vue (à placer juste sous @bp.route)"""
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+class RequestProfile:
+    """Mesures d'une requête HTTP : requêtes SQL, temps base de données et de sérialisation"""
+
+    def __init__(self, keep):
+        self.started = time.perf_counter()
+        self.keep = keep
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.slowest = []
+        self.serialize_depth = 0
+
+    def record_query(self, statement, duration):
+        self.queries += 1
+        self.db_time += duration
+        # Min-heap of the `keep` slowest statements
+        item = (duration, self.queries, statement)
+        if len(self.slowest) < self.keep:
+            heapq.heappush(self.slowest, item)
+        elif duration > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, item)
+
+    def slowest_statements(self):
+        return [
+            {'ms': round(duration * 1000, 2), 'sql': ' '.join(statement.split())[:500]}
+            for duration, _, statement in sorted(self.slowest, reverse=True)
+        ]
+
+    def to_dict(self):
+        return {
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'duration_ms': round((time.perf_counter() - self.started) * 1000, 2),
+            'queries': self.queries,
+            'db_ms': round(self.db_time * 1000, 2),
+            'serialize_ms': round(self.serialize_time * 1000, 2),
+            'slowest': self.slowest_statements()
+        }
+
+
+def current_profile():
+    return g.get(PROFILE_KEY) if has_request_context() else None
+
+
+@contextmanager
+def serializing():
+    """Compte le bloc dans le temps de sérialisation de la requête (les appels imbriqués une seule fois)"""
+    profile = current_profile()
+    if profile is None or profile.serialize_depth:
+        yield
+        return
+    profile.serialize_depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.serialize_time += time.perf_counter() - start
+        profile.serialize_depth -= 1
+
+
+class ProfiledJSONProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs):
+        with serializing():
+            return super().dumps(obj, **kwargs)
+
+
+class RequestProfiler:
+    """Profil SQL de chaque requête HTTP.
+
+    Les événements du moteur SQLAlchemy comptent les requêtes et leur durée
+    dans le contexte de la requête en cours ; le schéma marshmallow et
+    l'encodage JSON mesurent la sérialisation. Le résultat est renvoyé dans
+    l'en-tête `Server-Timing` et journalisé (avec les requêtes les plus
+    lentes) quand une requête SQL est lente ou que la vue dépasse son budget.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('REQUEST_PROFILING', True)
+        self.server_timing = app.config.get('SERVER_TIMING', True)
+        self.slow_query = app.config.get('SLOW_QUERY_MS', 100) / 1000
+        self.keep = app.config.get('REQUEST_PROFILE_SLOWEST', 3)
+        self.log_mode = app.config.get('REQUEST_PROFILE_LOG', 'slow')
+        self.default_budget = app.config.get('QUERY_BUDGET', 0)
+        self.strict = app.config.get('QUERY_BUDGET_STRICT', False)
+        if not self.enabled:
+            return
+
+        app.json = ProfiledJSONProvider(app)
+        # Listening on the Engine class covers the engines created lazily per app
+        if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+            event.listen(Engine, 'handle_error', _handle_error)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+
+    def _start(self):
+        g.setdefault(PROFILE_KEY, RequestProfile(self.keep))
+
+    def _finish(self, response):
+        profile = g.pop(PROFILE_KEY, None)
+        if profile is None:
+            return response
+        data = profile.to_dict()
+
+        if self.server_timing:
+            response.headers['Server-Timing'] = ', '.join((
+                f'db;dur={data["db_ms"]};desc="{profile.queries} queries"',
+                f'serialize;dur={data["serialize_ms"]}',
+                f'total;dur={data["duration_ms"]}'
+            ))
+
+        view = current_app.view_functions.get(request.endpoint)
+        budget = getattr(view, 'query_budget', None) or self.default_budget
+        over_budget = bool(budget) and profile.queries > budget
+        slow = bool(profile.slowest) and max(profile.slowest)[0] >= self.slow_query
+        if self.log_mode == 'all' or (self.log_mode == 'slow' and (over_budget or slow)):
+            data['query_budget'] = budget or None
+            level = logging.WARNING if over_budget or slow else logging.INFO
+            logger.log(level, 'Profil de requête %s', json.dumps(data), extra={'profile': data})
+
+        if over_budget and self.strict:
+            raise QueryBudgetExceeded(
+                f'{request.method} {request.path}: {profile.queries} requêtes SQL (budget {budget})'
+            )
+        return response
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_profile() is not None:
+        conn.info.setdefault(QUERY_START_KEY, []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = current_profile()
+    starts = conn.info.get(QUERY_START_KEY)
+    if profile is not None and starts:
+        profile.record_query(statement, time.perf_counter() - starts.pop())
+
+
+def _handle_error(exception_context):
+    starts = exception_context.connection.info.get(QUERY_START_KEY) if exception_context.connection else None
+    if starts:
+        starts.pop()
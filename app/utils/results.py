@@ -0,0 +1,258 @@
+import json
+from datetime import datetime
+from functools import partial
+from sqlalchemy import delete, tuple_, update
+from sqlalchemy.orm import joinedload
+from app import audit_log, db, metrics
+from app.models.election import Area, VotingCenter, VotingOffice, VotingResult
+from app.schemas import VotingResultSchema
+from app.utils.audit import audit_state
+from app.utils.tally import TallyDelta, STAT_FIELDS
+from app.utils.transaction import after_commit
+from app.utils.upsert import upsert
+
+# Bound parameters per IN (...) clause, kept well below SQLite/PostgreSQL limits
+IN_CHUNK_SIZE = 500
+
+results_schema = VotingResultSchema(many=True)
+
+
+class BatchFormatError(ValueError):
+    pass
+
+
+def parse_batch_payload(request):
+    """Lit un lot de résultats au format JSON ({"offices": [...]} ou liste) ou NDJSON"""
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        entries = []
+        for line_number, line in enumerate(request.get_data(as_text=True).splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                raise BatchFormatError(f'Invalid JSON on line {line_number}')
+        return entries
+
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('offices')
+    if not isinstance(data, list):
+        raise BatchFormatError('Expected a list of offices or {"offices": [...]}')
+    return data
+
+
+def validate_batch(entries):
+    """Valide un lot, retourne (entrées valides indexées par bureau, statuts par entrée)"""
+    statuses = []
+    valid = {}
+    rows = []
+    owners = []
+
+    for index, entry in enumerate(entries):
+        status = {'index': index, 'office_id': entry.get('office_id') if isinstance(entry, dict) else None}
+        statuses.append(status)
+        errors = _entry_errors(entry)
+        if errors:
+            status.update(status='invalid', errors=errors)
+            continue
+        for position, result in enumerate(entry.get('results', [])):
+            rows.append(dict(result, office_id=entry['office_id']) if isinstance(result, dict) else result)
+            owners.append((index, position))
+
+    # Candidate results of the whole batch are validated in a single schema pass
+    for row_index, row_errors in results_schema.validate(rows).items():
+        index, position = owners[row_index]
+        statuses[index]['status'] = 'invalid'
+        statuses[index].setdefault('errors', {}).setdefault('results', {})[position] = row_errors
+
+    for index, entry in enumerate(entries):
+        if 'status' not in statuses[index]:
+            # A later entry for the same office supersedes an earlier one
+            valid[entry['office_id']] = (index, entry)
+    return valid, statuses
+
+
+def validate_office_results(office_id, data):
+    """Valide la soumission d'un seul bureau, retourne (entrée, erreurs) ; erreurs vaut None si elle est valide"""
+    entry = dict(data, office_id=office_id) if isinstance(data, dict) else data
+    valid, statuses = validate_batch([entry])
+    if not valid:
+        return None, statuses[0]['errors']
+    return valid[office_id][1], None
+
+
+def _entry_errors(entry):
+    if not isinstance(entry, dict):
+        return {'_schema': ['Expected an object']}
+
+    errors = {}
+    if not isinstance(entry.get('office_id'), int) or isinstance(entry.get('office_id'), bool):
+        errors['office_id'] = ['Not a valid integer.']
+    for field in STAT_FIELDS:
+        value = entry.get(field, 0)
+        if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+            errors[field] = ['Must be a non-negative integer.']
+    if not isinstance(entry.get('results', []), list):
+        errors['results'] = ['Not a valid list.']
+    return errors
+
+
+def _chunks(values, size=IN_CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def load_office_states(office_ids):
+    """Retourne {office_id: (election_id, center_id, état, date de soumission, (commune_id, province_id))}
+    pour les bureaux existants, en une requête par paquet de IN_CHUNK_SIZE bureaux.
+
+    Les bureaux sont verrouillés (FOR UPDATE, par id croissant) jusqu'à la fin de la
+    transaction : deux soumissions concurrentes d'un même bureau ne peuvent pas
+    partir du même état et fausser les agrégats. La commune et la province du
+    centre sont lues en même temps pour le report sur les compteurs par zone.
+    """
+    states = {}
+    for chunk in _chunks(sorted(office_ids)):
+        # One row per candidate result (a single one, without result, for an empty office)
+        rows = db.session.query(
+            VotingOffice.id, VotingCenter.election_id, VotingOffice.center_id, VotingOffice.submitted_at,
+            VotingOffice.total_voters, VotingOffice.blank_votes, VotingOffice.null_votes,
+            VotingCenter.commune_id, Area.parent_id, VotingResult.candidate_id, VotingResult.votes
+        ).join(VotingCenter, VotingCenter.id == VotingOffice.center_id) \
+            .outerjoin(Area, Area.id == VotingCenter.commune_id) \
+            .outerjoin(VotingResult, VotingResult.office_id == VotingOffice.id) \
+            .filter(VotingOffice.id.in_(chunk)) \
+            .order_by(VotingOffice.id) \
+            .with_for_update(of=VotingOffice)
+        for row in rows:
+            if row.id not in states:
+                state = {field: getattr(row, field) or 0 for field in STAT_FIELDS}
+                state['votes'] = {}
+                states[row.id] = (row.election_id, row.center_id, state, row.submitted_at, (row.commune_id, row.parent_id))
+            if row.candidate_id is not None:
+                office_votes = states[row.id][2]['votes']
+                office_votes[row.candidate_id] = office_votes.get(row.candidate_id, 0) + (row.votes or 0)
+    return states
+
+
+def load_office(office_id):
+    """Bureau avec son centre, son élection et ses résultats (réponse des routes), en une requête"""
+    return VotingOffice.query.options(
+        joinedload(VotingOffice.center).joinedload(VotingCenter.election),
+        joinedload(VotingOffice.results)
+    ).get(office_id)
+
+
+def merge_office_state(before, entry, replace=True):
+    """Calcule l'état d'un bureau après application d'une soumission.
+
+    En mode `replace` la soumission remplace entièrement le bureau (les
+    compteurs absents valent 0 et les candidats absents sont supprimés) ;
+    sinon seuls les champs et candidats fournis sont modifiés.
+    """
+    if replace:
+        after = {field: entry.get(field, 0) for field in STAT_FIELDS}
+        votes = {}
+    else:
+        after = {field: entry.get(field, before[field]) for field in STAT_FIELDS}
+        votes = dict(before['votes'])
+
+    submitted = {}
+    for result in entry.get('results', []):
+        candidate_id = result['candidate_id']
+        submitted[candidate_id] = submitted.get(candidate_id, 0) + result['votes']
+    votes.update(submitted)
+    after['votes'] = votes
+    return after
+
+
+def write_office_batch(entries, replace=True, user_ids=None, submitted_at=None):
+    """Écrit les résultats d'un lot de bureaux en une transaction, sans commit.
+
+    `entries` est le dictionnaire {office_id: (index, entrée)} produit par validate_batch,
+    `user_ids` l'auteur de chaque soumission ({office_id: user_id}) pour le journal d'audit,
+    `submitted_at` la date de chaque soumission ({office_id: datetime}, maintenant par défaut) :
+    une soumission antérieure à la dernière écrite pour le bureau est ignorée (statut
+    'superseded'). Seuls les résultats réellement modifiés sont écrits. Retourne {office_id: statut}.
+    """
+    now = datetime.utcnow()
+    states = load_office_states(entries.keys())
+    statuses = {}
+    office_updates = []
+    result_rows = []
+    stale_results = []
+    audits = []
+    written = {}
+    tally = TallyDelta()
+
+    for office_id, (index, entry) in entries.items():
+        if office_id not in states:
+            statuses[office_id] = 'not_found'
+            continue
+
+        election_id, center_id, before, last_submitted_at, ancestors = states[office_id]
+        submitted = (submitted_at or {}).get(office_id, now)
+        if last_submitted_at is not None and submitted < last_submitted_at:
+            # A more recent submission was written first (queued writes from several workers)
+            statuses[office_id] = 'superseded'
+            continue
+        after = merge_office_state(before, entry, replace)
+
+        office_update = {'id': office_id, 'submitted_at': submitted}
+        if any(after[field] != before[field] for field in STAT_FIELDS):
+            office_update.update({field: after[field] for field in STAT_FIELDS}, updated_at=now)
+        office_updates.append(office_update)
+        for candidate_id, votes in after['votes'].items():
+            if before['votes'].get(candidate_id) != votes:
+                result_rows.append({
+                    'office_id': office_id, 'candidate_id': candidate_id, 'votes': votes,
+                    'created_at': now, 'updated_at': now
+                })
+        stale_results.extend((office_id, candidate_id) for candidate_id in before['votes'] if candidate_id not in after['votes'])
+
+        tally.add(election_id, before, after, center_id, ancestors)
+        if after != before:
+            user_id = (user_ids or {}).get(office_id)
+            audits.append({
+                'office_id': office_id, 'election_id': election_id,
+                'user_id': int(user_id) if user_id is not None else None,
+                'action': 'submit' if replace else 'update',
+                'before': audit_state(before), 'after': audit_state(after), 'created_at': now
+            })
+        statuses[office_id] = 'ok'
+        written[election_id] = written.get(election_id, 0) + 1
+
+    if office_updates:
+        # Same order as the locks taken above
+        office_updates.sort(key=lambda row: row['id'])
+        db.session.execute(update(VotingOffice), office_updates)
+    for chunk in _chunks(stale_results):
+        db.session.execute(
+            delete(VotingResult).where(tuple_(VotingResult.office_id, VotingResult.candidate_id).in_(chunk)),
+            execution_options={'synchronize_session': False}
+        )
+    upsert_results(result_rows)
+    tally.apply()
+    audit_log.record(db.session, audits)
+    if written:
+        after_commit(db.session, partial(metrics.count_results, written))
+
+    return statuses
+
+
+def upsert_results(rows):
+    """Insère ou met à jour des résultats par (office_id, candidate_id), sans réécrire les lignes inchangées"""
+    upsert(
+        VotingResult,
+        rows,
+        ['office_id', 'candidate_id'],
+        lambda excluded: {'votes': excluded.votes, 'updated_at': excluded.updated_at},
+        where=lambda excluded: VotingResult.votes.is_distinct_from(excluded.votes)
+    )
+
+
+def write_office_results(office_id, data, replace=True, user_id=None):
+    """Écrit la soumission d'un seul bureau (sans commit)"""
+    return write_office_batch({office_id: (0, dict(data, office_id=office_id))}, replace, {office_id: user_id})[office_id]
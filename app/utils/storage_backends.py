@@ -0,0 +1,170 @@
+import base64
+import hashlib
+import io
+import os
+
+
+class LocalBackend:
+    """Fichiers sur le disque local, sous UPLOAD_FOLDER (une seule instance ou disque partagé)"""
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, key):
+        return os.path.join(self.root, key)
+
+    def local_path(self, key):
+        return self._path(key)
+
+    def size(self, key):
+        """Taille de l'objet, None s'il n'existe pas"""
+        path = self._path(key)
+        return os.path.getsize(path) if os.path.isfile(path) else None
+
+    def save(self, filename, key, content_type=None):
+        """Déplace le fichier local `filename` (déjà complet) vers `key`"""
+        os.makedirs(os.path.dirname(self._path(key)), exist_ok=True)
+        os.replace(filename, self._path(key))
+
+    def write(self, key, data, content_type=None):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f'{path}.tmp{os.getpid()}'
+        with open(temporary, 'wb') as f:
+            f.write(data)
+        os.replace(temporary, path)
+
+    def open(self, key):
+        return open(self._path(key), 'rb')
+
+    def delete(self, key):
+        path = self._path(key)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def list(self, prefix):
+        directory = self._path(prefix)
+        if not os.path.isdir(directory):
+            return
+        for name in sorted(os.listdir(directory)):
+            if '.tmp' not in name:
+                yield f'{prefix}/{name}'
+
+    def url(self, key):
+        return None
+
+    def presigned_upload(self, key, content_type, size, checksum):
+        """Envoi direct par le client : non disponible sur disque local"""
+        return None
+
+    def verify_upload(self, key, checksum):
+        return None
+
+
+class S3Backend:
+    """Stockage objet compatible S3 (AWS, MinIO, Scaleway…), partagé par toutes les instances.
+
+    Les fichiers au-delà de `multipart_threshold` sont envoyés en plusieurs
+    parties. `client` permet d'injecter un client boto3 déjà configuré.
+    """
+
+    def __init__(self, bucket, client=None, endpoint_url=None, region=None, prefix='', public_url=None,
+                 url_expires=3600, multipart_threshold=8 * 1024 * 1024, multipart_chunksize=8 * 1024 * 1024):
+        try:
+            import boto3
+            from boto3.s3.transfer import TransferConfig
+            from botocore.config import Config
+            from botocore.exceptions import ClientError
+        except ImportError:
+            raise RuntimeError("Le stockage 's3' nécessite le paquet boto3")
+        self.client = client or boto3.client(
+            's3', endpoint_url=endpoint_url, region_name=region, config=Config(signature_version='s3v4')
+        )
+        self.bucket = bucket
+        self.prefix = prefix
+        self.public_url = public_url.rstrip('/') if public_url else None
+        self.url_expires = url_expires
+        self.transfer = TransferConfig(multipart_threshold=multipart_threshold, multipart_chunksize=multipart_chunksize)
+        self._client_error = ClientError
+
+    def _key(self, key):
+        return self.prefix + key
+
+    def local_path(self, key):
+        return None
+
+    def _head(self, key, **kwargs):
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self._key(key), **kwargs)
+        except self._client_error as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+
+    def size(self, key):
+        head = self._head(key)
+        return head['ContentLength'] if head else None
+
+    def save(self, filename, key, content_type=None):
+        extra = {'ContentType': content_type} if content_type else {}
+        self.client.upload_file(filename, self.bucket, self._key(key), ExtraArgs=extra, Config=self.transfer)
+        os.remove(filename)
+
+    def write(self, key, data, content_type=None):
+        extra = {'ContentType': content_type} if content_type else {}
+        self.client.put_object(Bucket=self.bucket, Key=self._key(key), Body=data, **extra)
+
+    def open(self, key):
+        body = self.client.get_object(Bucket=self.bucket, Key=self._key(key))['Body']
+        return io.BytesIO(body.read())
+
+    def read_head(self, key, length):
+        response = self.client.get_object(Bucket=self.bucket, Key=self._key(key), Range=f'bytes=0-{length - 1}')
+        return response['Body'].read()
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def list(self, prefix):
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self._key(prefix) + '/'):
+            for item in page.get('Contents', ()):
+                yield item['Key'][len(self.prefix):]
+
+    def url(self, key):
+        if self.public_url:
+            return f'{self.public_url}/{self._key(key)}'
+        return self.client.generate_presigned_url(
+            'get_object', Params={'Bucket': self.bucket, 'Key': self._key(key)}, ExpiresIn=self.url_expires
+        )
+
+    def presigned_upload(self, key, content_type, size, checksum):
+        """URL de PUT direct ; S3 refuse un contenu dont l'empreinte SHA-256 ne correspond pas"""
+        url = self.client.generate_presigned_url('put_object', Params={
+            'Bucket': self.bucket, 'Key': self._key(key), 'ContentType': content_type,
+            'ContentLength': size, 'ChecksumSHA256': checksum
+        }, ExpiresIn=self.url_expires)
+        return {
+            'method': 'PUT',
+            'url': url,
+            'headers': {'Content-Type': content_type, 'x-amz-checksum-sha256': checksum},
+            'expires_in': self.url_expires
+        }
+
+    def verify_upload(self, key, checksum):
+        """Taille d'un objet envoyé directement si son empreinte SHA-256 est celle attendue, sinon None.
+
+        S3 conserve l'empreinte validée à l'envoi ; les services compatibles
+        qui ne la conservent pas obligent à relire l'objet pour la calculer.
+        """
+        head = self._head(key, ChecksumMode='ENABLED')
+        if head is None:
+            return None
+        stored = head.get('ChecksumSHA256')
+        if stored is None:
+            digest = hashlib.sha256()
+            body = self.client.get_object(Bucket=self.bucket, Key=self._key(key))['Body']
+            for chunk in body.iter_chunks(1024 * 1024):
+                digest.update(chunk)
+            stored = base64.b64encode(digest.digest()).decode()
+        return head['ContentLength'] if stored == checksum else None
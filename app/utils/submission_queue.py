@@ -0,0 +1,217 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+import click
+from flask.cli import AppGroup
+from app.utils.background import BackgroundWorker
+
+logger = logging.getLogger(__name__)
+
+results_cli = AppGroup('results', help="File d'attente des soumissions de résultats.")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS submission (
+    id TEXT PRIMARY KEY,
+    office_id INTEGER NOT NULL,
+    user_id TEXT,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    error TEXT,
+    created_at REAL NOT NULL,
+    claimed_at REAL,
+    processed_at REAL
+);
+CREATE INDEX IF NOT EXISTS ix_submission_status_created ON submission (status, created_at);
+"""
+
+
+class SubmissionQueue:
+    """File d'attente durable (fichier SQLite local) des soumissions de résultats.
+
+    Les requêtes y ajoutent les soumissions validées et répondent aussitôt ;
+    un thread de fond par processus les regroupe en lots et les écrit dans la
+    base principale en une transaction par lot. Le fichier est partagé par les
+    workers gunicorn d'une même machine ; la réservation des lots est atomique
+    (BEGIN IMMEDIATE), et les lots réservés par un processus mort sont repris
+    après `stale_after` secondes.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._local = threading.local()
+        self.worker = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config['RESULTS_ASYNC_WRITES']
+        self.path = app.config['RESULTS_QUEUE_PATH']
+        self.batch_size = app.config['RESULTS_QUEUE_BATCH_SIZE']
+        self.stale_after = app.config['RESULTS_QUEUE_STALE_SECONDS']
+        self.retention = app.config['RESULTS_QUEUE_RETENTION_SECONDS']
+        self.worker = BackgroundWorker('results-writer', self.process_batch, app.config['RESULTS_QUEUE_INTERVAL'])
+        self._last_purge = 0
+
+        if self.enabled:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._connection().executescript(SCHEMA)
+            # Submissions left by a stopped process are written without waiting for a new one
+            if self.pending_count():
+                self.worker.ensure_started()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or getattr(self._local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def enqueue(self, office_id, data, user_id=None):
+        """Enregistre une soumission et retourne son identifiant"""
+        submission_id = uuid.uuid4().hex
+        self._connection().execute(
+            'INSERT INTO submission (id, office_id, user_id, payload, status, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+            (submission_id, office_id, user_id, json.dumps(data), 'queued', time.time())
+        )
+        self.worker.ensure_started()
+        self.worker.wake()
+        return submission_id
+
+    def get(self, submission_id):
+        row = self._connection().execute(
+            'SELECT id, office_id, status, error, created_at, processed_at FROM submission WHERE id = ?',
+            (submission_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        submission = dict(row)
+        for field in ('created_at', 'processed_at'):
+            if submission[field] is not None:
+                submission[field] = datetime.utcfromtimestamp(submission[field]).isoformat()
+        return submission
+
+    def pending_count(self):
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM submission WHERE status IN ('queued', 'processing')"
+        ).fetchone()[0]
+
+    def _claim(self):
+        connection = self._connection()
+        now = time.time()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            rows = connection.execute(
+                "SELECT id, office_id, user_id, payload, created_at FROM submission "
+                "WHERE status = 'queued' OR (status = 'processing' AND claimed_at < ?) "
+                "ORDER BY created_at LIMIT ?",
+                (now - self.stale_after, self.batch_size)
+            ).fetchall()
+            connection.executemany(
+                "UPDATE submission SET status = 'processing', claimed_at = ? WHERE id = ?",
+                [(now, row['id']) for row in rows]
+            )
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        return rows
+
+    def _finish(self, outcomes):
+        now = time.time()
+        self._connection().executemany(
+            'UPDATE submission SET status = ?, error = ?, processed_at = ? WHERE id = ?',
+            [(status, error, now, submission_id) for submission_id, (status, error) in outcomes.items()]
+        )
+
+    def process_batch(self):
+        """Réserve un lot, l'écrit dans la base principale et retourne sa taille"""
+        rows = self._claim()
+        if rows:
+            with self.app.app_context():
+                self._finish(self._write(rows))
+        self._purge()
+        return len(rows)
+
+    def _write(self, rows):
+        from app import db
+        from app.utils.results import write_office_batch
+
+        # Coalesce: for each office only the most recent submission is written
+        entries = {}
+        user_ids = {}
+        submitted_at = {}
+        outcomes = {}
+        for row in rows:
+            previous = entries.get(row['office_id'])
+            if previous is not None:
+                outcomes[previous[0]] = ('superseded', None)
+            entries[row['office_id']] = (row['id'], json.loads(row['payload']))
+            user_ids[row['office_id']] = row['user_id']
+            # Another worker may already have written a more recent submission for the office
+            submitted_at[row['office_id']] = datetime.utcfromtimestamp(row['created_at'])
+
+        try:
+            statuses = write_office_batch(entries, user_ids=user_ids, submitted_at=submitted_at)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Échec d'écriture d'un lot de {len(entries)} bureaux, reprise bureau par bureau: {str(e)}")
+            statuses = self._write_one_by_one(entries, user_ids, submitted_at, outcomes)
+
+        for office_id, (submission_id, _) in entries.items():
+            if submission_id not in outcomes:
+                status = statuses[office_id]
+                if status == 'ok':
+                    outcomes[submission_id] = ('done', None)
+                elif status == 'superseded':
+                    outcomes[submission_id] = ('superseded', None)
+                else:
+                    outcomes[submission_id] = ('failed', status)
+        return outcomes
+
+    def _write_one_by_one(self, entries, user_ids, submitted_at, outcomes):
+        from app import db
+        from app.utils.results import write_office_batch
+
+        statuses = {}
+        for office_id, entry in entries.items():
+            try:
+                statuses.update(write_office_batch({office_id: entry}, user_ids=user_ids, submitted_at=submitted_at))
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                outcomes[entry[0]] = ('failed', str(e))
+        return statuses
+
+    def _purge(self):
+        now = time.time()
+        if now - self._last_purge < 60:
+            return
+        self._last_purge = now
+        self._connection().execute(
+            "DELETE FROM submission WHERE status NOT IN ('queued', 'processing') AND processed_at < ?",
+            (now - self.retention,)
+        )
+
+
+@results_cli.command('drain')
+def drain_command():
+    """Écrit immédiatement toutes les soumissions en attente."""
+    from app import submission_queue
+    total = 0
+    while True:
+        processed = submission_queue.process_batch()
+        if not processed:
+            break
+        total += processed
+    click.echo(f'{total} soumission(s) traitée(s)')
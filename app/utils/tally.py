@@ -0,0 +1,390 @@
+from datetime import datetime
+from functools import partial
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import func
+from app import db, events, response_cache
+from app.models.election import (
+    Area, AreaTally, AreaCandidateTally, Election, ElectionTally, CandidateTally, TallySnapshot,
+    VotingCenter, VotingOffice, VotingResult
+)
+from app.utils.events import election_channel
+from app.utils.transaction import after_commit
+from app.utils.upsert import upsert
+
+STAT_FIELDS = ('total_voters', 'blank_votes', 'null_votes')
+# Roll-up levels below the national total, from the widest to the narrowest
+AREA_LEVELS = ('province', 'commune', 'center')
+
+tally_cli = AppGroup('tally', help='Gestion des compteurs de résultats matérialisés.')
+
+
+def _empty_delta():
+    return {'stats': dict.fromkeys(STAT_FIELDS, 0), 'votes': {}}
+
+
+def _accumulate(delta, stats, votes, sign=1):
+    for field in STAT_FIELDS:
+        delta['stats'][field] += sign * stats.get(field, 0)
+    for candidate_id, diff in votes.items():
+        delta['votes'][candidate_id] = delta['votes'].get(candidate_id, 0) + sign * diff
+
+
+def _is_empty(delta):
+    return not any(delta['stats'].values()) and not any(delta['votes'].values())
+
+
+class TallyDelta:
+    """Accumule les écarts entre deux états de bureaux et les reporte sur les compteurs"""
+
+    def __init__(self):
+        self.elections = {}
+        self.ancestors = {}
+
+    def add(self, election_id, before, after, center_id=None, ancestors=None):
+        """`ancestors` : (commune_id, province_id) du centre s'ils sont connus, lus par apply() sinon"""
+        delta = self.elections.setdefault(election_id, dict(_empty_delta(), centers={}))
+        if ancestors is not None:
+            self.ancestors[center_id] = ancestors
+        stats = {field: after.get(field, 0) - before.get(field, 0) for field in STAT_FIELDS}
+        votes = {}
+        for candidate_id in set(before['votes']) | set(after['votes']):
+            diff = after['votes'].get(candidate_id, 0) - before['votes'].get(candidate_id, 0)
+            if diff:
+                votes[candidate_id] = diff
+
+        _accumulate(delta, stats, votes)
+        if center_id is not None:
+            _accumulate(delta['centers'].setdefault(center_id, _empty_delta()), stats, votes)
+        return self
+
+    def apply(self):
+        """Applique les deltas dans la transaction courante (sans commit).
+
+        Chaque élection modifiée voit sa version incrémentée ; le delta est
+        diffusé aux abonnés temps réel une fois la transaction validée.
+        """
+        now = datetime.utcnow()
+        for election_id, delta in self.elections.items():
+            stats = delta['stats']
+            if _is_empty(delta):
+                continue
+
+            result = upsert(
+                ElectionTally,
+                [dict(stats, election_id=election_id, version=1, updated_at=now)],
+                ['election_id'],
+                lambda excluded: dict(
+                    {field: getattr(ElectionTally, field) + getattr(excluded, field) for field in STAT_FIELDS},
+                    version=ElectionTally.version + 1,
+                    updated_at=excluded.updated_at
+                ),
+                returning=[ElectionTally.version]
+            )
+            votes = [
+                {'election_id': election_id, 'candidate_id': candidate_id, 'votes': diff, 'updated_at': now}
+                for candidate_id, diff in delta['votes'].items()
+            ]
+            upsert(
+                CandidateTally,
+                votes,
+                ['election_id', 'candidate_id'],
+                lambda excluded: {
+                    'votes': CandidateTally.votes + excluded.votes,
+                    'updated_at': excluded.updated_at
+                }
+            )
+            centers = delta['centers']
+            known = {center_id: self.ancestors[center_id] for center_id in centers if center_id in self.ancestors}
+            apply_area_deltas(election_id, roll_up_centers(centers, ancestors=known if len(known) == len(centers) else None), now)
+
+            if result is not None:
+                version = result.scalar_one()
+            else:
+                version = db.session.query(ElectionTally.version).filter_by(election_id=election_id).scalar()
+            record_snapshot(election_id, version, now)
+            message = {field: value for field, value in stats.items() if value}
+            message.update(election_id=election_id, version=version)
+            if delta['votes']:
+                message['candidate_results'] = {str(candidate_id): diff for candidate_id, diff in delta['votes'].items()}
+            after_commit(db.session, partial(events.publish, election_channel(election_id), message))
+            response_cache.invalidate_on_commit(db.session, election_id)
+
+
+def center_ancestors(center_ids):
+    """Retourne {center_id: (commune_id, province_id)} en une requête"""
+    rows = db.session.query(VotingCenter.id, VotingCenter.commune_id, Area.parent_id) \
+        .outerjoin(Area, Area.id == VotingCenter.commune_id) \
+        .filter(VotingCenter.id.in_(list(center_ids)))
+    return {row.id: (row.commune_id, row.parent_id) for row in rows}
+
+
+def roll_up_centers(centers, sign=1, ancestors=None):
+    """Reporte des deltas par centre sur le centre, sa commune et sa province"""
+    if not centers:
+        return {}
+    if ancestors is None:
+        ancestors = center_ancestors(centers.keys())
+
+    areas = {}
+    for center_id, delta in centers.items():
+        commune_id, province_id = ancestors.get(center_id, (None, None))
+        keys = [('center', center_id)]
+        if commune_id is not None:
+            keys.append(('commune', commune_id))
+        if province_id is not None:
+            keys.append(('province', province_id))
+        for key in keys:
+            _accumulate(areas.setdefault(key, _empty_delta()), delta['stats'], delta['votes'], sign)
+    return areas
+
+
+def apply_area_deltas(election_id, areas, now=None):
+    """Ajoute des deltas {(niveau, id): delta} aux compteurs par zone (sans commit)"""
+    now = now or datetime.utcnow()
+    rows = []
+    votes = []
+    for (level, area_id), delta in areas.items():
+        if _is_empty(delta):
+            continue
+        rows.append(dict(delta['stats'], election_id=election_id, level=level, area_id=area_id, updated_at=now))
+        votes.extend(
+            {'election_id': election_id, 'level': level, 'area_id': area_id,
+             'candidate_id': candidate_id, 'votes': diff, 'updated_at': now}
+            for candidate_id, diff in delta['votes'].items() if diff
+        )
+
+    upsert(
+        AreaTally,
+        rows,
+        ['election_id', 'level', 'area_id'],
+        lambda excluded: dict(
+            {field: getattr(AreaTally, field) + getattr(excluded, field) for field in STAT_FIELDS},
+            updated_at=excluded.updated_at
+        )
+    )
+    upsert(
+        AreaCandidateTally,
+        votes,
+        ['election_id', 'level', 'area_id', 'candidate_id'],
+        lambda excluded: {
+            'votes': AreaCandidateTally.votes + excluded.votes,
+            'updated_at': excluded.updated_at
+        }
+    )
+
+
+def move_center_tally(center, commune_id):
+    """Rattache un centre à une autre commune en déplaçant ses totaux (sans commit)"""
+    tally = AreaTally.query.get((center.election_id, 'center', center.id))
+    if tally is not None and commune_id != center.commune_id:
+        delta = _empty_delta()
+        _accumulate(delta, {field: getattr(tally, field) for field in STAT_FIELDS}, {
+            row.candidate_id: row.votes
+            for row in AreaCandidateTally.query.filter_by(election_id=center.election_id, level='center', area_id=center.id)
+        })
+        province_id = db.session.query(Area.parent_id).filter_by(id=commune_id).scalar() if commune_id else None
+
+        # Removed from the previous commune and province, then added to the new ones
+        areas = roll_up_centers({center.id: delta}, -1)
+        for key, area_delta in roll_up_centers({center.id: delta}, 1, {center.id: (commune_id, province_id)}).items():
+            _accumulate(areas.setdefault(key, _empty_delta()), area_delta['stats'], area_delta['votes'])
+        apply_area_deltas(center.election_id, areas)
+        response_cache.invalidate_on_commit(db.session, center.election_id)
+    center.commune_id = commune_id
+
+
+def get_tally_snapshot(election_id):
+    """Totaux d'une élection lus depuis les compteurs matérialisés"""
+    tally = ElectionTally.query.get(election_id)
+    candidate_tallies = CandidateTally.query.filter_by(election_id=election_id).all()
+
+    return {
+        'version': tally.version if tally else 0,
+        'total_voters': tally.total_voters if tally else 0,
+        'blank_votes': tally.blank_votes if tally else 0,
+        'null_votes': tally.null_votes if tally else 0,
+        'candidate_results': {str(ct.candidate_id): ct.votes for ct in candidate_tallies}
+    }
+
+
+def record_snapshot(election_id, version, now=None, force=False):
+    """Ajoute les totaux courants à l'historique (sans commit).
+
+    Sauf `force`, un point n'est ajouté que si TALLY_SNAPSHOT_EVERY versions
+    ou TALLY_SNAPSHOT_INTERVAL secondes se sont écoulées depuis le précédent.
+    """
+    now = now or datetime.utcnow()
+    if not force:
+        last = db.session.query(TallySnapshot.version, TallySnapshot.taken_at) \
+            .filter_by(election_id=election_id) \
+            .order_by(TallySnapshot.taken_at.desc()).first()
+        if last is not None \
+                and version - last.version < current_app.config['TALLY_SNAPSHOT_EVERY'] \
+                and (now - last.taken_at).total_seconds() < current_app.config['TALLY_SNAPSHOT_INTERVAL']:
+            return None
+
+    totals = get_tally_snapshot(election_id)
+    snapshot = TallySnapshot(
+        election_id=election_id,
+        version=version,
+        taken_at=now,
+        candidate_results=totals['candidate_results'],
+        **{field: totals[field] for field in STAT_FIELDS}
+    )
+    db.session.add(snapshot)
+    return snapshot
+
+
+def _history_point(taken_at, version, totals):
+    point = {'taken_at': taken_at.isoformat(), 'version': version}
+    point.update({field: totals[field] for field in STAT_FIELDS})
+    point['candidate_results'] = totals['candidate_results']
+    return point
+
+
+def get_tally_history(election_id, start=None, end=None, resolution=None, max_points=500):
+    """Progression des totaux d'une élection, sous-échantillonnée à `resolution` secondes.
+
+    Les totaux étant cumulés, chaque intervalle est représenté par son dernier
+    point. Sans `resolution`, l'intervalle est choisi pour ne pas dépasser
+    `max_points`. Les totaux courants terminent la série s'ils sont plus
+    récents que le dernier point enregistré.
+    """
+    query = TallySnapshot.query.filter(TallySnapshot.election_id == election_id)
+    if start is not None:
+        query = query.filter(TallySnapshot.taken_at >= start)
+    if end is not None:
+        query = query.filter(TallySnapshot.taken_at <= end)
+    rows = [
+        (row.taken_at, row.version, {field: getattr(row, field) for field in STAT_FIELDS + ('candidate_results',)})
+        for row in query.order_by(TallySnapshot.taken_at)
+    ]
+
+    if end is None:
+        current = ElectionTally.query.get(election_id)
+        if current is not None and (not rows or current.version > rows[-1][1]):
+            rows.append((current.updated_at or datetime.utcnow(), current.version, get_tally_snapshot(election_id)))
+
+    if not rows:
+        return {'election_id': election_id, 'resolution': resolution, 'points': []}
+
+    origin = start or rows[0][0]
+    if resolution is None:
+        span = (rows[-1][0] - origin).total_seconds()
+        resolution = max(1, -(-int(span) // max_points))
+
+    # One point per interval: rows are ordered, so the last one seen wins
+    buckets = {}
+    for row in rows:
+        buckets[int((row[0] - origin).total_seconds() // resolution)] = row
+    return {
+        'election_id': election_id,
+        'resolution': resolution,
+        'points': [_history_point(*buckets[bucket]) for bucket in sorted(buckets)]
+    }
+
+
+def get_area_tallies(election_id, level, area_ids):
+    """Totaux des zones `area_ids` d'un niveau, en deux requêtes quel que soit leur nombre"""
+    area_ids = list(area_ids)
+    totals = {area_id: dict(dict.fromkeys(STAT_FIELDS, 0), candidate_results={}) for area_id in area_ids}
+    if not area_ids:
+        return totals
+
+    tallies = AreaTally.query.filter(
+        AreaTally.election_id == election_id, AreaTally.level == level, AreaTally.area_id.in_(area_ids)
+    )
+    for tally in tallies:
+        totals[tally.area_id].update({field: getattr(tally, field) for field in STAT_FIELDS})
+
+    votes = db.session.query(AreaCandidateTally.area_id, AreaCandidateTally.candidate_id, AreaCandidateTally.votes) \
+        .filter(
+            AreaCandidateTally.election_id == election_id,
+            AreaCandidateTally.level == level,
+            AreaCandidateTally.area_id.in_(area_ids)
+        )
+    for area_id, candidate_id, count in votes:
+        totals[area_id]['candidate_results'][str(candidate_id)] = count
+    return totals
+
+
+def rebuild_election_tally(election_id):
+    """Recalcule entièrement les compteurs d'une élection à partir des résultats bruts"""
+    previous_version = db.session.query(ElectionTally.version).filter_by(election_id=election_id).scalar()
+    ElectionTally.query.filter_by(election_id=election_id).delete()
+    CandidateTally.query.filter_by(election_id=election_id).delete()
+
+    total_stats = db.session.query(
+        func.sum(VotingOffice.total_voters).label('total_voters'),
+        func.sum(VotingOffice.blank_votes).label('blank_votes'),
+        func.sum(VotingOffice.null_votes).label('null_votes')
+    ).join(VotingOffice.center).filter_by(election_id=election_id).first()
+
+    candidate_results = db.session.query(
+        VotingResult.candidate_id,
+        func.sum(VotingResult.votes).label('total_votes')
+    ).join(VotingOffice).join(VotingOffice.center).filter_by(election_id=election_id).group_by(VotingResult.candidate_id).all()
+
+    db.session.add(ElectionTally(
+        election_id=election_id,
+        version=(previous_version or 0) + 1,
+        total_voters=total_stats.total_voters or 0,
+        blank_votes=total_stats.blank_votes or 0,
+        null_votes=total_stats.null_votes or 0
+    ))
+    for cr in candidate_results:
+        db.session.add(CandidateTally(
+            election_id=election_id,
+            candidate_id=cr.candidate_id,
+            votes=cr.total_votes or 0
+        ))
+    rebuild_area_tallies(election_id)
+
+
+def rebuild_area_tallies(election_id):
+    """Recalcule les compteurs par centre, commune et province d'une élection (sans commit)"""
+    AreaTally.query.filter_by(election_id=election_id).delete()
+    AreaCandidateTally.query.filter_by(election_id=election_id).delete()
+
+    centers = {}
+    center_stats = db.session.query(
+        VotingOffice.center_id,
+        func.sum(VotingOffice.total_voters).label('total_voters'),
+        func.sum(VotingOffice.blank_votes).label('blank_votes'),
+        func.sum(VotingOffice.null_votes).label('null_votes')
+    ).join(VotingOffice.center).filter_by(election_id=election_id).group_by(VotingOffice.center_id)
+    for row in center_stats:
+        delta = centers.setdefault(row.center_id, _empty_delta())
+        _accumulate(delta, {field: getattr(row, field) or 0 for field in STAT_FIELDS}, {})
+
+    center_votes = db.session.query(
+        VotingOffice.center_id,
+        VotingResult.candidate_id,
+        func.sum(VotingResult.votes).label('votes')
+    ).join(VotingOffice).join(VotingOffice.center).filter_by(election_id=election_id) \
+        .group_by(VotingOffice.center_id, VotingResult.candidate_id)
+    for row in center_votes:
+        _accumulate(centers.setdefault(row.center_id, _empty_delta()), {}, {row.candidate_id: row.votes or 0})
+
+    # Centers are rolled up in memory: one pass over the centers, no query per area
+    apply_area_deltas(election_id, roll_up_centers(centers))
+
+
+@tally_cli.command('rebuild')
+@click.argument('election_id', type=int, required=False)
+def rebuild_command(election_id):
+    """Recalcule les compteurs d'une élection (ou de toutes)."""
+    if election_id is not None:
+        election_ids = [election_id]
+    else:
+        election_ids = [row.id for row in db.session.query(Election.id)]
+
+    for current_id in election_ids:
+        rebuild_election_tally(current_id)
+        db.session.flush()
+        record_snapshot(current_id, db.session.query(ElectionTally.version).filter_by(election_id=current_id).scalar(), force=True)
+        response_cache.invalidate_on_commit(db.session, current_id)
+    db.session.commit()
+    click.echo(f'{len(election_ids)} élection(s) recalculée(s)')
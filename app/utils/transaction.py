@@ -0,0 +1,27 @@
+import logging
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+CALLBACKS_KEY = 'after_commit_callbacks'
+
+
+def after_commit(session, callback):
+    """Exécute `callback` une fois la transaction courante validée (abandonné en cas de rollback)"""
+    session.info.setdefault(CALLBACKS_KEY, []).append(callback)
+
+
+def register_transaction_hooks(db):
+    @event.listens_for(db.session, 'after_commit')
+    def run_after_commit(session):
+        callbacks = session.info.pop(CALLBACKS_KEY, [])
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                # The data is committed: a failed side effect must not turn the request into an error
+                logger.error(f"Erreur après validation de la transaction: {str(e)}")
+
+    @event.listens_for(db.session, 'after_soft_rollback')
+    def discard_after_rollback(session, previous_transaction):
+        session.info.pop(CALLBACKS_KEY, None)
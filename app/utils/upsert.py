@@ -0,0 +1,60 @@
+from sqlalchemy import and_, insert, literal, update
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+
+DIALECT_INSERTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+
+def upsert(model, rows, index_elements, set_, where=None, returning=None):
+    """INSERT ... ON CONFLICT DO UPDATE pour PostgreSQL et SQLite.
+
+    `set_` et `where` sont des fonctions recevant la pseudo-table `excluded`
+    (les valeurs proposées) et retournant respectivement le dictionnaire des
+    colonnes à mettre à jour et la condition de mise à jour. Avec `returning`
+    (colonnes), retourne le résultat de la requête (RETURNING) ; None sur les
+    bases sans ON CONFLICT, où l'appelant doit relire les lignes.
+    """
+    if not rows:
+        return None
+
+    dialect = db.session.get_bind().dialect.name
+    dialect_insert = DIALECT_INSERTS.get(dialect)
+    if dialect_insert is None:
+        _upsert_fallback(model, rows, index_elements, set_)
+        return None
+
+    stmt = dialect_insert(model.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=index_elements,
+        set_=set_(stmt.excluded),
+        where=where(stmt.excluded) if where is not None else None
+    )
+    if returning is not None:
+        return db.session.execute(stmt.returning(*returning), rows)
+    db.session.execute(stmt, rows)
+    return None
+
+
+def _upsert_fallback(model, rows, index_elements, set_):
+    """Chemin générique (UPDATE puis INSERT) pour les bases sans ON CONFLICT"""
+    table = model.__table__
+    for row in rows:
+        keys = and_(*[table.c[name] == row[name] for name in index_elements])
+        values = set_(_RowValues(table, row))
+        result = db.session.execute(update(table).where(keys).values(values))
+        if result.rowcount == 0:
+            db.session.execute(insert(table).values(row))
+
+
+class _RowValues:
+    """Imite `excluded` en exposant les valeurs d'une ligne sous forme de paramètres"""
+
+    def __init__(self, table, row):
+        self._table = table
+        self._row = row
+
+    def __getattr__(self, name):
+        return literal(self._row[name], type_=self._table.c[name].type)
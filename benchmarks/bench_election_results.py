@@ -0,0 +1,64 @@
+"""Nombre de requêtes et latence de GET /api/elections/<id>/results.
+
+    python -m benchmarks.bench_election_results --centers 3000 --offices 10000 --legacy
+"""
+import argparse
+import statistics
+from benchmarks.harness import app, db, setup_database, QueryCounter, timed
+from benchmarks.datagen import seed_election
+from app.models.election import VotingCenter
+
+
+def legacy_walk(election_id):
+    """Parcours objet par objet de l'ancienne implémentation, conservé pour comparaison"""
+    from app.schemas import VotingCenterSchema
+    totals = {'total_voters': 0, 'candidate_results': {}}
+    for center in VotingCenter.query.filter_by(election_id=election_id).all():
+        VotingCenterSchema().dump(center)
+        for office in center.voting_offices:
+            totals['total_voters'] += office.total_voters
+            for result in office.results:
+                totals['candidate_results'][result.candidate_id] = \
+                    totals['candidate_results'].get(result.candidate_id, 0) + result.votes
+    return totals
+
+
+def report(label, counter, durations):
+    print(f'{label:<28} requêtes={counter.count:<7} '
+          f'médiane={statistics.median(durations):8.1f} ms  max={max(durations):8.1f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--centers', type=int, default=3000)
+    parser.add_argument('--offices', type=int, default=10000)
+    parser.add_argument('--candidates', type=int, default=12)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--legacy', action='store_true', help="mesure aussi l'ancien parcours N+1")
+    args = parser.parse_args()
+
+    headers = setup_database()
+    with app.app_context():
+        election_id = seed_election(args.centers, args.offices, args.candidates)
+    client = app.test_client()
+    counter = QueryCounter()
+
+    for include in ('', 'offices'):
+        url = f'/api/elections/{election_id}/results' + (f'?include={include}' if include else '')
+        with counter.track():
+            response = client.get(url, headers=headers)
+        assert response.status_code == 200, response.get_json()
+        _, durations = timed(lambda: client.get(url, headers=headers), args.repeat)
+        report(f'GET results{" +" + include if include else ""}', counter, durations)
+
+    if args.legacy:
+        with app.app_context():
+            with counter.track():
+                legacy_walk(election_id)
+                db.session.remove()
+            _, durations = timed(lambda: (legacy_walk(election_id), db.session.remove()), max(1, args.repeat // 2))
+        report('parcours N+1 (ancien)', counter, durations)
+
+
+if __name__ == '__main__':
+    main()
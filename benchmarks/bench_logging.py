@@ -0,0 +1,89 @@
+"""Surcoût de la journalisation par requête : handlers synchrones contre file et thread d'écriture.
+
+    python -m benchmarks.bench_logging --requests 5000 --concurrency 8
+
+Chaque requête écrit une ligne de journal d'accès (échantillonnage
+désactivé) dans un fichier et sur la console (redirigée vers /dev/null).
+Le mode `none` (aucun handler) sert de référence.
+"""
+import os
+os.environ['ACCESS_LOG_SAMPLE_RATE'] = '1'
+
+import argparse
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from logging.handlers import RotatingFileHandler
+from benchmarks.harness import BENCH_DIR, app, setup_database, percentiles
+from benchmarks.datagen import seed_elections
+from config.logging import JsonFormatter, RequestContextFilter, start_queue_listener, stop_queue_listener
+
+
+def handlers(mode):
+    file_handler = RotatingFileHandler(os.path.join(BENCH_DIR, f'{mode}.log'), maxBytes=10240000, backupCount=10)
+    console_handler = logging.StreamHandler(open(os.devnull, 'w'))
+    for handler in (file_handler, console_handler):
+        handler.setFormatter(JsonFormatter())
+    return [file_handler, console_handler]
+
+
+def install(mode):
+    """Remplace les handlers du logger de l'application, retourne le listener éventuel"""
+    app.logger.handlers.clear()
+    listener = None
+    if mode == 'sync':
+        # Previous setup: handlers attached to the logger, writing on the request thread
+        for handler in handlers(mode):
+            handler.addFilter(RequestContextFilter())
+            app.logger.addHandler(handler)
+    elif mode == 'queue':
+        queue_handler, listener = start_queue_listener(handlers(mode))
+        queue_handler.addFilter(RequestContextFilter())
+        app.logger.addHandler(queue_handler)
+    else:
+        app.logger.addHandler(logging.NullHandler())
+    return listener
+
+
+def run(mode, url, headers, args):
+    listener = install(mode)
+    client = app.test_client()
+
+    def call(_):
+        start = time.perf_counter()
+        client.get(url, headers=headers)
+        return (time.perf_counter() - start) * 1000
+
+    for _ in range(50):
+        call(None)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        durations = list(pool.map(call, range(args.requests)))
+    elapsed = time.perf_counter() - start
+    if listener is not None:
+        drain = time.perf_counter()
+        stop_queue_listener()
+        drain = time.perf_counter() - drain
+    p = percentiles(durations)
+    print(f'{mode:<6} {args.requests / elapsed:>9.0f} req/s  p50={p[50]:6.2f} ms  p95={p[95]:6.2f} ms  '
+          f'p99={p[99]:6.2f} ms' + (f'  file vidée en {drain * 1000:.0f} ms' if listener is not None else ''))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--mode', choices=('none', 'sync', 'queue', 'all'), default='all')
+    args = parser.parse_args()
+
+    headers = setup_database()
+    with app.app_context():
+        election_id, = seed_elections(1, centers=10, offices=50, candidates=5)
+    # A cheap, cached read: the logging cost is a visible share of the request
+    url = f'/api/voting/realtime/{election_id}'
+    for mode in (('none', 'sync', 'queue') if args.mode == 'all' else (args.mode,)):
+        run(mode, url, headers, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Octets à télécharger pour afficher une liste de candidats : photos d'origine contre variantes.
+
+    python -m benchmarks.bench_media_bytes --candidates 50 --width 4000 --height 3000
+
+Les photos synthétiques sont envoyées par l'API (traitement des variantes
+synchrone), puis la liste des candidats est lue et la taille des fichiers
+référencés additionnée pour chaque variante.
+"""
+import argparse
+import io
+import os
+import time
+from PIL import Image, ImageDraw
+from benchmarks.harness import app, db, setup_database
+from app import image_pipeline
+from app.models.election import Election
+
+
+def synthetic_photo(width, height, seed):
+    """JPEG proche d'une photo d'appareil : dégradé, formes et grain, qualité élevée"""
+    image = Image.linear_gradient('L').resize((width, height)).convert('RGB')
+    draw = ImageDraw.Draw(image)
+    for i in range(12):
+        x, y = (seed * 97 + i * 311) % width, (seed * 53 + i * 197) % height
+        draw.ellipse((x, y, x + width // 5, y + height // 5), fill=((seed * 40 + i * 20) % 256, 90, 160))
+    image = Image.blend(image, Image.effect_noise((width, height), 40).convert('RGB'), 0.25)
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=92)
+    return buffer.getvalue()
+
+
+def file_size(path):
+    return os.path.getsize(os.path.join(app.config['UPLOAD_FOLDER'], os.path.relpath(path, 'uploads')))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--candidates', type=int, default=50)
+    parser.add_argument('--width', type=int, default=4000)
+    parser.add_argument('--height', type=int, default=3000)
+    args = parser.parse_args()
+
+    headers = setup_database()
+    client = app.test_client()
+    with app.app_context():
+        election = Election(title='Bench', type='local', year=2025, status='active')
+        db.session.add(election)
+        db.session.commit()
+        election_id = election.id
+
+    start = time.perf_counter()
+    for i in range(args.candidates):
+        response = client.post('/api/candidates/', headers=headers, content_type='multipart/form-data', data={
+            'first_name': f'Prénom {i}', 'last_name': f'Nom {i}', 'code_name': f'C{i}', 'election_id': str(election_id),
+            'profile_photo': (io.BytesIO(synthetic_photo(args.width, args.height, i)), f'photo_{i}.jpg')
+        })
+        assert response.status_code == 201, response.get_json()
+    image_pipeline.drain()
+    upload_seconds = time.perf_counter() - start
+
+    candidates = client.get(f'/api/candidates/?election_id={election_id}&limit={args.candidates}', headers=headers).get_json()
+    totals = {'source': sum(file_size(c['profile_photo']) for c in candidates)}
+    for variant in image_pipeline.variants:
+        totals[variant] = sum(file_size(c['profile_photo_variants'][variant]) for c in candidates)
+
+    print(f"{len(candidates)} candidats, photos {args.width}x{args.height}, envoi + variantes en {upload_seconds:.1f} s")
+    for name, total in totals.items():
+        print(f"{name:<10} {total / 1024 / 1024:>9.2f} Mo  ({total / totals['source']:>7.2%} de la source)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Coût d'une page selon sa position : pagination par clé (cursor) contre OFFSET.
+
+    python -m benchmarks.bench_pagination --candidates 200000
+
+Les deux stratégies sont mesurées au même niveau : la requête de page seule
+(ORM, mêmes colonnes et même LIMIT que `paginate`), dans un même contexte
+d'application. Seule la clause de position diffère (`id > :dernier` ou
+`OFFSET :position`) : l'écart est le coût du parcours des lignes sautées.
+La route elle-même est appelée une fois par position pour vérifier la page
+et compter ses requêtes.
+"""
+import argparse
+import statistics
+from benchmarks.harness import app, db, setup_database, QueryCounter, timed
+from benchmarks.datagen import seed_election
+from app.models.election import Candidate
+from app.utils.pagination import encode_cursor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--candidates', type=int, default=200000)
+    parser.add_argument('--limit', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    headers = setup_database()
+    with app.app_context():
+        seed_election(centers=1, offices=1, candidates=args.candidates, with_results=False)
+        ids = [row.id for row in db.session.query(Candidate.id).order_by(Candidate.id)]
+    client = app.test_client()
+    counter = QueryCounter()
+
+    print(f'{"position":>10} {"keyset (ms)":>12} {"offset (ms)":>12} {"rapport":>8} {"requêtes/page":>14}')
+    last = len(ids) - args.limit - 1
+    for position in sorted({0, 1000, len(ids) // 10, len(ids) // 2, last} & set(range(last + 1))):
+        last_id = ids[position - 1] if position else 0
+        cursor = f'&cursor={encode_cursor(last_id)}' if position else ''
+        with counter.track():
+            response = client.get(f'/api/candidates/?expand=&limit={args.limit}{cursor}', headers=headers)
+        assert response.status_code == 200, response.get_json()
+        assert response.get_json()[0]['id'] == ids[position]
+
+        with app.app_context():
+            # Same query as paginate(): one extra row tells whether a next page exists
+            query = Candidate.query.order_by(Candidate.id)
+
+            def keyset_page():
+                items = query.filter(Candidate.id > last_id).limit(args.limit + 1).all()
+                db.session.expunge_all()
+                return items
+
+            def offset_page():
+                items = query.offset(position).limit(args.limit + 1).all()
+                db.session.expunge_all()
+                return items
+
+            keyset_items, keyset = timed(keyset_page, args.repeat)
+            offset_items, offset = timed(offset_page, args.repeat)
+            assert [item.id for item in keyset_items] == [item.id for item in offset_items]
+
+        keyset, offset = statistics.median(keyset), statistics.median(offset)
+        print(f'{position:>10} {keyset:>12.2f} {offset:>12.2f} {offset / keyset:>7.1f}x {counter.count:>14}')
+
+
+if __name__ == '__main__':
+    main()
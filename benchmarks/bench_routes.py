@@ -0,0 +1,94 @@
+"""Micro-benchmarks des routes critiques via le client de test Flask.
+
+    python -m benchmarks.bench_routes --offices 5000 --repeat 50
+    python -m benchmarks.bench_routes --save-baseline    # enregistre la référence
+    python -m benchmarks.bench_routes --check            # code non nul en cas de régression
+
+Pour chaque route : latences p50/p95/p99 et nombre de requêtes SQL par
+appel. Le cache des réponses est désactivé (sauf --cache) pour mesurer le
+coût réel des lectures.
+"""
+import argparse
+import random
+import sys
+from benchmarks.harness import (
+    app, db, setup_database, percentiles, timed, QueryCounter, add_baseline_arguments, report_against_baseline
+)
+from benchmarks.datagen import seed_elections
+from app import response_cache
+from app.models.election import Candidate, VotingCenter, VotingOffice
+
+
+def scenarios(election_id, office_ids, candidate_ids, batch_size):
+    """Routes mesurées : (libellé, méthode, fabrique d'URL et de corps)"""
+    rng = random.Random(3)
+
+    def results_payload():
+        return {
+            'total_voters': rng.randint(100, 500), 'blank_votes': rng.randint(0, 10), 'null_votes': rng.randint(0, 10),
+            'results': [{'candidate_id': cid, 'votes': rng.randint(0, 50)} for cid in candidate_ids]
+        }
+
+    def office_results():
+        return f'/api/voting/office/{rng.choice(office_ids)}/results', results_payload()
+
+    def batch():
+        offices = rng.sample(office_ids, min(batch_size, len(office_ids)))
+        return '/api/voting/results/batch', {'offices': [dict(results_payload(), office_id=oid) for oid in offices]}
+
+    yield 'POST office results', 'post', office_results
+    yield 'PUT office results', 'put', office_results
+    yield f'POST results batch ({batch_size})', 'post', batch
+    yield 'GET realtime', 'get', lambda: (f'/api/voting/realtime/{election_id}', None)
+    yield 'GET realtime history', 'get', lambda: (f'/api/voting/realtime/{election_id}/history', None)
+    yield 'GET election results', 'get', lambda: (f'/api/elections/{election_id}/results', None)
+    yield 'GET geography results', 'get', lambda: (f'/api/geography/results/{election_id}', None)
+    yield 'GET election', 'get', lambda: (f'/api/elections/{election_id}', None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--centers', type=int, default=1000)
+    parser.add_argument('--offices', type=int, default=5000)
+    parser.add_argument('--candidates', type=int, default=12)
+    parser.add_argument('--communes', type=int, default=6, help='communes par province (9 provinces)')
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--cache', action='store_true', help='active le cache des réponses en mémoire')
+    add_baseline_arguments(parser)
+    args = parser.parse_args()
+
+    app.config['RESPONSE_CACHE_BACKEND'] = 'memory' if args.cache else 'none'
+    response_cache.init_app(app)
+    headers = setup_database()
+    with app.app_context():
+        election_id, = seed_elections(1, args.centers, args.offices, args.candidates, communes=args.communes)
+        office_ids = [row.id for row in db.session.query(VotingOffice.id).join(VotingCenter)
+                      .filter(VotingCenter.election_id == election_id)]
+        candidate_ids = [row.id for row in db.session.query(Candidate.id).filter_by(election_id=election_id)]
+    client = app.test_client()
+    counter = QueryCounter()
+
+    results = {}
+    print(f'{"route":<28} {"p50 (ms)":>9} {"p95 (ms)":>9} {"p99 (ms)":>9} {"requêtes":>9}')
+    for label, method, build in scenarios(election_id, office_ids, candidate_ids, args.batch_size):
+        def call():
+            url, body = build()
+            return getattr(client, method)(url, json=body, headers=headers)
+
+        # Counted on this thread only: the audit writer runs in the background
+        with counter.track():
+            before = counter.thread_count()
+            response = call()
+            queries = counter.thread_count() - before
+        assert response.status_code < 300, (label, response.status_code, response.get_json())
+        _, durations = timed(call, args.repeat)
+        p = percentiles(durations)
+        results[label] = {'p50': p[50], 'p95': p[95], 'p99': p[99], 'queries': queries}
+        print(f'{label:<28} {p[50]:>9.2f} {p[95]:>9.2f} {p[99]:>9.2f} {queries:>9}')
+
+    return report_against_baseline('routes', results, args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""Vérifie que les requêtes critiques utilisent les index (EXPLAIN QUERY PLAN sur SQLite).
+
+    python -m benchmarks.check_query_plans
+
+Le script se termine avec un code non nul si une requête parcourt une table entière.
+"""
+import sys
+from sqlalchemy import insert, text
+from benchmarks.harness import app, db, setup_database
+from benchmarks.datagen import seed_election
+from app.models.audit import ResultAudit
+from app.models.election import Candidate, VotingCenter, VotingOffice, VotingResult, Election
+from app.utils.aggregation import center_totals, center_candidate_totals, office_breakdown
+from app.utils.results import load_office_states
+from app.utils.tally import get_area_tallies, get_tally_history
+
+
+def hot_queries(election_id, office_ids):
+    """Requêtes critiques, exécutées pendant la capture : (libellé, tables devant passer par un index)"""
+    yield 'candidats par élection', ('candidate',), lambda: Candidate.query.filter_by(election_id=election_id).all()
+    yield 'centres par élection', ('voting_center',), lambda: VotingCenter.query.filter_by(election_id=election_id).all()
+    yield 'élections par statut/année', ('election',), lambda: Election.query.filter_by(status='active', year=2026).all()
+    yield 'totaux par centre', ('voting_center', 'voting_office'), lambda: center_totals(election_id)
+    yield 'voix par centre et candidat', ('voting_center', 'voting_office', 'voting_result'), \
+        lambda: center_candidate_totals(election_id)
+    yield 'détail par bureau', ('voting_center', 'voting_office', 'voting_result'), lambda: office_breakdown(election_id)
+    yield 'état des bureaux (ingestion)', ('voting_office', 'voting_result'), lambda: load_office_states(office_ids)
+    yield 'résultats par candidat', ('voting_result',), \
+        lambda: VotingResult.query.filter_by(candidate_id=1).count()
+    yield 'centres d\'une commune', ('voting_center',), \
+        lambda: VotingCenter.query.filter_by(commune_id=1, election_id=election_id).all()
+    yield 'totaux des zones filles', ('area_tally', 'area_candidate_tally'), \
+        lambda: get_area_tallies(election_id, 'center', range(1, 51))
+    yield 'historique des totaux', ('tally_snapshot',), lambda: get_tally_history(election_id)
+    yield 'audit par bureau', ('result_audit',), \
+        lambda: ResultAudit.query.filter_by(office_id=office_ids[0]).filter(ResultAudit.id > 0).order_by(ResultAudit.id).limit(100).all()
+    yield 'audit par utilisateur', ('result_audit',), \
+        lambda: ResultAudit.query.filter_by(user_id=1).order_by(ResultAudit.id).limit(100).all()
+
+
+def capture_statements(fn):
+    statements = []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    engine = db.engine
+    db.event.listen(engine, 'before_cursor_execute', on_execute)
+    try:
+        fn()
+    finally:
+        db.event.remove(engine, 'before_cursor_execute', on_execute)
+    return statements
+
+
+def full_scans(statement, parameters, tables):
+    """Retourne les lignes de plan qui parcourent une table surveillée sans index"""
+    plan = db.session.connection().exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+    offending = []
+    for row in plan:
+        detail = row[-1]
+        for table in tables:
+            if detail.startswith(f'SCAN {table}') and 'INDEX' not in detail:
+                offending.append(detail)
+    return plan, offending
+
+
+def main():
+    setup_database()
+    failures = 0
+    with app.app_context():
+        election_id = seed_election(centers=200, offices=800, candidates=8)
+        seed_election(centers=200, offices=800, candidates=8, seed=7)
+        db.session.execute(insert(Election), [
+            {'title': f'Archive {year}', 'type': 'local', 'year': year, 'status': 'completed'}
+            for year in range(1960, 2026) for _ in range(5)
+        ])
+        db.session.commit()
+        db.session.execute(text('ANALYZE'))
+        office_ids = [row.id for row in db.session.query(VotingOffice.id).limit(50)]
+
+        for label, tables, fn in hot_queries(election_id, office_ids):
+            for statement, parameters in capture_statements(fn):
+                if not statement.lstrip().upper().startswith('SELECT'):
+                    continue
+                plan, offending = full_scans(statement, parameters, tables)
+                status = 'ÉCHEC' if offending else 'ok'
+                print(f'[{status}] {label}')
+                for row in plan:
+                    print(f'        {row[-1]}')
+                failures += bool(offending)
+
+    if failures:
+        print(f'{failures} requête(s) sans index')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
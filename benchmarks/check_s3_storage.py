@@ -0,0 +1,160 @@
+"""Vérifie le backend S3 contre un faux S3 local (moto) : envoi en plusieurs parties, envoi direct signé
+et sa réclamation, contrôle d'empreinte, suppression.
+
+    python -m benchmarks.check_s3_storage
+
+Nécessite boto3, moto[server] et requests (requirements-optional.txt). Le script se termine avec un
+code non nul si une vérification échoue.
+"""
+import os
+import socket
+
+MULTIPART_THRESHOLD = 5 * 1024 * 1024  # minimum part size accepted by S3
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+ENDPOINT = f'http://127.0.0.1:{free_port()}'
+os.environ.update({
+    'STORAGE_BACKEND': 's3', 'S3_BUCKET': 'res-elec-check', 'S3_ENDPOINT_URL': ENDPOINT, 'S3_REGION': 'us-east-1',
+    'S3_MULTIPART_THRESHOLD': str(MULTIPART_THRESHOLD), 'S3_MULTIPART_CHUNKSIZE': str(MULTIPART_THRESHOLD),
+    'AWS_ACCESS_KEY_ID': 'check', 'AWS_SECRET_ACCESS_KEY': 'check',
+})
+
+import hashlib
+import io
+import logging
+import sys
+import boto3
+import requests
+from moto.server import ThreadedMotoServer
+from PIL import Image
+from benchmarks.harness import app, db, setup_database
+from app import file_storage
+from app.models.election import Election
+from app.models.file import StoredFile
+
+
+def image_bytes(size, kind='JPEG'):
+    buffer = io.BytesIO()
+    # Noise does not compress: the size of the file follows the size of the image
+    Image.effect_noise(size, 90).convert('RGB').save(buffer, kind, quality=100)
+    return buffer.getvalue()
+
+
+class Check:
+    def __init__(self, headers):
+        self.headers = headers
+        self.client = app.test_client()
+        self.s3 = file_storage.backend.client
+        self.failures = 0
+        with app.app_context():
+            election = Election(title='Vérification S3', type='presidential', year=2026)
+            db.session.add(election)
+            db.session.commit()
+            self.election_id = election.id
+
+    def expect(self, label, condition, detail=''):
+        print(f"{'ok   ' if condition else 'ÉCHEC'} {label}" + (f' ({detail})' if detail and not condition else ''))
+        if not condition:
+            self.failures += 1
+
+    def keys(self, prefix=''):
+        contents = self.s3.list_objects_v2(Bucket=os.environ['S3_BUCKET'], Prefix=prefix).get('Contents', [])
+        return {item['Key']: item for item in contents}
+
+    def create_candidate(self, photo):
+        return self.client.post('/api/candidates/', headers=self.headers, content_type='multipart/form-data', data={
+            'first_name': 'S3', 'last_name': 'Check', 'code_name': os.urandom(4).hex(),
+            'election_id': str(self.election_id), 'profile_photo': photo
+        })
+
+    def presign(self, digest, size, content_type='image/png'):
+        return self.client.post('/api/uploads/presign', headers=self.headers, json={
+            'folder': 'candidates', 'sha256': digest, 'size': size, 'content_type': content_type
+        })
+
+    def multipart_upload(self):
+        data = image_bytes((2500, 2500))
+        response = self.create_candidate((io.BytesIO(data), 'photo.jpg'))
+        self.expect('envoi au-delà du seuil de multipart', response.status_code == 201, response.get_json())
+        if response.status_code != 201:
+            return None
+        path = response.get_json()['candidate']['profile_photo']
+        stored = self.keys().get(file_storage._key(path))
+        self.expect('objet stocké en plusieurs parties', stored is not None and '-' in stored['ETag'], stored)
+        redirect = self.client.get('/' + path)
+        self.expect('/uploads redirige vers une URL signée', redirect.status_code == 302, redirect.status_code)
+        if redirect.status_code == 302:
+            downloaded = requests.get(redirect.headers['Location'], timeout=30).content
+            self.expect('contenu téléchargé identique', hashlib.sha256(downloaded).hexdigest() in path)
+        return response.get_json()['candidate']['id']
+
+    def direct_upload(self):
+        data = image_bytes((300, 300), 'PNG')
+        digest = hashlib.sha256(data).hexdigest()
+        response = self.presign(digest, len(data))
+        upload = response.get_json()
+        self.expect('presign retourne une requête PUT signée', response.status_code == 200 and 'url' in upload, upload)
+        if 'url' not in upload:
+            return None
+        put = requests.put(upload['url'], data=data, headers=upload['headers'], timeout=30)
+        self.expect('PUT signé accepté', put.status_code == 200, put.status_code)
+
+        response = self.create_candidate(upload['upload'])
+        self.expect('réclamation de l\'envoi direct', response.status_code == 201, response.get_json())
+        if response.status_code != 201:
+            return None
+        path = response.get_json()['candidate']['profile_photo']
+        self.expect('objet déplacé sous uploads/', file_storage._key(path) in self.keys())
+        self.expect('envoi direct retiré de incoming/', not self.keys('incoming/'))
+
+        known = self.presign(digest, len(data)).get_json()
+        self.expect('presign d\'un contenu connu retourne son chemin', known == {'path': path}, known)
+        return response.get_json()['candidate']['id']
+
+    def tampered_upload(self):
+        data = image_bytes((200, 200), 'PNG')
+        upload = self.presign('0' * 64, len(data)).get_json()
+        if 'url' not in upload:
+            self.expect('presign pour un contenu modifié', False, upload)
+            return
+        put = requests.put(upload['url'], data=data, headers=upload['headers'], timeout=30)
+        response = self.create_candidate(upload['upload'])
+        # S3 refuses the PUT itself; otherwise the claim must refuse the mismatching bytes
+        self.expect('contenu ne correspondant pas à l\'empreinte refusé',
+                    put.status_code >= 400 or response.status_code == 400, (put.status_code, response.status_code))
+        self.expect('envoi refusé supprimé de incoming/', not self.keys('incoming/'))
+
+    def delete_candidates(self, candidate_ids):
+        for candidate_id in candidate_ids:
+            self.client.delete(f'/api/candidates/{candidate_id}', headers=self.headers)
+        with app.app_context():
+            references = StoredFile.query.count()
+        remaining = self.keys()
+        self.expect('fichiers et variantes supprimés avec la dernière référence',
+                    not remaining and not references, (sorted(remaining), references))
+
+
+def main():
+    # The fake S3 runs on werkzeug: its request log would drown the results
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = ThreadedMotoServer(port=int(ENDPOINT.rsplit(':', 1)[1]), verbose=False)
+    server.start()
+    try:
+        boto3.client('s3', endpoint_url=ENDPOINT, region_name='us-east-1').create_bucket(Bucket=os.environ['S3_BUCKET'])
+        check = Check(setup_database())
+        candidate_ids = [check.multipart_upload(), check.direct_upload()]
+        check.tampered_upload()
+        check.delete_candidates([candidate_id for candidate_id in candidate_ids if candidate_id])
+    finally:
+        server.stop()
+    sys.exit(1 if check.failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Générateur de données électorales synthétiques, inséré en masse."""
+import random
+from datetime import datetime
+from sqlalchemy import insert, select
+from app import db
+from app.models.election import Area, Election, Candidate, VotingCenter, VotingOffice, VotingResult, ElectionTally
+from app.utils.tally import rebuild_election_tally, record_snapshot
+
+
+def seed_areas(provinces=9, communes=6):
+    """Crée `provinces` provinces de `communes` communes chacune, retourne les identifiants des communes"""
+    now = datetime.utcnow()
+    province_ids = db.session.execute(
+        insert(Area).returning(Area.id),
+        [{'name': f'Province {i}', 'level': 'province', 'created_at': now} for i in range(provinces)]
+    ).scalars().all()
+    commune_ids = db.session.execute(
+        insert(Area).returning(Area.id),
+        [{'name': f'Commune {p}-{i}', 'level': 'commune', 'parent_id': province_id, 'created_at': now}
+         for p, province_id in enumerate(province_ids) for i in range(communes)]
+    ).scalars().all()
+    db.session.commit()
+    return commune_ids
+
+
+def seed_election(centers=3000, offices=10000, candidates=12, with_results=True, seed=42, chunk_size=5000,
+                  commune_ids=None):
+    """Crée une élection complète et retourne son identifiant (à appeler dans un contexte d'application)"""
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+
+    election_id = db.session.execute(
+        insert(Election).values(title='Élection de test', type='legislative', year=now.year,
+                                status='active', created_at=now, updated_at=now).returning(Election.id)
+    ).scalar()
+
+    db.session.execute(insert(Candidate), [
+        {'first_name': f'Prénom {i}', 'last_name': f'Nom {i}', 'code_name': f'E{election_id}-C{i}',
+         'election_id': election_id, 'created_at': now, 'updated_at': now}
+        for i in range(candidates)
+    ])
+    db.session.execute(insert(VotingCenter), [
+        {'name': f'Centre {i}', 'election_id': election_id, 'created_at': now, 'updated_at': now,
+         'commune_id': commune_ids[i % len(commune_ids)] if commune_ids else None}
+        for i in range(centers)
+    ])
+    candidate_ids = db.session.scalars(select(Candidate.id).filter_by(election_id=election_id)).all()
+    center_ids = db.session.scalars(select(VotingCenter.id).filter_by(election_id=election_id)).all()
+
+    office_rows = []
+    for i in range(offices):
+        total = rng.randint(200, 600) if with_results else 0
+        office_rows.append({
+            'name': f'Bureau {i}', 'center_id': center_ids[i % len(center_ids)],
+            'total_voters': total, 'blank_votes': rng.randint(0, 10) if with_results else 0,
+            'null_votes': rng.randint(0, 10) if with_results else 0,
+            'created_at': now, 'updated_at': now
+        })
+    for start in range(0, len(office_rows), chunk_size):
+        db.session.execute(insert(VotingOffice), office_rows[start:start + chunk_size])
+
+    if with_results:
+        office_ids = db.session.scalars(
+            select(VotingOffice.id).join(VotingCenter).filter(VotingCenter.election_id == election_id)
+        ).all()
+        batch = []
+        for office_id in office_ids:
+            for candidate_id in candidate_ids:
+                batch.append({'office_id': office_id, 'candidate_id': candidate_id,
+                              'votes': rng.randint(0, 50), 'created_at': now, 'updated_at': now})
+            if len(batch) >= chunk_size:
+                db.session.execute(insert(VotingResult), batch)
+                batch = []
+        if batch:
+            db.session.execute(insert(VotingResult), batch)
+
+    db.session.commit()
+    return election_id
+
+
+def seed_elections(elections=1, centers=3000, offices=10000, candidates=12, with_results=True, communes=0, seed=42):
+    """Crée plusieurs élections (et leurs zones si `communes`) avec leurs compteurs, retourne leurs identifiants.
+
+    Les résultats étant insérés directement, les compteurs matérialisés et un
+    premier instantané sont recalculés pour que les lectures temps réel et par
+    zone portent sur des données réalistes.
+    """
+    commune_ids = seed_areas(communes=communes) if communes else None
+    election_ids = []
+    for index in range(elections):
+        election_id = seed_election(centers, offices, candidates, with_results, seed=seed + index, commune_ids=commune_ids)
+        rebuild_election_tally(election_id)
+        db.session.flush()
+        record_snapshot(election_id, db.session.query(ElectionTally.version).filter_by(election_id=election_id).scalar(),
+                        force=True)
+        db.session.commit()
+        election_ids.append(election_id)
+    return election_ids
@@ -0,0 +1,159 @@
+"""Environnement commun aux benchmarks : base SQLite jetable, client de test et compteur de requêtes.
+
+Doit être importé avant `app`, la configuration étant lue à l'import.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+BENCH_DIR = tempfile.mkdtemp(prefix='res_elec_bench_')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(BENCH_DIR, 'bench.db'))
+os.environ.setdefault('SECRET_KEY', 'benchmark-secret-key')
+os.environ.setdefault('JWT_SECRET_KEY', 'benchmark-jwt-secret-key-0123456789')
+os.environ.setdefault('UPLOAD_FOLDER', os.path.join(BENCH_DIR, 'uploads'))
+os.environ.setdefault('IMAGE_PROCESSING_ASYNC', 'false')
+# A route over its query budget (@query_budget) fails the benchmark
+os.environ.setdefault('QUERY_BUDGET_STRICT', 'true')
+os.environ.setdefault('REQUEST_PROFILE_LOG', 'none')
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+from app import app, db
+from app.models.user import User
+from app.models.election import Election  # noqa: F401  (enregistre les tables)
+
+
+def setup_database():
+    """Crée le schéma et un directeur, retourne les en-têtes d'authentification"""
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        user = User(
+            first_name='Bench', last_name='Mark', phone_number='00000000',
+            email='bench@example.com', province='Estuaire', commune='Libreville',
+            role='director', password_hash='-'
+        )
+        db.session.add(user)
+        db.session.commit()
+        token = create_access_token(identity=str(user.id))
+    return {'Authorization': f'Bearer {token}'}
+
+
+class QueryCounter:
+    """Compte les requêtes SQL : au total (`count`) et pour le thread courant (`thread_count()`)"""
+
+    def __init__(self):
+        self.count = 0
+        self._local = threading.local()
+
+    def _on_execute(self, *args):
+        self.count += 1
+        self._local.count = getattr(self._local, 'count', 0) + 1
+
+    def thread_count(self):
+        return getattr(self._local, 'count', 0)
+
+    @contextmanager
+    def track(self):
+        with app.app_context():
+            engine = db.engine
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+        try:
+            yield self
+        finally:
+            event.remove(engine, 'before_cursor_execute', self._on_execute)
+
+
+def timed(fn, repeat=5):
+    """Exécute fn plusieurs fois et retourne (dernier résultat, durées en ms)"""
+    durations = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        durations.append((time.perf_counter() - start) * 1000)
+    return result, durations
+
+
+def percentiles(durations, points=(50, 95, 99)):
+    """Percentiles (méthode du rang le plus proche) d'une liste de durées"""
+    ordered = sorted(durations)
+    if not ordered:
+        return {point: 0.0 for point in points}
+    return {point: ordered[min(len(ordered) - 1, int(round(point / 100 * len(ordered) + 0.5)) - 1)] for point in points}
+
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baselines.json')
+
+
+def load_baseline(name, path=BASELINE_PATH):
+    """Mesures de référence d'un scénario : {libellé: {métrique: valeur}}"""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f).get(name, {})
+
+
+def save_baseline(name, results, path=BASELINE_PATH):
+    baselines = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            baselines = json.load(f)
+    baselines[name] = {
+        label: {metric: round(value, 2) if isinstance(value, float) else value for metric, value in metrics.items()}
+        for label, metrics in results.items()
+    }
+    with open(path, 'w') as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def compare_to_baseline(name, results, tolerance=0.5, path=BASELINE_PATH):
+    """Régressions par rapport à la référence, en texte.
+
+    Les latences p50/p95 et le débit tolèrent un écart relatif de
+    `tolerance` (p99, trop bruité sur quelques dizaines d'appels, n'est
+    qu'affiché). Le nombre de requêtes SQL d'un appel, indépendant de la
+    machine, ne doit pas augmenter ; une moyenne (test de charge, qui dépend
+    du taux de succès du cache) tolère le même écart que les latences.
+    """
+    regressions = []
+    for label, baseline in load_baseline(name, path).items():
+        current = results.get(label)
+        if current is None:
+            continue
+        for metric in ('p50', 'p95'):
+            if metric in baseline and current.get(metric, 0) > baseline[metric] * (1 + tolerance):
+                regressions.append(f'{label}: {metric} {current[metric]:.1f} ms > {baseline[metric]:.1f} ms')
+        if 'throughput' in baseline and current.get('throughput', 0) < baseline['throughput'] * (1 - tolerance):
+            regressions.append(f'{label}: débit {current["throughput"]:.0f} req/s < {baseline["throughput"]:.0f} req/s')
+        queries = baseline.get('queries')
+        if queries is not None and current.get('queries', 0) > (queries if isinstance(queries, int) else queries * (1 + tolerance)):
+            regressions.append(f'{label}: {current["queries"]} requêtes SQL > {baseline["queries"]}')
+    return regressions
+
+
+def report_against_baseline(name, results, args):
+    """Enregistre (--save-baseline) ou compare (--check) les mesures ; retourne le code de sortie"""
+    if args.save_baseline:
+        save_baseline(name, results)
+        print(f'référence « {name} » enregistrée dans {BASELINE_PATH}')
+        return 0
+    if args.check:
+        regressions = compare_to_baseline(name, results, args.tolerance)
+        for regression in regressions:
+            print('RÉGRESSION', regression)
+        if not load_baseline(name):
+            print(f'aucune référence « {name} » : lancer avec --save-baseline')
+        return 1 if regressions else 0
+    return 0
+
+
+def add_baseline_arguments(parser):
+    parser.add_argument('--save-baseline', action='store_true', help='enregistre les mesures comme référence')
+    parser.add_argument('--check', action='store_true', help='échoue si les mesures régressent par rapport à la référence')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='écart relatif toléré sur les latences et le débit')
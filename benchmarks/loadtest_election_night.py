@@ -0,0 +1,137 @@
+"""Test de charge d'une soirée électorale : soumissions de résultats et consultations mêlées.
+
+    python -m benchmarks.loadtest_election_night --elections 2 --offices 5000 --duration 30 --concurrency 32
+    python -m benchmarks.loadtest_election_night --mix submit=40,realtime=50,results=10
+
+Des clients simulés envoient, selon les poids de --mix, des résultats de
+bureaux et des lectures (temps réel, historique, résultats consolidés, par
+zone) sur plusieurs élections pendant --duration secondes. Rapporte le
+débit, les latences p50/p95/p99 et le nombre moyen de requêtes SQL par
+type de requête, et compare à la référence (--check, --save-baseline).
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.harness import (
+    app, db, setup_database, percentiles, QueryCounter, add_baseline_arguments, report_against_baseline
+)
+from benchmarks.datagen import seed_elections
+from app import response_cache
+from app.models.election import Candidate, VotingCenter, VotingOffice
+
+DEFAULT_MIX = 'submit=20,realtime=55,history=5,results=5,areas=15'
+
+
+def parse_mix(value):
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        mix[name.strip()] = float(weight)
+    unknown = set(mix) - set(ROUTES)
+    if unknown:
+        raise argparse.ArgumentTypeError(f'types inconnus : {", ".join(sorted(unknown))} (attendus : {", ".join(ROUTES)})')
+    return mix
+
+
+def _submit(rng, election):
+    payload = {
+        'total_voters': rng.randint(100, 500), 'blank_votes': rng.randint(0, 10), 'null_votes': rng.randint(0, 10),
+        'results': [{'candidate_id': cid, 'votes': rng.randint(0, 50)} for cid in election['candidate_ids']]
+    }
+    return 'post', f'/api/voting/office/{rng.choice(election["office_ids"])}/results', payload
+
+
+# Request factories per traffic type: (method, url, body)
+ROUTES = {
+    'submit': _submit,
+    'realtime': lambda rng, election: ('get', f'/api/voting/realtime/{election["id"]}', None),
+    'history': lambda rng, election: ('get', f'/api/voting/realtime/{election["id"]}/history', None),
+    'results': lambda rng, election: ('get', f'/api/elections/{election["id"]}/results', None),
+    'areas': lambda rng, election: ('get', f'/api/geography/results/{election["id"]}', None),
+}
+
+
+def run(elections, headers, mix, args):
+    client = app.test_client()
+    counter = QueryCounter()
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    samples = {name: [] for name in names}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.duration
+
+    def worker(index):
+        rng = random.Random(index)
+        local = {name: [] for name in names}
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            method, url, body = ROUTES[name](rng, rng.choice(elections))
+            before = counter.thread_count()
+            start = time.perf_counter()
+            response = getattr(client, method)(url, json=body, headers=headers)
+            local[name].append(((time.perf_counter() - start) * 1000, counter.thread_count() - before,
+                                response.status_code >= 400))
+        with lock:
+            for name, values in local.items():
+                samples[name].extend(values)
+
+    with counter.track():
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            list(pool.map(worker, range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+
+    results = {}
+    print(f'{"type":<10} {"requêtes":>9} {"req/s":>8} {"p50 (ms)":>9} {"p95 (ms)":>9} {"p99 (ms)":>9} '
+          f'{"SQL/req":>8} {"erreurs":>8}')
+    for name in names + ['total']:
+        values = samples[name] if name != 'total' else [value for group in samples.values() for value in group]
+        if not values:
+            continue
+        p = percentiles([duration for duration, _, _ in values])
+        queries = round(sum(count for _, count, _ in values) / len(values), 1)
+        errors = sum(1 for _, _, failed in values if failed)
+        results[name] = {'p50': p[50], 'p95': p[95], 'p99': p[99], 'queries': queries,
+                         'throughput': len(values) / elapsed, 'errors': errors}
+        print(f'{name:<10} {len(values):>9} {len(values) / elapsed:>8.0f} {p[50]:>9.1f} {p[95]:>9.1f} {p[99]:>9.1f} '
+              f'{queries:>8} {errors:>8}')
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--elections', type=int, default=2)
+    parser.add_argument('--centers', type=int, default=1000)
+    parser.add_argument('--offices', type=int, default=5000)
+    parser.add_argument('--candidates', type=int, default=12)
+    parser.add_argument('--communes', type=int, default=6, help='communes par province (9 provinces)')
+    parser.add_argument('--duration', type=float, default=20, help='durée du test en secondes')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX, help=f'poids par type (défaut : {DEFAULT_MIX})')
+    parser.add_argument('--cache', choices=('memory', 'none'), default='memory', help='cache des réponses')
+    add_baseline_arguments(parser)
+    args = parser.parse_args()
+
+    app.config['RESPONSE_CACHE_BACKEND'] = args.cache
+    response_cache.init_app(app)
+    headers = setup_database()
+    elections = []
+    with app.app_context():
+        for election_id in seed_elections(args.elections, args.centers, args.offices, args.candidates,
+                                          communes=args.communes):
+            elections.append({
+                'id': election_id,
+                'office_ids': [row.id for row in db.session.query(VotingOffice.id).join(VotingCenter)
+                               .filter(VotingCenter.election_id == election_id)],
+                'candidate_ids': [row.id for row in db.session.query(Candidate.id).filter_by(election_id=election_id)]
+            })
+
+    results = run(elections, headers, args.mix, args)
+    return report_against_baseline('election_night', results, args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
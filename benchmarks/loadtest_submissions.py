@@ -0,0 +1,79 @@
+"""Test de charge des soumissions de résultats : écriture synchrone contre file d'attente asynchrone.
+
+    python -m benchmarks.loadtest_submissions --requests 2000 --concurrency 16 --mode both
+
+Rapporte le débit, les latences p50/p95/p99 côté client et, en mode
+asynchrone, le temps nécessaire pour que la file soit entièrement écrite.
+"""
+import argparse
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.harness import BENCH_DIR, app, db, setup_database, percentiles
+from benchmarks.datagen import seed_election
+from app import submission_queue
+from app.models.election import Candidate, VotingCenter, VotingOffice
+
+
+def run(mode, headers, office_ids, candidate_ids, args):
+    app.config['RESULTS_ASYNC_WRITES'] = mode == 'async'
+    app.config['RESULTS_QUEUE_PATH'] = os.path.join(BENCH_DIR, f'queue-{time.time_ns()}.db')
+    submission_queue.init_app(app)
+    client = app.test_client()
+    rng = random.Random(1)
+    payloads = [
+        (rng.choice(office_ids), {
+            'total_voters': rng.randint(100, 500),
+            'results': [{'candidate_id': cid, 'votes': rng.randint(0, 50)} for cid in candidate_ids]
+        })
+        for _ in range(args.requests)
+    ]
+
+    def submit(item):
+        office_id, payload = item
+        start = time.perf_counter()
+        response = client.post(f'/api/voting/office/{office_id}/results', json=payload, headers=headers)
+        return (time.perf_counter() - start) * 1000, response.status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        outcomes = list(pool.map(submit, payloads))
+    elapsed = time.perf_counter() - start
+
+    drained = elapsed
+    if mode == 'async':
+        while submission_queue.pending_count():
+            time.sleep(0.05)
+        drained = time.perf_counter() - start
+
+    latencies = [duration for duration, _ in outcomes]
+    errors = sum(1 for _, status in outcomes if status >= 400)
+    p = percentiles(latencies)
+    print(f'{mode:<6} {args.requests / elapsed:>9.0f} req/s  p50={p[50]:7.1f} ms  p95={p[95]:7.1f} ms  '
+          f'p99={p[99]:7.1f} ms  erreurs={errors:<5} écrit en {drained:6.2f} s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--offices', type=int, default=2000)
+    parser.add_argument('--candidates', type=int, default=12)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--mode', choices=('sync', 'async', 'both'), default='both')
+    args = parser.parse_args()
+
+    headers = setup_database()
+    with app.app_context():
+        election_id = seed_election(centers=max(1, args.offices // 4), offices=args.offices,
+                                    candidates=args.candidates, with_results=False)
+        office_ids = [row.id for row in db.session.query(VotingOffice.id).join(VotingCenter)
+                      .filter(VotingCenter.election_id == election_id)]
+        candidate_ids = [row.id for row in db.session.query(Candidate.id).filter_by(election_id=election_id)]
+
+    for mode in (('sync', 'async') if args.mode == 'both' else (args.mode,)):
+        run(mode, headers, office_ids, candidate_ids, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -11,6 +11,9 @@ class Config:
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY')
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=1)
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)
+    # Authenticated users are cached: role changes and deletions apply within this delay
+    AUTH_USER_CACHE_TTL = int(os.environ.get('AUTH_USER_CACHE_TTL') or 60)
+    AUTH_USER_CACHE_MAX_ENTRIES = int(os.environ.get('AUTH_USER_CACHE_MAX_ENTRIES') or 4096)
 
     # Mail configuration
     MAIL_SERVER = os.environ.get('MAIL_SERVER')
@@ -21,8 +24,98 @@ class Config:
     MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER')
 
     # File upload configuration
-    UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'uploads')
+    UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER') or os.path.join(os.path.dirname(os.path.dirname(__file__)), 'uploads')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+    # Per-folder file size limits in MB, enforced while the upload streams in
+    UPLOAD_SIZE_LIMITS = os.environ.get('UPLOAD_SIZE_LIMITS') or 'logos:5,profiles:10,candidates:10'
+    # Storage backend for uploads: 'local' (UPLOAD_FOLDER) or 's3' (any S3-compatible store, needs boto3)
+    STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'local')
+    S3_BUCKET = os.environ.get('S3_BUCKET')
+    S3_ENDPOINT_URL = os.environ.get('S3_ENDPOINT_URL')  # MinIO, Scaleway...; empty for AWS
+    S3_REGION = os.environ.get('S3_REGION')
+    S3_PREFIX = os.environ.get('S3_PREFIX', '')
+    S3_PUBLIC_URL = os.environ.get('S3_PUBLIC_URL')  # public bucket or CDN; otherwise pre-signed GET URLs
+    S3_URL_EXPIRES = int(os.environ.get('S3_URL_EXPIRES') or 3600)
+    S3_MULTIPART_THRESHOLD = int(os.environ.get('S3_MULTIPART_THRESHOLD') or 8 * 1024 * 1024)
+    S3_MULTIPART_CHUNKSIZE = int(os.environ.get('S3_MULTIPART_CHUNKSIZE') or 8 * 1024 * 1024)
+    # Media serving: 'none' (Flask sends the bytes), 'x-sendfile' (Apache, lighttpd) or 'x-accel' (nginx)
+    MEDIA_OFFLOAD = os.environ.get('MEDIA_OFFLOAD', 'none')
+    MEDIA_ACCEL_PREFIX = os.environ.get('MEDIA_ACCEL_PREFIX', '/protected-uploads')
+    MEDIA_MAX_AGE = int(os.environ.get('MEDIA_MAX_AGE') or 86400)
+    MEDIA_IMMUTABLE_MAX_AGE = int(os.environ.get('MEDIA_IMMUTABLE_MAX_AGE') or 31536000)
+    # Image variants (name:max edge in px), generated in the background after each upload
+    IMAGE_VARIANTS = os.environ.get('IMAGE_VARIANTS') or 'thumb:160,medium:640,original:2048'
+    IMAGE_VARIANT_FORMAT = os.environ.get('IMAGE_VARIANT_FORMAT', 'WEBP')
+    IMAGE_VARIANT_QUALITY = int(os.environ.get('IMAGE_VARIANT_QUALITY') or 80)
+    IMAGE_PROCESSING_ASYNC = os.environ.get('IMAGE_PROCESSING_ASYNC', 'True').lower() == 'true'
+
+    # Results ingestion
+    RESULTS_BATCH_MAX_OFFICES = int(os.environ.get('RESULTS_BATCH_MAX_OFFICES') or 5000)
+    # Asynchronous submissions: accepted into a local durable queue, written in batches (202 + submission id)
+    RESULTS_ASYNC_WRITES = os.environ.get('RESULTS_ASYNC_WRITES', 'False').lower() == 'true'
+    RESULTS_QUEUE_PATH = os.environ.get('RESULTS_QUEUE_PATH') or os.path.join(os.path.dirname(os.path.dirname(__file__)), 'instance', 'submissions.db')
+    RESULTS_QUEUE_BATCH_SIZE = int(os.environ.get('RESULTS_QUEUE_BATCH_SIZE') or 500)
+    RESULTS_QUEUE_INTERVAL = float(os.environ.get('RESULTS_QUEUE_INTERVAL') or 0.2)
+    # Batches claimed by a process that died are taken over after this many seconds
+    RESULTS_QUEUE_STALE_SECONDS = float(os.environ.get('RESULTS_QUEUE_STALE_SECONDS') or 60)
+    # Processed submissions (and their status) are kept this long, then purged
+    RESULTS_QUEUE_RETENTION_SECONDS = float(os.environ.get('RESULTS_QUEUE_RETENTION_SECONDS') or 86400)
+    # Bulk import of centers, offices and candidates (CSV/XLSX): rows per bulk insert, errors listed in the report
+    IMPORT_CHUNK_SIZE = int(os.environ.get('IMPORT_CHUNK_SIZE') or 1000)
+    IMPORT_MAX_ERRORS = int(os.environ.get('IMPORT_MAX_ERRORS') or 1000)
+    # Audit trail of result changes: one outbox row in the results transaction, moved to result_audit
+    # in batches by a background thread (False: written to result_audit in the results transaction)
+    AUDIT_ASYNC = os.environ.get('AUDIT_ASYNC', 'True').lower() == 'true'
+    AUDIT_BATCH_SIZE = int(os.environ.get('AUDIT_BATCH_SIZE') or 500)
+    AUDIT_INTERVAL = float(os.environ.get('AUDIT_INTERVAL') or 0.5)
+    # Results history: a tally snapshot every N tally versions or T seconds, whichever comes first
+    TALLY_SNAPSHOT_EVERY = int(os.environ.get('TALLY_SNAPSHOT_EVERY') or 100)
+    TALLY_SNAPSHOT_INTERVAL = int(os.environ.get('TALLY_SNAPSHOT_INTERVAL') or 60)
+    TALLY_HISTORY_MAX_POINTS = int(os.environ.get('TALLY_HISTORY_MAX_POINTS') or 500)
+
+    # Logging: records are written by a background thread; 'json' (one object per line) or 'text'
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')
+    LOG_FILE = os.environ.get('LOG_FILE', 'logs/res_elec.log')  # empty: console only
+    # 'size' (rotated by the process) or 'external' (logrotate); LOG_PER_PROCESS: one file per worker (set by gunicorn.conf.py)
+    LOG_ROTATION = os.environ.get('LOG_ROTATION', 'size')
+    LOG_PER_PROCESS = os.environ.get('LOG_PER_PROCESS', 'False').lower() == 'true'
+    LOG_MAX_BYTES = int(os.environ.get('LOG_MAX_BYTES') or 10240000)
+    LOG_BACKUP_COUNT = int(os.environ.get('LOG_BACKUP_COUNT') or 10)
+    # Access log: share of requests logged; errors (5xx) and requests slower than ACCESS_LOG_SLOW_MS always are
+    ACCESS_LOG_SAMPLE_RATE = float(os.environ.get('ACCESS_LOG_SAMPLE_RATE') or 0.1)
+    ACCESS_LOG_SLOW_MS = float(os.environ.get('ACCESS_LOG_SLOW_MS') or 1000)
+
+    # Per-request SQL profiling: query count, DB and serialization time in the Server-Timing header;
+    # requests with a slow statement or over their query budget are logged ('slow'), or all of them ('all')
+    REQUEST_PROFILING = os.environ.get('REQUEST_PROFILING', 'True').lower() == 'true'
+    SERVER_TIMING = os.environ.get('SERVER_TIMING', 'True').lower() == 'true'
+    SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS') or 100)
+    REQUEST_PROFILE_SLOWEST = int(os.environ.get('REQUEST_PROFILE_SLOWEST') or 3)
+    REQUEST_PROFILE_LOG = os.environ.get('REQUEST_PROFILE_LOG', 'slow')
+    # Query budget of views without their own (@query_budget), 0 for none; strict mode raises (tests, benchmarks)
+    QUERY_BUDGET = int(os.environ.get('QUERY_BUDGET') or 0)
+    QUERY_BUDGET_STRICT = os.environ.get('QUERY_BUDGET_STRICT', 'False').lower() == 'true'
+
+    # Prometheus metrics on /metrics (needs prometheus_client); METRICS_TOKEN: bearer token required to scrape
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'False').lower() == 'true'
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+    # Live results stream (SSE): 'memory' (single process) or 'redis' (several workers/instances)
+    EVENTS_BACKEND = os.environ.get('EVENTS_BACKEND', 'memory')
+    EVENTS_REDIS_URL = os.environ.get('EVENTS_REDIS_URL', 'redis://localhost:6379/0')
+    EVENTS_HEARTBEAT_SECONDS = int(os.environ.get('EVENTS_HEARTBEAT_SECONDS') or 15)
+    # Open streams per process (each one holds a thread): keep it below GUNICORN_THREADS, 0 for no limit
+    EVENTS_MAX_STREAMS = int(os.environ.get('EVENTS_MAX_STREAMS') or 4)
+
+    # Response cache of read endpoints: 'memory' (per process), 'redis' (shared) or 'none'
+    RESPONSE_CACHE_BACKEND = os.environ.get('RESPONSE_CACHE_BACKEND', 'memory')
+    RESPONSE_CACHE_REDIS_URL = os.environ.get('RESPONSE_CACHE_REDIS_URL', 'redis://localhost:6379/1')
+    RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL') or 30)
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES') or 1024)
+
+    # Pagination (keyset) of list endpoints
+    PAGINATION_DEFAULT_LIMIT = int(os.environ.get('PAGINATION_DEFAULT_LIMIT') or 100)
+    PAGINATION_MAX_LIMIT = int(os.environ.get('PAGINATION_MAX_LIMIT') or 1000)
 
     # CORS configuration
     CORS_ORIGINS = os.environ.get('CORS_ORIGINS', '*').split(',')
@@ -1,37 +1,197 @@
+import atexit
+import copy
+import json
 import os
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+import random
+import re
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, WatchedFileHandler
+from flask import g, has_request_context, request
+from flask_jwt_extended import get_jwt_identity
 
-def configure_logging(app):
-    # Créer le dossier logs s'il n'existe pas
-    if not os.path.exists('logs'):
-        os.mkdir('logs')
+# Identifiant de requête fourni par le client (proxy, équilibreur), conservé s'il est raisonnable
+REQUEST_ID = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+# Attributs standard d'un LogRecord : les autres viennent de `extra` et sont journalisés comme champs
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+access_logger = logging.getLogger('app.access')
+
+
+class RequestContextFilter(logging.Filter):
+    """Ajoute l'identifiant de la requête et de l'utilisateur à chaque enregistrement"""
+
+    def filter(self, record):
+        record.request_id = None
+        record.user_id = None
+        if has_request_context():
+            record.request_id = g.get('request_id')
+            record.user_id = _user_id()
+        return True
+
+
+def _user_id():
+    try:
+        return get_jwt_identity()
+    except RuntimeError:
+        # Aucun jeton vérifié pour cette requête
+        return None
+
+
+class JsonFormatter(logging.Formatter):
+    """Un objet JSON par ligne : date, niveau, logger, message, contexte de la requête et champs `extra`"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'pid': record.process,
+            'request_id': getattr(record, 'request_id', None),
+            'user_id': getattr(record, 'user_id', None),
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES and key not in entry:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class LogQueueHandler(QueueHandler):
+    """Dépose les enregistrements dans la file sans les mettre en forme (fait par le thread d'écriture)"""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+# Single writer thread per process, replaced (after stopping the previous one) by each configure_logging()
+_listener = None
+_queue_handler = None
 
-    # Configuration du logging
-    formatter = logging.Formatter(
-        '[%(asctime)s] %(levelname)s in %(module)s: %(message)s'
-    )
 
-    # Handler pour les fichiers
-    file_handler = RotatingFileHandler(
-        'logs/res_elec.log',
-        maxBytes=10240000,  # 10MB
-        backupCount=10
+def start_queue_listener(handlers):
+    """Démarre le thread d'écriture des `handlers`, retourne (handler à attacher, listener).
+
+    Le thread précédent est arrêté (file vidée, handlers fermés) : un seul par
+    processus, quel que soit le nombre d'applications créées. Il est arrêté à
+    la sortie du processus et recréé dans les processus créés par fork
+    (workers gunicorn).
+    """
+    global _listener, _queue_handler
+    stop_queue_listener()
+    _queue_handler = LogQueueHandler(queue.SimpleQueue())
+    _listener = QueueListener(_queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _queue_handler, _listener
+
+
+def stop_queue_listener():
+    """Écrit les enregistrements en attente puis arrête le thread d'écriture"""
+    global _listener
+    listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+
+def _restart_in_child():
+    global _listener
+    if _listener is None:
+        return
+    # The writer thread does not exist in the child; the records left in the queue belong to the parent
+    _queue_handler.queue = queue.SimpleQueue()
+    _listener = QueueListener(_queue_handler.queue, *_listener.handlers, respect_handler_level=_listener.respect_handler_level)
+    _listener.start()
+
+
+atexit.register(stop_queue_listener)
+os.register_at_fork(after_in_child=_restart_in_child)
+
+
+def _file_handler(app):
+    path = app.config.get('LOG_FILE', 'logs/res_elec.log')
+    if app.config.get('LOG_PER_PROCESS', False):
+        # Chaque worker écrit et fait tourner son propre fichier
+        root, ext = os.path.splitext(path)
+        path = f'{root}.{os.getpid()}{ext}'
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory, exist_ok=True)
+    if app.config.get('LOG_ROTATION', 'size') == 'external':
+        # Rotation par logrotate : le fichier est rouvert une fois déplacé
+        return WatchedFileHandler(path)
+    return RotatingFileHandler(
+        path,
+        maxBytes=app.config.get('LOG_MAX_BYTES', 10240000),
+        backupCount=app.config.get('LOG_BACKUP_COUNT', 10)
     )
-    file_handler.setFormatter(formatter)
-    file_handler.setLevel(logging.INFO)
 
-    # Handler pour la console
-    console_handler = logging.StreamHandler()
-    console_handler.setFormatter(formatter)
-    console_handler.setLevel(logging.INFO)
 
-    # Configurer le logger de l'application
-    app.logger.addHandler(file_handler)
-    app.logger.addHandler(console_handler)
+def configure_logging(app):
+    if app.config.get('LOG_FORMAT', 'json') == 'json':
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter('[%(asctime)s] %(levelname)s in %(module)s [%(request_id)s]: %(message)s')
+
+    handlers = [logging.StreamHandler()]
+    if app.config.get('LOG_FILE', 'logs/res_elec.log'):
+        handlers.append(_file_handler(app))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+        handler.setLevel(logging.INFO)
+
+    # Les threads des requêtes ne font que déposer les enregistrements ; un thread dédié les écrit
+    queue_handler, _ = start_queue_listener(handlers)
+    queue_handler.addFilter(RequestContextFilter())
+    app.logger.handlers.clear()
+    app.logger.addHandler(queue_handler)
     app.logger.setLevel(logging.INFO)
 
+    sample_rate = app.config.get('ACCESS_LOG_SAMPLE_RATE', 1.0)
+    slow = app.config.get('ACCESS_LOG_SLOW_MS', 1000)
+
+    @app.before_request
+    def start_request():
+        request_id = request.headers.get('X-Request-ID', '')
+        g.request_id = request_id if REQUEST_ID.match(request_id) else uuid.uuid4().hex
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def log_request(response):
+        response.headers['X-Request-ID'] = g.get('request_id', '')
+        start = g.get('request_start')
+        if start is None:
+            return response
+        duration = (time.perf_counter() - start) * 1000
+        # Erreurs et requêtes lentes toujours journalisées, les autres échantillonnées
+        always = response.status_code >= 500 or duration >= slow
+        if always or random.random() < sample_rate:
+            access_logger.info('%s %s %s', request.method, request.path, response.status_code, extra={
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'duration_ms': round(duration, 2),
+                'bytes': response.content_length,
+                'remote_addr': request.remote_addr,
+                'sample_rate': 1.0 if always else sample_rate
+            })
+        return response
+
     # Désactiver le logging de Werkzeug en production
     is_production = os.environ.get('FLASK_ENV') == 'production' or os.environ.get('ENVIRONMENT') == 'production'
     if is_production:
-        logging.getLogger('werkzeug').setLevel(logging.ERROR) 
\ No newline at end of file
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
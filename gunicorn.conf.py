@@ -0,0 +1,25 @@
+# Chargé automatiquement par gunicorn depuis le dossier courant (voir Procfile)
+import os
+import shutil
+import tempfile
+
+# Several workers must not rotate the same log file: each one writes its own
+os.environ.setdefault('LOG_PER_PROCESS', 'true')
+
+# Prometheus metrics shared by all workers: each one writes its values to this directory,
+# which has to be set before the workers import prometheus_client and emptied on startup
+if os.environ.get('METRICS_ENABLED', 'False').lower() == 'true':
+    os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'res_elec_metrics'))
+
+
+def on_starting(server):
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,63 @@
+"""add election and candidate tally tables
+
+Revision ID: a1c7e2f4b9d3
+Revises: 504422604cb6
+Create Date: 2026-10-18 09:12:41.227310
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1c7e2f4b9d3'
+down_revision = '504422604cb6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('election_tally',
+    sa.Column('election_id', sa.Integer(), nullable=False),
+    sa.Column('total_voters', sa.Integer(), nullable=False),
+    sa.Column('blank_votes', sa.Integer(), nullable=False),
+    sa.Column('null_votes', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['election_id'], ['election.id'], ),
+    sa.PrimaryKeyConstraint('election_id')
+    )
+    op.create_table('candidate_tally',
+    sa.Column('election_id', sa.Integer(), nullable=False),
+    sa.Column('candidate_id', sa.Integer(), nullable=False),
+    sa.Column('votes', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['candidate_id'], ['candidate.id'], ),
+    sa.ForeignKeyConstraint(['election_id'], ['election.id'], ),
+    sa.PrimaryKeyConstraint('election_id', 'candidate_id')
+    )
+
+    # Backfill the counters from the results already recorded
+    op.execute("""
+        INSERT INTO election_tally (election_id, total_voters, blank_votes, null_votes, updated_at)
+        SELECT vc.election_id,
+               COALESCE(SUM(vo.total_voters), 0),
+               COALESCE(SUM(vo.blank_votes), 0),
+               COALESCE(SUM(vo.null_votes), 0),
+               CURRENT_TIMESTAMP
+        FROM voting_office vo
+        JOIN voting_center vc ON vc.id = vo.center_id
+        GROUP BY vc.election_id
+    """)
+    op.execute("""
+        INSERT INTO candidate_tally (election_id, candidate_id, votes, updated_at)
+        SELECT vc.election_id, vr.candidate_id, COALESCE(SUM(vr.votes), 0), CURRENT_TIMESTAMP
+        FROM voting_result vr
+        JOIN voting_office vo ON vo.id = vr.office_id
+        JOIN voting_center vc ON vc.id = vo.center_id
+        GROUP BY vc.election_id, vr.candidate_id
+    """)
+
+
+def downgrade():
+    op.drop_table('candidate_tally')
+    op.drop_table('election_tally')
@@ -0,0 +1,40 @@
+"""add tally_snapshot table for the results history
+
+Revision ID: a8c2e5f1d7b4
+Revises: d3f7a1c9e5b2
+Create Date: 2026-10-18 16:03:52.719846
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8c2e5f1d7b4'
+down_revision = 'd3f7a1c9e5b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('tally_snapshot',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('election_id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('taken_at', sa.DateTime(), nullable=False),
+    sa.Column('total_voters', sa.Integer(), nullable=False),
+    sa.Column('blank_votes', sa.Integer(), nullable=False),
+    sa.Column('null_votes', sa.Integer(), nullable=False),
+    sa.Column('candidate_results', sa.JSON(), nullable=False),
+    sa.ForeignKeyConstraint(['election_id'], ['election.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('tally_snapshot', schema=None) as batch_op:
+        batch_op.create_index('ix_tally_snapshot_election_taken', ['election_id', 'taken_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('tally_snapshot', schema=None) as batch_op:
+        batch_op.drop_index('ix_tally_snapshot_election_taken')
+
+    op.drop_table('tally_snapshot')
@@ -0,0 +1,30 @@
+"""add stored_file table for content-addressed uploads
+
+Revision ID: b5d1e8a3c7f4
+Revises: f2a9c6d4e1b8
+Create Date: 2026-10-18 13:02:41.183207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5d1e8a3c7f4'
+down_revision = 'f2a9c6d4e1b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('stored_file',
+    sa.Column('path', sa.String(length=255), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('ref_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('path')
+    )
+
+
+def downgrade():
+    op.drop_table('stored_file')
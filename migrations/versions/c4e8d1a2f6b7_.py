@@ -0,0 +1,45 @@
+"""unique voting result per office and candidate
+
+Revision ID: c4e8d1a2f6b7
+Revises: a1c7e2f4b9d3
+Create Date: 2026-10-18 10:03:18.551902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e8d1a2f6b7'
+down_revision = 'a1c7e2f4b9d3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Keep only the most recent row for each (office, candidate) pair
+    op.execute("""
+        DELETE FROM voting_result
+        WHERE id NOT IN (
+            SELECT MAX(id) FROM voting_result GROUP BY office_id, candidate_id
+        )
+    """)
+
+    # The removed duplicates were counted in the candidate tally: recompute it
+    op.execute("DELETE FROM candidate_tally")
+    op.execute("""
+        INSERT INTO candidate_tally (election_id, candidate_id, votes, updated_at)
+        SELECT vc.election_id, vr.candidate_id, COALESCE(SUM(vr.votes), 0), CURRENT_TIMESTAMP
+        FROM voting_result vr
+        JOIN voting_office vo ON vo.id = vr.office_id
+        JOIN voting_center vc ON vc.id = vo.center_id
+        GROUP BY vc.election_id, vr.candidate_id
+    """)
+
+    with op.batch_alter_table('voting_result', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_voting_result_office_candidate', ['office_id', 'candidate_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('voting_result', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_voting_result_office_candidate', type_='unique')
@@ -0,0 +1,45 @@
+"""add result_audit table
+
+Revision ID: c7e4b2d9f3a6
+Revises: a8c2e5f1d7b4
+Create Date: 2026-10-18 16:48:13.552970
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7e4b2d9f3a6'
+down_revision = 'a8c2e5f1d7b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('result_audit',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('office_id', sa.Integer(), nullable=False),
+    sa.Column('election_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('action', sa.String(length=20), nullable=False),
+    sa.Column('before', sa.JSON(), nullable=False),
+    sa.Column('after', sa.JSON(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('result_audit', schema=None) as batch_op:
+        batch_op.create_index('ix_result_audit_election', ['election_id', 'id'], unique=False)
+        batch_op.create_index('ix_result_audit_office', ['office_id', 'id'], unique=False)
+        batch_op.create_index('ix_result_audit_user', ['user_id', 'id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_result_audit_created_at'), ['created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('result_audit', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_result_audit_created_at'))
+        batch_op.drop_index('ix_result_audit_user')
+        batch_op.drop_index('ix_result_audit_office')
+        batch_op.drop_index('ix_result_audit_election')
+
+    op.drop_table('result_audit')
@@ -0,0 +1,101 @@
+"""add electoral geography and roll-up tallies per area
+
+Revision ID: d3f7a1c9e5b2
+Revises: b5d1e8a3c7f4
+Create Date: 2026-10-18 15:12:27.408311
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3f7a1c9e5b2'
+down_revision = 'b5d1e8a3c7f4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('area',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('level', sa.String(length=20), nullable=False),
+    sa.Column('parent_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['parent_id'], ['area.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('parent_id', 'name', name='uq_area_parent_name')
+    )
+    with op.batch_alter_table('area', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_area_parent_id'), ['parent_id'], unique=False)
+
+    with op.batch_alter_table('voting_center', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('commune_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_voting_center_commune_id_area', 'area', ['commune_id'], ['id'])
+        batch_op.create_index('ix_voting_center_commune_election', ['commune_id', 'election_id'], unique=False)
+
+    op.create_table('area_tally',
+    sa.Column('election_id', sa.Integer(), nullable=False),
+    sa.Column('level', sa.String(length=20), nullable=False),
+    sa.Column('area_id', sa.Integer(), nullable=False),
+    sa.Column('total_voters', sa.Integer(), nullable=False),
+    sa.Column('blank_votes', sa.Integer(), nullable=False),
+    sa.Column('null_votes', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['election_id'], ['election.id'], ),
+    sa.PrimaryKeyConstraint('election_id', 'level', 'area_id')
+    )
+    op.create_table('area_candidate_tally',
+    sa.Column('election_id', sa.Integer(), nullable=False),
+    sa.Column('level', sa.String(length=20), nullable=False),
+    sa.Column('area_id', sa.Integer(), nullable=False),
+    sa.Column('candidate_id', sa.Integer(), nullable=False),
+    sa.Column('votes', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['candidate_id'], ['candidate.id'], ),
+    sa.ForeignKeyConstraint(['election_id'], ['election.id'], ),
+    sa.PrimaryKeyConstraint('election_id', 'level', 'area_id', 'candidate_id')
+    )
+    with op.batch_alter_table('area_candidate_tally', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_area_candidate_tally_candidate_id'), ['candidate_id'], unique=False)
+
+    # Backfill the center level; existing centers belong to no commune yet
+    op.execute("""
+        INSERT INTO area_tally (election_id, level, area_id, total_voters, blank_votes, null_votes, updated_at)
+        SELECT vc.election_id, 'center', vc.id,
+               COALESCE(SUM(vo.total_voters), 0),
+               COALESCE(SUM(vo.blank_votes), 0),
+               COALESCE(SUM(vo.null_votes), 0),
+               CURRENT_TIMESTAMP
+        FROM voting_office vo
+        JOIN voting_center vc ON vc.id = vo.center_id
+        GROUP BY vc.election_id, vc.id
+    """)
+    op.execute("""
+        INSERT INTO area_candidate_tally (election_id, level, area_id, candidate_id, votes, updated_at)
+        SELECT vc.election_id, 'center', vc.id, vr.candidate_id, COALESCE(SUM(vr.votes), 0), CURRENT_TIMESTAMP
+        FROM voting_result vr
+        JOIN voting_office vo ON vo.id = vr.office_id
+        JOIN voting_center vc ON vc.id = vo.center_id
+        GROUP BY vc.election_id, vc.id, vr.candidate_id
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('area_candidate_tally', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_area_candidate_tally_candidate_id'))
+
+    op.drop_table('area_candidate_tally')
+    op.drop_table('area_tally')
+
+    with op.batch_alter_table('voting_center', schema=None) as batch_op:
+        batch_op.drop_index('ix_voting_center_commune_election')
+        batch_op.drop_constraint('fk_voting_center_commune_id_area', type_='foreignkey')
+        batch_op.drop_column('commune_id')
+
+    with op.batch_alter_table('area', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_area_parent_id'))
+
+    op.drop_table('area')
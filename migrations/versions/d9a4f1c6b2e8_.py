@@ -0,0 +1,29 @@
+"""add result_audit_outbox table
+
+Revision ID: d9a4f1c6b2e8
+Revises: c7e4b2d9f3a6
+Create Date: 2026-10-18 19:02:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9a4f1c6b2e8'
+down_revision = 'c7e4b2d9f3a6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('result_audit_outbox',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('records', sa.JSON(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('result_audit_outbox')
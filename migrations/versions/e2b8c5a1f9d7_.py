@@ -0,0 +1,26 @@
+"""add voting_office.submitted_at
+
+Revision ID: e2b8c5a1f9d7
+Revises: d9a4f1c6b2e8
+Create Date: 2026-10-18 19:41:07.662915
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b8c5a1f9d7'
+down_revision = 'd9a4f1c6b2e8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('voting_office', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('submitted_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('voting_office', schema=None) as batch_op:
+        batch_op.drop_column('submitted_at')
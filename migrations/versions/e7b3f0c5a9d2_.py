@@ -0,0 +1,58 @@
+"""add indexes on foreign keys and filter columns
+
+Revision ID: e7b3f0c5a9d2
+Revises: c4e8d1a2f6b7
+Create Date: 2026-10-18 10:41:55.093417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7b3f0c5a9d2'
+down_revision = 'c4e8d1a2f6b7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('election', schema=None) as batch_op:
+        batch_op.create_index('ix_election_status_year', ['status', 'year'], unique=False)
+        batch_op.create_index(batch_op.f('ix_election_year'), ['year'], unique=False)
+
+    with op.batch_alter_table('candidate', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_candidate_election_id'), ['election_id'], unique=False)
+
+    with op.batch_alter_table('voting_center', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_voting_center_election_id'), ['election_id'], unique=False)
+
+    with op.batch_alter_table('voting_office', schema=None) as batch_op:
+        batch_op.create_index('ix_voting_office_center_totals', ['center_id', 'total_voters', 'blank_votes', 'null_votes'], unique=False)
+
+    with op.batch_alter_table('voting_result', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_voting_result_candidate_id'), ['candidate_id'], unique=False)
+
+    with op.batch_alter_table('candidate_tally', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_candidate_tally_candidate_id'), ['candidate_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('candidate_tally', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_candidate_tally_candidate_id'))
+
+    with op.batch_alter_table('voting_result', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_voting_result_candidate_id'))
+
+    with op.batch_alter_table('voting_office', schema=None) as batch_op:
+        batch_op.drop_index('ix_voting_office_center_totals')
+
+    with op.batch_alter_table('voting_center', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_voting_center_election_id'))
+
+    with op.batch_alter_table('candidate', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_candidate_election_id'))
+
+    with op.batch_alter_table('election', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_election_year'))
+        batch_op.drop_index('ix_election_status_year')
@@ -0,0 +1,26 @@
+"""add version to election tally
+
+Revision ID: f2a9c6d4e1b8
+Revises: e7b3f0c5a9d2
+Create Date: 2026-10-18 11:27:06.612045
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a9c6d4e1b8'
+down_revision = 'e7b3f0c5a9d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('election_tally', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('election_tally', schema=None) as batch_op:
+        batch_op.drop_column('version')